@@ -0,0 +1,66 @@
+"""Login throughput of the bcrypt password hasher.
+
+Hashes a password once per cost and then times password checks, which are
+what a login costs, first in this process on one core and then through the
+PasswordHasher process pool. No database is needed.
+
+    python bench_auth.py                     # costs 10, 12 and 14
+    python bench_auth.py --rounds 12 --logins 200
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+from main import PasswordHasher
+
+
+def logins_per_second(check, logins):
+    started = time.perf_counter()
+    check(logins)
+    return logins / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 12, 14], help="bcrypt costs to compare")
+    parser.add_argument("--logins", type=int, default=64, help="password checks per measurement")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="hashing processes")
+    args = parser.parse_args()
+
+    cores = min(args.workers, os.cpu_count() or 1)
+    print(f"{'cost':>4} | {'hash ms':>8} | {'1 core logins/s':>15} | "
+          f"{f'{args.workers} procs logins/s':>18} | {'per core':>8}")
+    for rounds in args.rounds:
+        hasher = PasswordHasher(rounds=rounds, workers=args.workers)
+        try:
+            # Start every worker process before timing
+            hasher.hash_many(["warm-up"] * args.workers)
+
+            started = time.perf_counter()
+            hashed = hasher.hash("correct horse battery staple")
+            hash_ms = (time.perf_counter() - started) * 1000
+
+            def check_inline(count):
+                for _ in range(count):
+                    bcrypt.checkpw(b"correct horse battery staple", hashed.encode("utf-8"))
+
+            def check_pooled(count):
+                # Concurrent logins, as from the app's query workers
+                with ThreadPoolExecutor(args.workers) as logins:
+                    assert all(logins.map(
+                        lambda _: hasher.verify("correct horse battery staple", hashed), range(count)
+                    ))
+
+            single = logins_per_second(check_inline, max(args.logins // args.workers, 4))
+            pooled = logins_per_second(check_pooled, args.logins)
+        finally:
+            hasher.shutdown()
+
+        print(f"{rounds:>4} | {hash_ms:>8.0f} | {single:>15.1f} | {pooled:>18.1f} | {pooled / cores:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
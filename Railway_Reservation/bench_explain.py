@@ -0,0 +1,132 @@
+"""Before/after EXPLAIN for the hot query predicates.
+
+Runs EXPLAIN and a short timing loop for the original form of each hot
+query (non-sargable, or with its index ignored) and for the form that the
+indexes from SCHEMA_MIGRATIONS can serve, against the database configured
+in .env.
+
+    python bench_explain.py                  # print the report
+    python bench_explain.py -o explain.md    # also save it to a file
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from main import get_db_pool, initialize_database
+
+
+def build_cases(cursor):
+    cursor.execute(
+        "SELECT a.station_id, b.station_id, DATE(a.departure_at) "
+        "FROM schedule_stops a JOIN schedule_stops b "
+        "ON b.schedule_id = a.schedule_id AND b.stop_index > a.stop_index "
+        "ORDER BY a.schedule_id LIMIT 1"
+    )
+    route = cursor.fetchone() or (0, 0, datetime.now().date())
+    cursor.execute("SELECT COALESCE(MIN(user_id), 1) FROM bookings")
+    user_id = cursor.fetchone()[0]
+
+    to_date = datetime.now().strftime('%Y-%m-%d')
+    from_date = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+    search_params = (route[0], route[1], route[2], route[2])
+    search_query = (
+        "SELECT s.id, a.stop_index, b.stop_index FROM schedule_stops a {hint} "
+        "JOIN schedule_stops b {hint} ON b.schedule_id = a.schedule_id AND b.stop_index > a.stop_index "
+        "JOIN schedules s ON s.id = a.schedule_id "
+        "WHERE a.station_id = %s AND b.station_id = %s "
+        "AND a.departure_at >= %s AND a.departure_at < %s + INTERVAL 1 DAY ORDER BY a.departure_at"
+    )
+
+    return [
+        (
+            "Booking search (search_trains_for_booking)",
+            search_query.format(hint="IGNORE INDEX (idx_schedule_stops_station_departure)"),
+            search_params,
+            search_query.format(hint=""),
+            search_params,
+        ),
+        (
+            "Revenue date range (update_revenue_analytics_with_scroll)",
+            "SELECT DATE(b.booking_date), SUM(b.total_fare) FROM bookings b "
+            "WHERE DATE(b.booking_date) BETWEEN %s AND %s GROUP BY DATE(b.booking_date)",
+            (from_date, to_date),
+            "SELECT DATE(b.booking_date), SUM(b.total_fare) FROM bookings b "
+            "WHERE b.booking_date >= %s AND b.booking_date < %s + INTERVAL 1 DAY "
+            "GROUP BY DATE(b.booking_date)",
+            (from_date, to_date),
+        ),
+        (
+            "Bookings for one day (filter_bookings_by_date)",
+            "SELECT b.id FROM bookings b WHERE DATE(b.booking_date) = %s ORDER BY b.booking_date DESC",
+            (to_date,),
+            "SELECT b.id FROM bookings b WHERE b.booking_date >= %s "
+            "AND b.booking_date < %s + INTERVAL 1 DAY ORDER BY b.booking_date DESC",
+            (to_date, to_date),
+        ),
+        (
+            "Cancelled bookings of a user (load_user_bookings)",
+            "SELECT b.id FROM bookings b IGNORE INDEX (idx_bookings_user_status) "
+            "WHERE b.user_id = %s AND b.status = 'cancelled' ORDER BY b.booking_date DESC",
+            (user_id,),
+            "SELECT b.id FROM bookings b "
+            "WHERE b.user_id = %s AND b.status = 'cancelled' ORDER BY b.booking_date DESC",
+            (user_id,),
+        ),
+    ]
+
+
+def explain(cursor, query, params):
+    cursor.execute("EXPLAIN " + query, params)
+    columns = [column[0] for column in cursor.description]
+    rows = cursor.fetchall()
+    lines = [" | ".join(columns)]
+    for row in rows:
+        lines.append(" | ".join("" if value is None else str(value) for value in row))
+    return lines
+
+
+def time_query(cursor, query, params, runs):
+    started = time.perf_counter()
+    for _ in range(runs):
+        cursor.execute(query, params)
+        cursor.fetchall()
+    return (time.perf_counter() - started) / runs * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20, help="executions per query for timing")
+    parser.add_argument("-o", "--output", help="also write the report to this file")
+    args = parser.parse_args()
+
+    # Make sure the migrations (and therefore the indexes) are in place
+    initialize_database()
+
+    conn = get_db_pool().get_connection()
+    cursor = conn.cursor()
+    report = []
+    try:
+        for title, before_sql, before_params, after_sql, after_params in build_cases(cursor):
+            before_ms = time_query(cursor, before_sql, before_params, args.runs)
+            after_ms = time_query(cursor, after_sql, after_params, args.runs)
+            report.append(f"## {title}")
+            report.append("")
+            report.append(f"Before ({before_ms:.2f} ms/query):")
+            report.extend("    " + line for line in explain(cursor, before_sql, before_params))
+            report.append("")
+            report.append(f"After ({after_ms:.2f} ms/query):")
+            report.extend("    " + line for line in explain(cursor, after_sql, after_params))
+            report.append("")
+    finally:
+        cursor.close()
+        conn.close()
+
+    text = "\n".join(report)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as report_file:
+            report_file.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
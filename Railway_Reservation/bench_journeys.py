@@ -0,0 +1,83 @@
+"""Query time of the connecting-journey planner on a synthetic network.
+
+Builds a JourneyPlanner from randomly generated schedules (10,000 by
+default) between a few hundred stations over a few days and times plan()
+for random origin/destination pairs. No database is needed.
+
+    python bench_journeys.py
+    python bench_journeys.py --schedules 50000 --stations 800 --changes 3
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from main import JourneyLeg, JourneyPlanner, journey_minutes
+
+
+def synthetic_legs(schedules, stations, days, rng):
+    start = journey_minutes(datetime(2026, 1, 1))
+    # A few busy hubs, as on a real network
+    hubs = list(range(1, max(stations // 20, 2) + 1))
+    legs = []
+    for schedule_id in range(1, schedules + 1):
+        origin = rng.choice(hubs) if rng.random() < 0.3 else rng.randint(1, stations)
+        destination = rng.choice(hubs) if rng.random() < 0.3 else rng.randint(1, stations)
+        if origin == destination:
+            destination = destination % stations + 1
+        depart = start + rng.randrange(days * 24 * 60)
+        arrive = depart + rng.randint(60, 12 * 60)
+        sleeper = round(rng.uniform(200, 1500), 2)
+        legs.append(JourneyLeg(schedule_id, schedule_id, origin, destination, depart, arrive,
+                               (sleeper, round(sleeper * 2.2, 2), round(sleeper * 0.4, 2))))
+    return legs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--schedules", type=int, default=10000, help="schedules in the network")
+    parser.add_argument("--stations", type=int, default=300, help="stations in the network")
+    parser.add_argument("--days", type=int, default=3, help="days the schedules are spread over")
+    parser.add_argument("--changes", type=int, default=2, help="most train changes per journey")
+    parser.add_argument("--min-connection", type=int, default=30, help="minimum connection minutes")
+    parser.add_argument("--queries", type=int, default=500, help="origin/destination pairs to plan")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    legs = synthetic_legs(args.schedules, args.stations, args.days, rng)
+
+    started = time.perf_counter()
+    planner = JourneyPlanner(legs, min_connection=args.min_connection)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    depart_after = datetime(2026, 1, 1) + timedelta(hours=6)
+    timings = []
+    found = 0
+    options = 0
+    for _ in range(args.queries):
+        origin = rng.randint(1, args.stations)
+        destination = rng.randint(1, args.stations)
+        if origin == destination:
+            continue
+        started = time.perf_counter()
+        itineraries = planner.plan(origin, destination, depart_after, "sleeper",
+                                   max_changes=args.changes, window=18 * 60)
+        timings.append((time.perf_counter() - started) * 1000)
+        if itineraries:
+            found += 1
+            options += len(itineraries)
+
+    timings.sort()
+    print(f"network: {len(planner)} schedules, {args.stations} stations, {args.days} days")
+    print(f"index build: {build_ms:.1f} ms")
+    print(f"queries: {len(timings)}, up to {args.changes} changes, "
+          f"{args.min_connection} min connections")
+    print(f"  answered: {found} ({options / max(found, 1):.1f} itineraries each)")
+    print(f"  mean {statistics.mean(timings):.2f} ms | p50 {timings[len(timings) // 2]:.2f} ms | "
+          f"p95 {timings[int(len(timings) * 0.95)]:.2f} ms | max {timings[-1]:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
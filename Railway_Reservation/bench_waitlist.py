@@ -0,0 +1,199 @@
+"""Waitlist promotion latency under mass cancellations.
+
+Fills one schedule/class, queues a waitlist behind it and then cancels
+many confirmed bookings at once from several threads. Every cancellation
+promotes waiting bookings in its own transaction, so its latency is the
+time from the cancel to the promoted bookings being confirmed. Runs
+against the database configured in .env with a throwaway user, train and
+schedule that are deleted again afterwards.
+
+    python bench_waitlist.py
+    python bench_waitlist.py --seats 2000 --waitlist 1000 --cancellations 800 --threads 16
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+
+from main import BookingEngine, FareLedger, SeatsUnavailableError, initialize_database
+from stress_booking import setup_mysql
+
+
+def fill(engine, conn, context, seat_class, max_party, rng):
+    """Book the class full in blocks of parties; returns the booking ids"""
+    booking_ids = []
+    while True:
+        parties = [
+            [{"name": f"P{i}", "age": 30, "gender": "other"} for i in range(rng.randint(1, max_party))]
+            for _ in range(50)
+        ]
+        try:
+            booked = engine.book_group(conn, context["user_id"], context["schedule_id"], seat_class,
+                                       parties, 100.0, "upi")
+        except SeatsUnavailableError as e:
+            if e.available == 0:
+                return booking_ids
+            # Top up the last few seats one at a time
+            booked = [engine.book(conn, context["user_id"], context["schedule_id"], seat_class,
+                                  [{"name": "P0", "age": 30, "gender": "other"}], 100.0, "upi")
+                      for _ in range(e.available)]
+        booking_ids.extend(booking_id for booking_id, _ in booked)
+
+
+def cancel(engine, conn, booking_id):
+    """Cancel one booking with deadlock retries; returns (seconds, promoted bookings)"""
+    started = time.perf_counter()
+    attempt = 0
+    while True:
+        cursor = conn.cursor()
+        try:
+            conn.start_transaction()
+            promoted = engine.cancel(cursor, booking_id)
+            conn.commit()
+            return time.perf_counter() - started, len(promoted)
+        except Exception as e:
+            conn.rollback()
+            if not engine.is_retryable(e) or attempt >= engine.max_retries:
+                raise
+            attempt += 1
+            engine.retries += 1
+            time.sleep(engine.backoff * attempt * random.uniform(0.5, 1.5))
+        finally:
+            cursor.close()
+
+
+def check(conn, context, seat_class):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT total_seats, sold_seats FROM seat_inventory WHERE schedule_id = %s AND seat_class = %s",
+            (context["schedule_id"], seat_class)
+        )
+        total_seats, sold_seats = cursor.fetchone()
+        cursor.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT p.seat_number) FROM passengers p JOIN bookings b ON p.booking_id = b.id "
+            "WHERE b.schedule_id = %s AND b.status = 'confirmed' AND p.seat_class = %s",
+            (context["schedule_id"], seat_class)
+        )
+        booked, distinct_seats = cursor.fetchone()
+        cursor.execute(
+            "SELECT COUNT(*), COALESCE(MIN(passenger_count), 0) FROM waitlist WHERE schedule_id = %s",
+            (context["schedule_id"],)
+        )
+        waiting, smallest_waiting = cursor.fetchone()
+        cursor.execute("SELECT COUNT(*) FROM notifications WHERE user_id = %s", (context["user_id"],))
+        notifications = cursor.fetchone()[0]
+        cursor.execute("SELECT id FROM bookings WHERE schedule_id = %s", (context["schedule_id"],))
+        schedule_bookings = {row[0] for row in cursor.fetchall()}
+        ledger_mismatches = [
+            entry for entry in FareLedger.reconcile(cursor) if entry["booking_id"] in schedule_bookings
+        ]
+    finally:
+        cursor.close()
+    # A waiting booking that fits in the free seats should already have been promoted
+    stranded = waiting and smallest_waiting <= total_seats - sold_seats
+    return {
+        "total_seats": total_seats, "sold_seats": sold_seats, "booked": booked,
+        "distinct_seats": distinct_seats, "waiting": waiting, "stranded": bool(stranded),
+        "notifications": notifications, "ledger_mismatches": len(ledger_mismatches),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seats", type=int, default=1000, help="seats in the contested class")
+    parser.add_argument("--waitlist", type=int, default=500, help="bookings queued once the class is full")
+    parser.add_argument("--cancellations", type=int, default=400, help="confirmed bookings cancelled at once")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--max-party", type=int, default=4)
+    parser.add_argument("--seat-class", default="sleeper", choices=["sleeper", "ac", "general"])
+    args = parser.parse_args()
+
+    initialize_database()
+    context, connect, cleanup = setup_mysql(args.seats, args.threads, 2)
+    engine = BookingEngine(max_retries=20, backoff=0.01, waitlist_limit=args.waitlist)
+    rng = random.Random(7)
+    try:
+        conn = connect()
+        try:
+            booking_ids = fill(engine, conn, context, args.seat_class, args.max_party, rng)
+            started = time.perf_counter()
+            for _ in range(args.waitlist):
+                engine.join_waitlist(
+                    conn, context["user_id"], context["schedule_id"], args.seat_class,
+                    [{"name": f"W{i}", "age": 30, "gender": "other"} for i in range(rng.randint(1, args.max_party))],
+                    100.0, "upi"
+                )
+            join_ms = (time.perf_counter() - started) / max(args.waitlist, 1) * 1000
+        finally:
+            conn.close()
+
+        pending = rng.sample(booking_ids, min(args.cancellations, len(booking_ids)))
+        pending_lock = threading.Lock()
+        latencies = []
+        promoted = [0]
+        failures = []
+
+        def worker():
+            conn = connect()
+            try:
+                while True:
+                    with pending_lock:
+                        if not pending:
+                            return
+                        booking_id = pending.pop()
+                    try:
+                        seconds, count = cancel(engine, conn, booking_id)
+                    except Exception as e:
+                        failures.append(e)
+                        continue
+                    with pending_lock:
+                        latencies.append(seconds * 1000)
+                        promoted[0] += count
+            finally:
+                conn.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(args.threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        conn = connect()
+        try:
+            result = check(conn, context, args.seat_class)
+        finally:
+            conn.close()
+    finally:
+        cleanup()
+
+    latencies.sort()
+    print(f"Filled:             {len(booking_ids)} bookings, {args.seats} seats")
+    print(f"Waitlist joins:     {args.waitlist} ({join_ms:.2f} ms each)")
+    print(f"Cancellations:      {len(latencies)} on {args.threads} threads in {elapsed:.2f}s "
+          f"({len(latencies) / elapsed:.0f}/sec), {len(failures)} failed, {engine.retries} retries")
+    print(f"Promoted:           {promoted[0]} bookings ({promoted[0] / elapsed:.0f}/sec), "
+          f"{result['waiting']} still waiting")
+    if latencies:
+        print(f"Cancel + promote:   mean {statistics.mean(latencies):.1f} ms, "
+              f"p50 {latencies[len(latencies) // 2]:.1f} ms, "
+              f"p95 {latencies[int(len(latencies) * 0.95)]:.1f} ms, max {latencies[-1]:.1f} ms")
+    print(f"Inventory:          {result['sold_seats']}/{result['total_seats']} sold, "
+          f"{result['booked']} passengers confirmed, {result['distinct_seats']} distinct seats")
+    print(f"Notifications:      {result['notifications']}")
+    print(f"Fare ledger:        {result['ledger_mismatches']} inconsistent booking(s)")
+
+    ok = (not failures
+          and result["sold_seats"] == result["booked"] == result["distinct_seats"] <= result["total_seats"]
+          and not result["stranded"]
+          and result["notifications"] == args.waitlist - result["waiting"]
+          and result["ledger_mismatches"] == 0)
+    print("Invariants:         " + ("OK" if ok else "VIOLATED"))
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
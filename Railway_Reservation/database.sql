@@ -82,3 +82,22 @@ CREATE TABLE IF NOT EXISTS notifications (
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
 
+-- Seat inventory table (sold seats per schedule and class)
+CREATE TABLE IF NOT EXISTS seat_inventory (
+    schedule_id INT NOT NULL,
+    seat_class ENUM('sleeper', 'ac', 'general') NOT NULL,
+    total_seats INT NOT NULL,
+    sold_seats INT NOT NULL DEFAULT 0,
+    seat_map BLOB,
+    PRIMARY KEY (schedule_id, seat_class),
+    FOREIGN KEY (schedule_id) REFERENCES schedules(id) ON DELETE CASCADE
+);
+
+-- Schema migrations table
+-- Indexes and later schema changes are applied by the versioned migrations
+-- in main.py (SCHEMA_MIGRATIONS) the first time the application starts.
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INT PRIMARY KEY,
+    description VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -1,4 +1,14 @@
+import argparse
+import atexit
+import base64
+import bisect
+import csv
+import gzip
+import hashlib
+import importlib
+import json
 import math
+import multiprocessing
 import os
 import re
 import bcrypt
@@ -6,19 +16,109 @@ import mysql.connector
 from dotenv import load_dotenv
 import customtkinter as ctk
 from customtkinter import CTkEntry
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from decimal import Decimal
 import random
 import string
+import subprocess
+import sys
+import threading
+import time
+import zipfile
 import tkinter as tk
 from tkinter import ttk, messagebox, StringVar, IntVar
-from tkcalendar import DateEntry
 from PIL import Image, ImageTk
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import numpy as np
 import platform
+import queue
 from CTkMessagebox import CTkMessagebox
 
+# Start-up profiling
+class StartupProfile:
+    """Durations of the start-up phases, printed with --profile-startup."""
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.enabled = False
+        self.phases = []
+    
+    def record(self, name, started):
+        self.phases.append((name, time.perf_counter() - started))
+    
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, started)
+    
+    @staticmethod
+    def import_times(limit=12):
+        """Cumulative import time of main.py's own imports, slowest first.
+        
+        Measured with python -X importtime in a fresh interpreter, since
+        this process has imported everything already.
+        """
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import main"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True
+        )
+        imports = []
+        total = None
+        for line in result.stderr.splitlines():
+            parts = line.split("|")
+            if not line.startswith("import time:") or len(parts) != 3 or not parts[1].strip().isdigit():
+                continue
+            name = parts[2][1:]
+            depth = (len(name) - len(name.lstrip())) // 2
+            if depth == 0 and name == "main":
+                total = int(parts[1]) / 1000
+            elif depth == 1:
+                imports.append((name.strip(), int(parts[1]) / 1000))
+        imports.sort(key=lambda entry: entry[1], reverse=True)
+        return total, imports[:limit]
+    
+    def report(self):
+        print("Startup profile")
+        total, imports = self.import_times()
+        if total is not None:
+            print(f"  Importing main.py: {total:8.1f} ms")
+            for name, ms in imports:
+                print(f"    {name:<40}{ms:8.1f} ms")
+        print("  Phases:")
+        for name, seconds in self.phases:
+            print(f"    {name:<40}{seconds * 1000:8.1f} ms")
+        print(f"  Login screen up {(time.perf_counter() - self.started) * 1000:.1f} ms after the imports")
+
+STARTUP_PROFILE = StartupProfile()
+
+# Deferred imports
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access.
+
+    matplotlib and tkcalendar are a large share of start-up time but are
+    only needed once a chart or a date picker is shown. PIL is not deferred:
+    customtkinter and CTkMessagebox import it anyway and the window icon and
+    splash logo use it straight away.
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+    
+    def __getattr__(self, attribute):
+        if self._module is None:
+            started = time.perf_counter()
+            self._module = importlib.import_module(self._name)
+            STARTUP_PROFILE.record(f"import {self._name} (deferred)", started)
+        return getattr(self._module, attribute)
+
+tkcalendar = LazyModule("tkcalendar")
+plt = LazyModule("matplotlib.pyplot")
+backend_tkagg = LazyModule("matplotlib.backends.backend_tkagg")
+
 # Load environment variables
 load_dotenv()
 
@@ -50,28 +150,380 @@ THEME_COLORS = {
     }
 }
 
+# Database connection pool
+class PooledConnection:
+    """Wrapper around a pooled MySQL connection.
+
+    Behaves like a regular mysql.connector connection, except that close()
+    hands the connection back to the pool instead of tearing down the socket.
+    Can also be used as a context manager.
+    """
+    def __init__(self, pool, raw_connection, created_at):
+        self._pool = pool
+        self._raw = raw_connection
+        self._created_at = created_at
+        self._last_used = time.monotonic()
+        self._checked_out = False
+    
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            try:
+                self._raw.rollback()
+            except Exception:
+                pass
+        self.close()
+        return False
+    
+    @property
+    def raw(self):
+        return self._raw
+    
+    @property
+    def age(self):
+        return time.monotonic() - self._created_at
+    
+    def close(self):
+        if self._checked_out:
+            self._checked_out = False
+            self._pool.release(self)
+    
+    def discard(self):
+        """Close the connection instead of returning it, e.g. after abandoning an unread result"""
+        if self._checked_out:
+            self._checked_out = False
+            self._pool.discard(self)
+
+
+class ConnectionPool:
+    """Fixed-size pool of MySQL connections.
+
+    Connections are health-checked when they are checked out after sitting
+    idle, recycled once they exceed max_age seconds, and callers block (up
+    to timeout seconds) when every connection is in use.
+    """
+    def __init__(self, size=5, max_age=1800, timeout=10, ping_interval=30, **connect_args):
+        self.size = max(1, int(size))
+        self.max_age = max_age
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self.connect_args = connect_args
+        self._idle = []
+        self._open = 0
+        self._lock = threading.Condition()
+        self.stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "reconnects": 0,
+            "created": 0,
+            "recycled": 0,
+        }
+    
+    def _connect(self):
+        raw = mysql.connector.connect(**self.connect_args)
+        with self._lock:
+            self.stats["created"] += 1
+        return PooledConnection(self, raw, time.monotonic())
+    
+    def _discard(self, conn):
+        try:
+            conn.raw.close()
+        except Exception:
+            pass
+    
+    def _is_healthy(self, conn):
+        if self.max_age and conn.age > self.max_age:
+            with self._lock:
+                self.stats["recycled"] += 1
+            return False
+        if time.monotonic() - conn._last_used < self.ping_interval:
+            return True
+        try:
+            conn.raw.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+    
+    def get_connection(self):
+        """Check out a connection, opening or waiting for one as needed"""
+        deadline = time.monotonic() + self.timeout
+        with self._lock:
+            self.stats["checkouts"] += 1
+            waited = False
+            while not self._idle and self._open >= self.size:
+                if not waited:
+                    self.stats["waits"] += 1
+                    waited = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise mysql.connector.errors.PoolError(
+                        "Timed out waiting for a database connection")
+                self._lock.wait(remaining)
+            conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                self._open += 1
+        
+        if conn is not None and not self._is_healthy(conn):
+            self._discard(conn)
+            with self._lock:
+                self.stats["reconnects"] += 1
+            conn = None
+        
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._lock:
+                    self._open -= 1
+                    self._lock.notify()
+                raise
+        
+        conn._checked_out = True
+        return conn
+    
+    def release(self, conn):
+        """Return a connection to the pool, dropping any open transaction"""
+        try:
+            if conn.raw.in_transaction:
+                conn.raw.rollback()
+            conn._last_used = time.monotonic()
+            healthy = not (self.max_age and conn.age > self.max_age)
+        except Exception:
+            healthy = False
+        
+        with self._lock:
+            if healthy:
+                self._idle.append(conn)
+            else:
+                self._open -= 1
+                if self.max_age and conn.age > self.max_age:
+                    self.stats["recycled"] += 1
+            self._lock.notify()
+        
+        if not healthy:
+            self._discard(conn)
+    
+    def discard(self, conn):
+        """Close a checked-out connection and free its slot"""
+        with self._lock:
+            self._open -= 1
+            self._lock.notify()
+        self._discard(conn)
+    
+    def close_all(self):
+        """Close every idle connection, e.g. on application shutdown"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for conn in idle:
+            self._discard(conn)
+    
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["open"] = self._open
+            stats["idle"] = len(self._idle)
+            stats["size"] = self.size
+        return stats
+
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+def get_db_pool():
+    """Return the process-wide connection pool, creating it on first use"""
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                _db_pool = ConnectionPool(
+                    size=int(os.getenv("MYSQL_POOL_SIZE", "5")),
+                    max_age=int(os.getenv("MYSQL_POOL_MAX_AGE", "1800")),
+                    timeout=int(os.getenv("MYSQL_POOL_TIMEOUT", "10")),
+                    ping_interval=int(os.getenv("MYSQL_POOL_PING_INTERVAL", "30")),
+                    host=os.getenv("MYSQL_HOST"),
+                    user=os.getenv("MYSQL_USER"),
+                    password=os.getenv("MYSQL_PASSWORD"),
+                    database=os.getenv("MYSQL_DATABASE"),
+                    port=int(os.getenv("MYSQL_PORT", "3306"))
+                )
+    return _db_pool
+
 # Database connection
 def get_db_connection():
     try:
-        connection = mysql.connector.connect(
-            host=os.getenv("MYSQL_HOST"),
-            user=os.getenv("MYSQL_USER"),
-            password=os.getenv("MYSQL_PASSWORD"),
-            database=os.getenv("MYSQL_DATABASE"),
-            port=int(os.getenv("MYSQL_PORT", "3306"))
-        )
-        return connection
+        return get_db_pool().get_connection()
     except mysql.connector.Error as err:
         CTkMessagebox(title="Database Connection Error", 
                      message=f"Failed to connect to database: {err}",
                      icon="cancel")
         return None
 
+# Schema migrations
+# Each entry is (version, description, statements). A statement is either
+# SQL or a callable taking the cursor. Versions are applied in order by
+# initialize_database and recorded in schema_migrations, so add new entries
+# at the end and never edit one that has shipped.
+SCHEMA_MIGRATIONS = [
+    (1, "Indexes for booking search, revenue date ranges and user bookings", [
+        """ALTER TABLE schedules
+           ADD COLUMN source_key VARCHAR(100) AS (LOWER(source)) STORED,
+           ADD COLUMN destination_key VARCHAR(100) AS (LOWER(destination)) STORED""",
+        "CREATE INDEX idx_schedules_route_date ON schedules (source_key, destination_key, departure_date, departure_time)",
+        "CREATE INDEX idx_schedules_departure ON schedules (departure_date, departure_time)",
+        "CREATE INDEX idx_bookings_booking_date ON bookings (booking_date)",
+        "CREATE INDEX idx_bookings_status_date ON bookings (status, booking_date)",
+        "CREATE INDEX idx_bookings_user_status ON bookings (user_id, status, booking_date)",
+    ]),
+    (2, "Daily revenue rollup", [
+        lambda cursor: RevenueRollup.create_table(cursor),
+        lambda cursor: RevenueRollup.rebuild(cursor),
+    ]),
+    (3, "Per-passenger fare ledger", [
+        lambda cursor: FareLedger.create_table(cursor),
+        lambda cursor: FareLedger.backfill(cursor),
+    ]),
+    (4, "Search indexes for trains, bookings, passengers and users", [
+        # With stopwords on, ngram drops every bigram that contains one
+        # (e.g. any bigram with an "a"), so build these indexes without them
+        "SET SESSION innodb_ft_enable_stopword = OFF",
+        "ALTER TABLE trains ADD FULLTEXT INDEX ft_trains_search (train_number, train_name) WITH PARSER ngram",
+        "ALTER TABLE users ADD FULLTEXT INDEX ft_users_search (name, email) WITH PARSER ngram",
+        "ALTER TABLE passengers ADD FULLTEXT INDEX ft_passengers_name (name) WITH PARSER ngram",
+        "SET SESSION innodb_ft_enable_stopword = ON",
+        "CREATE INDEX idx_trains_name ON trains (train_name)",
+        "CREATE INDEX idx_users_name ON users (name)",
+        "CREATE INDEX idx_passengers_name ON passengers (name)",
+    ]),
+    (5, "Watermarks for incremental analytics exports", [
+        """CREATE TABLE IF NOT EXISTS export_watermarks (
+               dataset VARCHAR(50) PRIMARY KEY,
+               last_id BIGINT NOT NULL,
+               last_rows BIGINT NOT NULL DEFAULT 0,
+               exported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+           )""",
+    ]),
+    (6, "Version counter for the trains and stations cache", [
+        lambda cursor: ReferenceData.create_table(cursor),
+    ]),
+    (7, "Station master table referenced by schedules", [
+        lambda cursor: Stations.create_table(cursor),
+        """ALTER TABLE schedules
+           ADD COLUMN source_station_id INT NULL,
+           ADD COLUMN destination_station_id INT NULL""",
+        "CREATE INDEX idx_schedules_station_route ON schedules (source_station_id, destination_station_id, departure_date, departure_time)",
+        "CREATE INDEX idx_schedules_destination_station ON schedules (destination_station_id)",
+        lambda cursor: Stations.backfill(cursor),
+        """ALTER TABLE schedules
+           ADD CONSTRAINT fk_schedules_source_station FOREIGN KEY (source_station_id) REFERENCES stations(id),
+           ADD CONSTRAINT fk_schedules_destination_station FOREIGN KEY (destination_station_id) REFERENCES stations(id)""",
+    ]),
+    (8, "Intermediate stops and segment seat inventory", [
+        lambda cursor: ScheduleStops.create_table(cursor),
+        "ALTER TABLE seat_inventory ADD COLUMN segments INT NOT NULL DEFAULT 1",
+        """ALTER TABLE bookings
+           ADD COLUMN from_stop INT NULL,
+           ADD COLUMN to_stop INT NULL,
+           ADD COLUMN boarding VARCHAR(100) NULL,
+           ADD COLUMN alighting VARCHAR(100) NULL""",
+        lambda cursor: ScheduleStops.backfill(cursor),
+    ]),
+    (9, "Waitlist queue and unread notification index", [
+        "ALTER TABLE bookings MODIFY COLUMN status ENUM('confirmed', 'cancelled', 'waitlisted') DEFAULT 'confirmed'",
+        lambda cursor: Waitlist.create_table(cursor),
+        "CREATE INDEX idx_notifications_user_unread ON notifications (user_id, is_read, created_at)",
+    ]),
+    (10, "PNR node leases", [
+        lambda cursor: PnrNodeLease.create_table(cursor),
+    ]),
+    # Booking search now seeks schedule_stops by station, so nothing filters
+    # schedules on these keys any more. fk_schedules_source_station needs an
+    # index of its own once the route index is gone.
+    (11, "Drop the unused schedule route indexes", [
+        """ALTER TABLE schedules
+           ADD INDEX idx_schedules_source_station (source_station_id),
+           DROP INDEX idx_schedules_station_route""",
+        "DROP INDEX idx_schedules_route_date ON schedules",
+    ]),
+]
+
+# MySQL errors that mean a statement's change is already in place
+_MIGRATION_ALREADY_APPLIED = (
+    1060,  # duplicate column name
+    1061,  # duplicate key name
+    1050,  # table already exists
+    1826,  # duplicate foreign key constraint name
+    1091,  # can't drop a key that does not exist
+)
+
+def run_schema_migrations(cursor):
+    """Apply pending SCHEMA_MIGRATIONS and return the resulting schema version"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+    current_version = cursor.fetchone()[0]
+    
+    for version, description, statements in SCHEMA_MIGRATIONS:
+        if version <= current_version:
+            continue
+        for statement in statements:
+            try:
+                if callable(statement):
+                    statement(cursor)
+                else:
+                    cursor.execute(statement)
+            except mysql.connector.Error as err:
+                if err.errno not in _MIGRATION_ALREADY_APPLIED:
+                    raise
+        cursor.execute(
+            "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+            (version, description)
+        )
+        current_version = version
+    
+    return current_version
+
 # Initialize database and tables
-def initialize_database():
-    connection = get_db_connection()
-    if connection:
-        cursor = connection.cursor()
+def stored_schema_version(cursor):
+    """Latest applied SCHEMA_MIGRATIONS version, or 0 on a fresh database"""
+    try:
+        cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+    except mysql.connector.Error as err:
+        if err.errno == 1146:  # table doesn't exist
+            return 0
+        raise
+    return cursor.fetchone()[0]
+
+def bootstrap_database(progress=None):
+    """Create the tables, migrations and sample data unless they are current.
+    
+    On a warm start, where schema_migrations already holds the latest
+    version, this is a single query. Returns True when the schema was
+    brought up to date, False when that was skipped. progress(fraction,
+    text) is called as the steps start. Raises on database errors so it can
+    run on a worker.
+    """
+    def report(fraction, text):
+        if progress:
+            progress(fraction, text)
+    
+    connection = get_db_pool().get_connection()
+    cursor = connection.cursor()
+    try:
+        if stored_schema_version(cursor) == SCHEMA_MIGRATIONS[-1][0]:
+            return False
+        
+        report(0.3, "Creating tables...")
         
         # Create tables if they don't exist
         cursor.execute('''
@@ -160,6 +612,12 @@ def initialize_database():
             )
         ''')
         
+        SeatInventory.create_table(cursor)
+        report(0.5, "Applying schema migrations...")
+        run_schema_migrations(cursor)
+        
+        report(0.7, "Adding sample data...")
+        
         # Insert sample admin and users if they don't exist
         sample_users = [
             ("Admin User", "sivaprakash7223@gmail.com", "siva@2006", True),
@@ -169,12 +627,17 @@ def initialize_database():
             ("Rajasekar", "rajasekar7223@gmail.com", "rjk@2006", False)
         ]
         
-        for name, email, password, is_admin in sample_users:
-            # Check if user already exists
-            cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
-            if not cursor.fetchone():
-                # Hash the password
-                hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+        # Only hash (in parallel) the passwords of users that are missing
+        placeholders = ", ".join(["%s"] * len(sample_users))
+        cursor.execute(
+            f"SELECT email FROM users WHERE email IN ({placeholders})",
+            tuple(email for _, email, _, _ in sample_users)
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        missing = [user for user in sample_users if user[1] not in existing]
+        if missing:
+            hashed_passwords = get_password_hasher().hash_many([password for _, _, password, _ in missing])
+            for (name, email, _, is_admin), hashed_password in zip(missing, hashed_passwords):
                 cursor.execute(
                     "INSERT INTO users (name, email, password, is_admin) VALUES (%s, %s, %s, %s)",
                     (name, email, hashed_password, is_admin)
@@ -195,17 +658,391 @@ def initialize_database():
                     (train_number, train_name, sleeper, ac, general)
                 )
         
+        SeatInventory.backfill(cursor)
+        
         connection.commit()
+        return True
+    finally:
         cursor.close()
         connection.close()
+
+def initialize_database():
+    """bootstrap_database() for the command-line tools; reports errors in a message box"""
+    try:
+        bootstrap_database()
         return True
-    return False
+    except mysql.connector.Error as err:
+        CTkMessagebox(title="Database Connection Error", 
+                     message=f"Failed to connect to database: {err}",
+                     icon="cancel")
+        return False
+
+# PNR generation
+class PnrGenerator:
+    """Unique, time-ordered 10-character PNRs that need no database round trip.
+
+    A PNR is nine base-36 digits packing (seconds since EPOCH, node,
+    sequence) followed by a Luhn mod 36 check digit. The timestamp leads, so
+    PNRs sort in booking order and new ones are appended at the right edge
+    of the pnr index instead of landing on random pages. PNRs are unique as
+    long as every running instance has its own node number (0-63), either
+    PNR_NODE or one leased from the database with PnrNodeLease. The sequence
+    allows 512 PNRs per second per node; a burst beyond that borrows the
+    next second rather than waiting for it.
+    """
+    ALPHABET = string.digits + string.ascii_uppercase
+    EPOCH = 1704067200  # 2024-01-01 00:00:00 UTC; 31 bits of seconds last until 2092
+    NODE_BITS = 6
+    SEQUENCE_BITS = 9
+    DIGITS = 9
+    
+    def __init__(self, node, clock=time.time):
+        self._lock = threading.Lock()
+        self.set_node(node)
+        self.clock = clock
+        self._second = -1
+        self._sequence = 0
+    
+    def set_node(self, node):
+        if not 0 <= node < 1 << self.NODE_BITS:
+            raise ValueError(f"PNR node must be between 0 and {(1 << self.NODE_BITS) - 1}")
+        with self._lock:
+            self.node = node
+    
+    def next(self):
+        with self._lock:
+            # Never step back, even if the system clock does
+            second = max(int(self.clock()) - self.EPOCH, self._second)
+            if second == self._second:
+                self._sequence += 1
+                if self._sequence >> self.SEQUENCE_BITS:
+                    second += 1
+                    self._sequence = 0
+            else:
+                self._sequence = 0
+            self._second = second
+            value = (((second << self.NODE_BITS) | self.node) << self.SEQUENCE_BITS) | self._sequence
+        
+        digits = []
+        for _ in range(self.DIGITS):
+            value, digit = divmod(value, 36)
+            digits.append(self.ALPHABET[digit])
+        payload = "".join(reversed(digits))
+        return payload + self.check_digit(payload)
+    
+    @classmethod
+    def check_digit(cls, payload):
+        """Luhn mod 36 check character, which catches any single wrong
+        character and most swaps of adjacent ones"""
+        total = 0
+        factor = 2
+        for char in reversed(payload):
+            addend = factor * cls.ALPHABET.index(char)
+            total += addend // 36 + addend % 36
+            factor = 3 - factor
+        return cls.ALPHABET[-total % 36]
+    
+    @classmethod
+    def is_valid(cls, pnr):
+        """True for a well-formed PNR from this generator"""
+        return (
+            len(pnr) == cls.DIGITS + 1
+            and all(char in cls.ALPHABET for char in pnr)
+            and cls.check_digit(pnr[:-1]) == pnr[-1]
+        )
+    
+    @classmethod
+    def issued_at(cls, pnr):
+        """Approximate time a PNR from this generator was issued"""
+        value = int(pnr[:-1], 36)
+        return datetime.fromtimestamp((value >> (cls.NODE_BITS + cls.SEQUENCE_BITS)) + cls.EPOCH)
+
+class PnrNodeLease:
+    """A PNR node number leased from the pnr_nodes table.
+    
+    The table holds one row per node. An instance claims a free or expired
+    row and a background thread renews it every LEASE_SECONDS / 4, claiming
+    a new node if the old one was lost. The lease counts as lost locally
+    once a renewal is LEASE_SECONDS / 2 overdue, well before another
+    instance may take the row over, so two running instances never hold the
+    same node.
+    """
+    LEASE_SECONDS = 60
+    
+    def __init__(self, owner=None, lease_seconds=LEASE_SECONDS):
+        self.owner = (owner or f"{platform.node()}:{os.getpid()}")[:100]
+        self.lease_seconds = lease_seconds
+        self.node = None
+        self._renewed = None
+        self._renewer = None
+        self._stop = threading.Event()
+        self._claim_lock = threading.Lock()
+    
+    @staticmethod
+    def create_table(cursor):
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS pnr_nodes (
+                node TINYINT UNSIGNED PRIMARY KEY,
+                owner VARCHAR(100) NULL,
+                heartbeat TIMESTAMP NULL
+            )
+        ''')
+        cursor.executemany(
+            "INSERT IGNORE INTO pnr_nodes (node) VALUES (%s)",
+            [(node,) for node in range(1 << PnrGenerator.NODE_BITS)]
+        )
+    
+    def held(self):
+        return (
+            self.node is not None
+            and time.monotonic() - self._renewed < self.lease_seconds / 2
+        )
+    
+    def claim(self):
+        """Lease a free node, or the one whose holder stopped renewing first"""
+        with self._claim_lock:
+            # Another thread may have claimed one while this one waited
+            if self.held():
+                return self.node
+            return self._claim()
+    
+    def _claim(self):
+        started = time.monotonic()
+        connection = get_db_pool().get_connection()
+        cursor = connection.cursor()
+        try:
+            connection.start_transaction()
+            cursor.execute(
+                "SELECT node FROM pnr_nodes "
+                "WHERE owner IS NULL OR heartbeat < NOW() - INTERVAL %s SECOND "
+                "ORDER BY heartbeat IS NOT NULL, heartbeat, node LIMIT 1 FOR UPDATE",
+                (self.lease_seconds,)
+            )
+            row = cursor.fetchone()
+            if row is None:
+                connection.rollback()
+                raise RuntimeError(
+                    f"All {1 << PnrGenerator.NODE_BITS} PNR nodes are leased; "
+                    "stop an instance or set PNR_NODE"
+                )
+            node = row[0]
+            cursor.execute(
+                "UPDATE pnr_nodes SET owner = %s, heartbeat = NOW() WHERE node = %s",
+                (self.owner, node)
+            )
+            connection.commit()
+        except mysql.connector.Error:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+        self.node, self._renewed = node, started
+        if self._renewer is None:
+            self._renewer = threading.Thread(target=self._renew_loop, name="pnr-node-lease", daemon=True)
+            self._renewer.start()
+            atexit.register(self.release)
+        return node
+    
+    def renew(self):
+        """Extend the lease; returns False if another instance took the node"""
+        node, started = self.node, time.monotonic()
+        if node is None:
+            return False
+        connection = get_db_pool().get_connection()
+        cursor = connection.cursor()
+        try:
+            cursor.execute(
+                "UPDATE pnr_nodes SET heartbeat = NOW() WHERE node = %s AND owner = %s",
+                (node, self.owner)
+            )
+            renewed = cursor.rowcount == 1
+            connection.commit()
+        finally:
+            cursor.close()
+            connection.close()
+        if renewed:
+            self._renewed = started
+        elif self.node == node:
+            self.node = None
+        return renewed
+    
+    def _renew_loop(self):
+        while not self._stop.wait(self.lease_seconds / 4):
+            try:
+                if not self.renew() and not self._stop.is_set():
+                    self.claim()
+            except (mysql.connector.Error, RuntimeError) as err:
+                # held() turns False if this keeps failing
+                print(f"Error renewing PNR node lease: {err}")
+    
+    def release(self):
+        self._stop.set()
+        node, self.node = self.node, None
+        if node is None:
+            return
+        try:
+            connection = get_db_pool().get_connection()
+            cursor = connection.cursor()
+            try:
+                cursor.execute(
+                    "UPDATE pnr_nodes SET owner = NULL, heartbeat = NULL WHERE node = %s AND owner = %s",
+                    (node, self.owner)
+                )
+                connection.commit()
+            finally:
+                cursor.close()
+                connection.close()
+        except mysql.connector.Error:
+            pass  # the lease expires on its own
+
+_pnr_generator = None
+_pnr_node_lease = None
+_pnr_generator_lock = threading.Lock()
+
+def start_pnr_generator():
+    """Pick this instance's PNR node and return it.
+    
+    The node is PNR_NODE when it is set, otherwise one leased from the
+    database. Call this once at startup, before anything books, so the
+    claim does not run inside a booking transaction.
+    """
+    global _pnr_generator, _pnr_node_lease
+    with _pnr_generator_lock:
+        if _pnr_generator is None:
+            node = os.getenv("PNR_NODE")
+            if node is None:
+                lease = PnrNodeLease()
+                node = lease.claim()
+                _pnr_node_lease = lease
+            _pnr_generator = PnrGenerator(int(node))
+        return _pnr_generator.node
 
-# Helper functions
 def generate_pnr():
-    """Generate a random 10-character PNR number"""
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=10))
+    """Generate a unique, time-ordered 10-character PNR number.
+    
+    Uses the node from start_pnr_generator(). The lease renewer claims a
+    new node in the background when the lease is lost; only if that has
+    not happened yet is the node claimed again here.
+    """
+    if _pnr_generator is None:
+        if os.getenv("PNR_NODE") is None:
+            raise RuntimeError("start_pnr_generator() must run before PNRs are generated")
+        start_pnr_generator()
+    lease = _pnr_node_lease
+    if lease is not None and (not lease.held() or lease.node != _pnr_generator.node):
+        with _pnr_generator_lock:
+            _pnr_generator.set_node(lease.claim())
+    return _pnr_generator.next()
+
+# Password hashing
+def _bcrypt_hash(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+def _bcrypt_check(password, hashed):
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+class PasswordHasher:
+    """bcrypt hashing and checking on a pool of worker processes.
+
+    Each bcrypt call takes a few hundred milliseconds by design, so the
+    calls run in separate processes: the Tk thread never waits on them and
+    concurrent logins use every core. rounds is the bcrypt cost
+    (BCRYPT_ROUNDS, default 12). Hashes made at another cost still verify,
+    and needs_rehash() tells the login path to upgrade them.
+    """
+    def __init__(self, rounds=None, workers=None):
+        self.rounds = rounds or int(os.getenv("BCRYPT_ROUNDS", "12"))
+        self.workers = workers or int(os.getenv("AUTH_WORKERS", "0")) or os.cpu_count() or 1
+        self._executor = None
+        self._lock = threading.Lock()
+    
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                # Forking a process that runs Tk and worker threads isn't safe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+    
+    def warm_up(self):
+        """Start a worker process ahead of the first login"""
+        self._pool().submit(int)
+    
+    def hash(self, password):
+        return self._pool().submit(_bcrypt_hash, password, self.rounds).result()
+    
+    def hash_many(self, passwords):
+        return list(self._pool().map(_bcrypt_hash, passwords, [self.rounds] * len(passwords)))
+    
+    def verify(self, password, hashed):
+        return self._pool().submit(_bcrypt_check, password, hashed).result()
+    
+    def needs_rehash(self, hashed):
+        # bcrypt hashes look like $2b$12$<salt and hash>
+        try:
+            return int(hashed.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return False
+    
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+_password_hasher = None
+_password_hasher_lock = threading.Lock()
+
+def get_password_hasher():
+    """Return the process-wide PasswordHasher, creating it on first use"""
+    global _password_hasher
+    if _password_hasher is None:
+        with _password_hasher_lock:
+            if _password_hasher is None:
+                _password_hasher = PasswordHasher()
+    return _password_hasher
+
+def authenticate_user(email, password):
+    """Return the users row for email if password matches, else None.
+
+    Upgrades the stored hash when it was made at a different bcrypt cost.
+    No pooled connection is held while bcrypt runs, so concurrent logins
+    wait on the hashing processes rather than on the pool. Raises on
+    database errors so it can run on a worker.
+    """
+    hasher = get_password_hasher()
+    connection = get_db_pool().get_connection()
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
+        user = cursor.fetchone()
+    finally:
+        cursor.close()
+        connection.close()
+    if not user or not hasher.verify(password, user['password']):
+        return None
+    
+    if hasher.needs_rehash(user['password']):
+        new_hash = hasher.hash(password)
+        connection = get_db_pool().get_connection()
+        cursor = connection.cursor()
+        try:
+            # Skipped if the password changed since it was read
+            cursor.execute(
+                "UPDATE users SET password = %s WHERE id = %s AND password = %s",
+                (new_hash, user['id'], user['password'])
+            )
+            connection.commit()
+        finally:
+            cursor.close()
+            connection.close()
+        user['password'] = new_hash
+    return user
 
+# Helper functions
 def validate_email(email):
     """Validate email format"""
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
@@ -220,6 +1057,13 @@ def format_currency(amount):
     """Format amount as currency"""
     return f"₹{amount:,.2f}"
 
+def booking_status_style(status):
+    """Return (label, colour) for showing a booking status"""
+    return {
+        "confirmed": ("Confirmed", "#43a047"),
+        "waitlisted": ("Waitlisted", "#fb8c00"),
+    }.get(status, ("Cancelled", "#e53935"))
+
 def get_user_theme(user_id):
     """Get the theme preference for a user"""
     connection = get_db_connection()
@@ -261,61 +1105,3492 @@ def load_image(path, size=(20, 20)):
         print(f"Error loading image {path}: {e}")
         return None
 
-# Create assets directory if it doesn't exist
-os.makedirs("assets", exist_ok=True)
+# Seat inventory
+SEAT_CLASSES = ("sleeper", "ac", "general")
 
-# Main Application
-class RailwayReservationSystem:
-    def __init__(self):
-        self.app = ctk.CTk()
-        self.app.title("Railways | Modern Railway Reservation System")
-        self.app.geometry("1200x700")
-        self.app.minsize(900, 600)
-        self.app.resizable(True, True)
-        
-        # Try to set icon if file exists
-        try:
-            if platform.system() == "Windows":
-                self.app.iconbitmap("assets/train_icon.ico")
-            else:
-                logo_img = Image.open("assets/train_icon.png")
-                logo_photo = ImageTk.PhotoImage(logo_img)
-                self.app.wm_iconphoto(True, logo_photo)
-        except:
-            pass
+class CapacityConflictError(Exception):
+    """Raised when a new train capacity would leave sold seats outside it"""
+    def __init__(self, conflicts):
+        # [(schedule_id, seat_class, seats_needed), ...]
+        self.conflicts = conflicts
+        schedule_id, seat_class, seats_needed = conflicts[0]
+        super().__init__(
+            f"{len(conflicts)} schedule(s) have seats sold beyond the new capacity; "
+            f"e.g. schedule {schedule_id} needs at least {seats_needed} {seat_class} seats"
+        )
+
+
+class SeatInventory:
+    """Per-schedule, per-class sold seat counters.
+
+    Every method takes a cursor so that the counters are read and written
+    inside the caller's transaction, next to the booking rows they track.
+    """
+    @staticmethod
+    def create_table(cursor):
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS seat_inventory (
+                schedule_id INT NOT NULL,
+                seat_class ENUM('sleeper', 'ac', 'general') NOT NULL,
+                total_seats INT NOT NULL,
+                sold_seats INT NOT NULL DEFAULT 0,
+                seat_map BLOB,
+                PRIMARY KEY (schedule_id, seat_class),
+                FOREIGN KEY (schedule_id) REFERENCES schedules(id) ON DELETE CASCADE
+            )
+        ''')
+    
+    @staticmethod
+    def backfill(cursor):
+        """Create counters for schedules that don't have them yet"""
+        for seat_class in SEAT_CLASSES:
+            cursor.execute(f'''
+                INSERT INTO seat_inventory (schedule_id, seat_class, total_seats, sold_seats)
+                SELECT s.id, %s, t.total_seats_{seat_class},
+                    (SELECT COUNT(*) FROM passengers p
+                     JOIN bookings b ON p.booking_id = b.id
+                     WHERE b.schedule_id = s.id AND b.status = 'confirmed'
+                       AND p.seat_class = %s)
+                FROM schedules s
+                JOIN trains t ON s.train_id = t.id
+                LEFT JOIN seat_inventory si ON si.schedule_id = s.id AND si.seat_class = %s
+                WHERE si.schedule_id IS NULL
+            ''', (seat_class, seat_class, seat_class))
+    
+    @staticmethod
+    def create_for_schedule(cursor, schedule_id):
+        """Create the counters for a freshly inserted schedule"""
+        for seat_class in SEAT_CLASSES:
+            cursor.execute(f'''
+                INSERT INTO seat_inventory (schedule_id, seat_class, total_seats)
+                SELECT s.id, %s, t.total_seats_{seat_class}
+                FROM schedules s JOIN trains t ON s.train_id = t.id
+                WHERE s.id = %s
+            ''', (seat_class, schedule_id))
+    
+    @staticmethod
+    def resize_for_train(cursor, train_id, seats_sleeper, seats_ac, seats_general):
+        """Propagate a train's new capacity to all of its schedules.
         
-        # Set appearance mode and color theme
-        self.current_theme = "light"
-        ctk.set_appearance_mode("light")
-        ctk.set_default_color_theme("blue")
+        Raises CapacityConflictError, changing nothing, if any schedule has a
+        seat sold at or beyond its class's new capacity.
+        """
+        capacities = {"sleeper": seats_sleeper, "ac": seats_ac, "general": seats_general}
+        cursor.execute('''
+            SELECT si.schedule_id, si.seat_class, si.total_seats, si.sold_seats, si.seat_map, si.segments
+            FROM seat_inventory si JOIN schedules s ON si.schedule_id = s.id
+            WHERE s.train_id = %s
+            FOR UPDATE
+        ''', (train_id,))
+        conflicts = []
+        for row in cursor.fetchall():
+            if isinstance(row, dict):
+                row = tuple(row.values())
+            schedule_id, seat_class, total_seats, sold_seats, seat_map, segments = row
+            allocator = SeatAllocator(seat_class, total_seats, seat_map, segments, sold_seats)
+            if allocator.seats_needed() > capacities[seat_class]:
+                conflicts.append((schedule_id, seat_class, allocator.seats_needed()))
+        if conflicts:
+            raise CapacityConflictError(conflicts)
         
-        # Current user data
-        self.current_user = None
+        cursor.execute('''
+            UPDATE seat_inventory si
+            JOIN schedules s ON si.schedule_id = s.id
+            SET si.total_seats = CASE si.seat_class
+                WHEN 'sleeper' THEN %s WHEN 'ac' THEN %s ELSE %s END
+            WHERE s.train_id = %s
+        ''', (seats_sleeper, seats_ac, seats_general, train_id))
+    
+    @staticmethod
+    def get_availability(cursor, schedule_ids):
+        """Return {schedule_id: {seat_class: free_seats}} in a single query"""
+        schedule_ids = list(schedule_ids)
+        if not schedule_ids:
+            return {}
+        placeholders = ", ".join(["%s"] * len(schedule_ids))
+        cursor.execute(
+            f"SELECT schedule_id, seat_class, total_seats - sold_seats "
+            f"FROM seat_inventory WHERE schedule_id IN ({placeholders})",
+            tuple(schedule_ids)
+        )
+        availability = {}
+        for row in cursor.fetchall():
+            if isinstance(row, dict):
+                row = tuple(row.values())
+            schedule_id, seat_class, free = row
+            availability.setdefault(schedule_id, {})[seat_class] = max(int(free), 0)
+        return availability
+    
+    @staticmethod
+    def lock(cursor, schedule_id, seat_class):
+        """Lock a schedule/class row and return its SeatAllocator, or None if there is no row"""
+        cursor.execute(
+            "SELECT total_seats, sold_seats, seat_map, segments FROM seat_inventory "
+            "WHERE schedule_id = %s AND seat_class = %s FOR UPDATE",
+            (schedule_id, seat_class)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        if isinstance(row, dict):
+            row = tuple(row.values())
+        total_seats, sold_seats, seat_map, segments = row
+        return SeatAllocator(seat_class, total_seats, seat_map, segments, sold_seats)
+    
+    @staticmethod
+    def store(cursor, schedule_id, allocator):
+        """Write back a locked row's seat map; sold_seats is the busiest segment's count"""
+        cursor.execute(
+            "UPDATE seat_inventory SET sold_seats = %s, seat_map = %s "
+            "WHERE schedule_id = %s AND seat_class = %s",
+            (allocator.peak(), allocator.to_bytes(), schedule_id, allocator.seat_class)
+        )
+    
+    @staticmethod
+    def get_segment_availability(cursor, legs):
+        """Return {schedule_id: {seat_class: free_seats}} for {schedule_id: (first_stop, last_stop)}"""
+        if not legs:
+            return {}
+        placeholders = ", ".join(["%s"] * len(legs))
+        cursor.execute(
+            f"SELECT schedule_id, seat_class, total_seats, sold_seats, seat_map, segments "
+            f"FROM seat_inventory WHERE schedule_id IN ({placeholders})",
+            tuple(legs)
+        )
+        availability = {}
+        for row in cursor.fetchall():
+            if isinstance(row, dict):
+                row = tuple(row.values())
+            schedule_id, seat_class, total_seats, sold_seats, seat_map, segments = row
+            allocator = SeatAllocator(seat_class, total_seats, seat_map, segments, sold_seats)
+            first, last = legs[schedule_id]
+            availability.setdefault(schedule_id, {})[seat_class] = allocator.free_count(first, last)
+        return availability
+    
+    @staticmethod
+    def release_booking(cursor, booking_id):
+        """Give back the seats of a confirmed booking that is being cancelled.
         
-        # Initialize database
-        if not initialize_database():
-            self.app.destroy()
+        Returns [(schedule_id, allocator), ...] for the rows it released,
+        still locked, so the freed seats can be handed to the waitlist.
+        """
+        cursor.execute('''
+            SELECT b.schedule_id, b.from_stop, b.to_stop, p.seat_class, p.seat_number
+            FROM bookings b JOIN passengers p ON p.booking_id = b.id
+            WHERE b.id = %s AND b.status = 'confirmed'
+            FOR UPDATE
+        ''', (booking_id,))
+        released = {}
+        for row in cursor.fetchall():
+            if isinstance(row, dict):
+                row = tuple(row.values())
+            schedule_id, from_stop, to_stop, seat_class, seat_number = row
+            released.setdefault((schedule_id, from_stop, to_stop, seat_class), []).append(seat_number)
+        
+        freed = []
+        for (schedule_id, from_stop, to_stop, seat_class), seat_numbers in released.items():
+            allocator = SeatInventory.lock(cursor, schedule_id, seat_class)
+            if allocator is None:
+                continue
+            # Whole-route bookings have no stops recorded
+            allocator.release(
+                (seat for seat in map(allocator.parse_label, seat_numbers) if seat is not None),
+                from_stop or 0, allocator.segments if to_stop is None else to_stop,
+                count=len(seat_numbers)
+            )
+            SeatInventory.store(cursor, schedule_id, allocator)
+            freed.append((schedule_id, allocator))
+        return freed
+
+# Segment occupancy
+class SegmentTree:
+    """Seats sold on each segment of a schedule, with range adds and range maxima.
+
+    Segment k runs from stop k to stop k + 1. add(first, last, delta)
+    changes the count on segments first..last - 1 and peak(first, last)
+    returns the largest of them, both in O(log n) using lazy range adds,
+    so the seats free all the way from stop first to stop last are
+    total - peak(first, last). low(first, last) returns the smallest.
+    """
+    def __init__(self, counts):
+        self.size = len(counts)
+        self._max = [0] * (4 * max(self.size, 1))
+        self._min = [0] * (4 * max(self.size, 1))
+        self._add = [0] * (4 * max(self.size, 1))
+        if self.size:
+            self._build(1, 0, self.size, counts)
+    
+    def _build(self, node, lo, hi, counts):
+        if hi - lo == 1:
+            self._max[node] = self._min[node] = counts[lo]
             return
+        mid = (lo + hi) // 2
+        self._build(2 * node, lo, mid, counts)
+        self._build(2 * node + 1, mid, hi, counts)
+        self._max[node] = max(self._max[2 * node], self._max[2 * node + 1])
+        self._min[node] = min(self._min[2 * node], self._min[2 * node + 1])
+    
+    def add(self, first, last, delta):
+        self._update(1, 0, self.size, first, last, delta)
+    
+    def _update(self, node, lo, hi, first, last, delta):
+        if last <= lo or hi <= first:
+            return
+        if first <= lo and hi <= last:
+            self._max[node] += delta
+            self._min[node] += delta
+            self._add[node] += delta
+            return
+        mid = (lo + hi) // 2
+        self._update(2 * node, lo, mid, first, last, delta)
+        self._update(2 * node + 1, mid, hi, first, last, delta)
+        self._max[node] = max(self._max[2 * node], self._max[2 * node + 1]) + self._add[node]
+        self._min[node] = min(self._min[2 * node], self._min[2 * node + 1]) + self._add[node]
+    
+    def peak(self, first, last):
+        return self._query(1, 0, self.size, first, last, self._max, max)
+    
+    def low(self, first, last):
+        return self._query(1, 0, self.size, first, last, self._min, min)
+    
+    def _query(self, node, lo, hi, first, last, values, pick):
+        if first <= lo and hi <= last:
+            return values[node]
+        mid = (lo + hi) // 2
+        # Only descend into the halves that overlap first..last - 1
+        if last <= mid:
+            best = self._query(2 * node, lo, mid, first, last, values, pick)
+        elif first >= mid:
+            best = self._query(2 * node + 1, mid, hi, first, last, values, pick)
+        else:
+            best = pick(self._query(2 * node, lo, mid, first, last, values, pick),
+                        self._query(2 * node + 1, mid, hi, first, last, values, pick))
+        return best + self._add[node]
+
+# Seat allocation
+class SeatAllocator:
+    """Occupancy bitmaps for one schedule/class, one per segment between stops.
+
+    Bit i of segment k's bitmap is set when seat i is taken from stop k to
+    stop k + 1; seat_map stores the bitmaps back to back. Seats are grouped
+    into coaches of COACH_SIZES[seat_class] and labelled like "S3-17"
+    (sleeper coach 3, berth 17). Allocation works on the bitmaps as Python
+    ints, so finding seats costs a handful of big-int operations per seat
+    and segment instead of a scan over the passengers table. A SegmentTree
+    over the per-segment counts answers how many seats are free between
+    two stops.
+    """
+    COACH_SIZES = {"sleeper": 72, "ac": 64, "general": 90}
+    COACH_PREFIXES = {"sleeper": "S", "ac": "A", "general": "G"}
+    
+    def __init__(self, seat_class, total_seats, seat_map=None, segments=1, sold_seats=None):
+        self.seat_class = seat_class
+        self.total_seats = total_seats
+        self.coach_size = self.COACH_SIZES[seat_class]
+        self.segments = max(segments, 1)
+        data = bytes(seat_map or b"")
+        width = len(data) // self.segments
+        self.maps = [int.from_bytes(data[k * width:(k + 1) * width], "little") for k in range(self.segments)]
+        counts = [bin(occupied).count("1") for occupied in self.maps]
+        if self.segments == 1 and sold_seats is not None:
+            # Whole-route counters can predate the seat map, so they win
+            counts = [sold_seats]
+        self.sold = SegmentTree(counts)
+    
+    @staticmethod
+    def _group_starts(total_seats, coach_size, count):
+        """Bit mask of seat indexes where a group of count seats fits in one coach"""
+        if count > coach_size:
+            return 0
+        pattern = (1 << (coach_size - count + 1)) - 1
+        mask = 0
+        for coach_start in range(0, total_seats, coach_size):
+            mask |= pattern << coach_start
+        return mask
+    
+    def to_bytes(self):
+        width = (self.total_seats + 7) // 8
+        return b"".join(occupied.to_bytes(width, "little") for occupied in self.maps)
+    
+    def free_count(self, first=0, last=None):
+        """Seats free on every segment from stop first to stop last (default: whole route)"""
+        last = self.segments if last is None else last
+        return max(self.total_seats - self.sold.peak(first, last), 0)
+    
+    def peak(self):
+        """Seats sold on the busiest segment, i.e. seat_inventory.sold_seats"""
+        return max(self.sold.peak(0, self.segments), 0)
+    
+    def seats_needed(self):
+        """Smallest capacity that keeps every sold seat: past the highest one taken, and no less than peak()"""
+        taken = 0
+        for occupied in self.maps:
+            taken |= occupied
+        return max(taken.bit_length(), self.peak())
+    
+    def most_free(self):
+        """Seats free on the quietest segment; 0 means no booking of any range fits"""
+        return max(self.total_seats - self.sold.low(0, self.segments), 0)
+    
+    def allocate(self, count, first=0, last=None):
+        """Mark count seats free from stop first to stop last as taken and return their indexes.
         
-        # Show splashscreen
-        self.show_splash_screen()
-        
-    def show_splash_screen(self):
-        # Clear the window
-        for widget in self.app.winfo_children():
-            widget.destroy()
-        
-        splash_frame = ctk.CTkFrame(self.app, corner_radius=0)
-        splash_frame.pack(fill="both", expand=True)
-        
-        # Center frame
-        center_frame = ctk.CTkFrame(splash_frame, fg_color="transparent")
-        center_frame.place(relx=0.5, rely=0.5, anchor="center")
-        
-        # Logo
-        try:
-            logo_img = Image.open("assets/train_logo.png")
-            logo_img = logo_img.resize((200, 200), Image.Resampling.LANCZOS)
+        A group is kept on adjacent seats in one coach when such a run
+        exists; otherwise the lowest free seats are used.
+        """
+        last = self.segments if last is None else last
+        taken = 0
+        for occupied in self.maps[first:last]:
+            taken |= occupied
+        free = ~taken & ((1 << self.total_seats) - 1)
+        seats = None
+        
+        if count > 1:
+            runs = free
+            for offset in range(1, count):
+                runs &= free >> offset
+            runs &= self._group_starts(self.total_seats, self.coach_size, count)
+            if runs:
+                start = (runs & -runs).bit_length() - 1
+                seats = list(range(start, start + count))
+        
+        if seats is None:
+            seats = []
+            for _ in range(count):
+                lowest = free & -free
+                if not lowest:
+                    raise SeatsUnavailableError(len(seats), count)
+                seats.append(lowest.bit_length() - 1)
+                free ^= lowest
+        
+        for segment in range(first, last):
+            for seat in seats:
+                self.maps[segment] |= 1 << seat
+        self.sold.add(first, last, count)
+        return seats
+    
+    def release(self, seats, first=0, last=None, count=None):
+        """Free seats from stop first to stop last; count defaults to len(seats)"""
+        last = self.segments if last is None else last
+        seats = list(seats)
+        for segment in range(first, last):
+            for seat in seats:
+                self.maps[segment] &= ~(1 << seat)
+        self.sold.add(first, last, -(len(seats) if count is None else count))
+    
+    def label(self, seat):
+        coach, berth = divmod(seat, self.coach_size)
+        return f"{self.COACH_PREFIXES[self.seat_class]}{coach + 1}-{berth + 1}"
+    
+    def parse_label(self, label):
+        """Return the seat index for a label such as "S3-17", or None"""
+        match = re.match(r'^[A-Z](\d+)-(\d+)$', label or "")
+        if not match:
+            return None
+        coach, berth = int(match.group(1)), int(match.group(2))
+        return (coach - 1) * self.coach_size + (berth - 1)
+
+# Booking engine
+class SeatsUnavailableError(Exception):
+    """Raised when a schedule/class cannot fit the requested number of seats"""
+    def __init__(self, available, requested):
+        self.available = available
+        self.requested = requested
+        super().__init__(f"Only {available} seat(s) available, {requested} requested")
+
+
+class BookingEngine:
+    """Transactional booking path that never oversells.
+
+    The schedule's seat_inventory row is locked with SELECT ... FOR UPDATE
+    before the capacity check, so concurrent bookings for the same
+    schedule/class serialize on that row. Deadlocks and lock wait timeouts
+    roll the transaction back and retry it with a small randomized backoff.
+    When a class is full, join_waitlist() queues the booking instead, and
+    cancel() hands freed seats to the queue in the cancelling transaction.
+    """
+    RETRYABLE_ERRNOS = (1205, 1213)  # lock wait timeout, deadlock
+    
+    def __init__(self, max_retries=5, backoff=0.05, waitlist_limit=100):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.waitlist_limit = waitlist_limit
+        self.retries = 0
+    
+    def is_retryable(self, error):
+        return getattr(error, "errno", None) in self.RETRYABLE_ERRNOS
+    
+    def book(self, connection, user_id, schedule_id, seat_class, passengers, fare, payment_method, stops=None):
+        """Book all passengers on one schedule/class; returns (booking_id, pnr)"""
+        return self._run(connection, lambda: self._book_group(
+            connection, user_id, schedule_id, seat_class, [passengers], fare, payment_method, stops
+        )[0])
+    
+    def book_group(self, connection, user_id, schedule_id, seat_class, parties, fare, payment_method, stops=None):
+        """Book several parties on one schedule/class in a single transaction.
+        
+        Each party (a list of passengers) becomes its own booking with its
+        own PNR and is seated together where possible. The inventory row is
+        locked once for the whole block and either every booking is made or
+        none is. stops is (first_stop, last_stop) for a segment ticket, or
+        None for the whole route. Returns [(booking_id, pnr), ...] in the
+        order of parties.
+        """
+        return self._run(connection, lambda: self._book_group(
+            connection, user_id, schedule_id, seat_class, parties, fare, payment_method, stops
+        ))
+    
+    def join_waitlist(self, connection, user_id, schedule_id, seat_class, passengers, fare, payment_method,
+                      stops=None):
+        """Queue a booking for a full schedule/class; returns (booking_id, pnr, position).
+        
+        The booking is created with status 'waitlisted' and no seats. If
+        seats have come back since the search it is confirmed straight away
+        and position is None; otherwise position is its place in the queue.
+        Raises WaitlistFullError when waitlist_limit bookings are waiting.
+        """
+        return self._run(connection, lambda: self._join_waitlist(
+            connection, user_id, schedule_id, seat_class, passengers, fare, payment_method, stops
+        ))
+    
+    def _run(self, connection, work):
+        attempt = 0
+        while True:
+            try:
+                connection.start_transaction()
+                result = work()
+                connection.commit()
+                return result
+            except Exception as e:
+                connection.rollback()
+                if not self.is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self.retries += 1
+                time.sleep(self.backoff * attempt * random.uniform(0.5, 1.5))
+    
+    @staticmethod
+    def _stop_names(cursor, schedule_id, allocator, stops):
+        """Validate stops against the schedule; returns (first, last, boarding, alighting)"""
+        # Segment bookings hold their seats only between the two stops
+        first, last = stops if stops is not None else (0, allocator.segments)
+        if not 0 <= first < last <= allocator.segments:
+            raise ValueError(f"Invalid stops {first}-{last} for a schedule with {allocator.segments} segment(s)")
+        boarding = alighting = None
+        if stops is not None:
+            cursor.execute(
+                "SELECT ss.stop_index, st.name FROM schedule_stops ss "
+                "JOIN stations st ON st.id = ss.station_id "
+                "WHERE ss.schedule_id = %s AND ss.stop_index IN (%s, %s)",
+                (schedule_id, first, last)
+            )
+            names = dict(cursor.fetchall())
+            boarding, alighting = names.get(first), names.get(last)
+        return first, last, boarding, alighting
+    
+    @staticmethod
+    def _insert_bookings(cursor, user_id, schedule_id, seat_class, parties, seat_numbers, fare, payment_method,
+                         status, stops, boarding, alighting):
+        """Insert one booking per party and its passengers; returns [(booking_id, pnr), ...]"""
+        pnrs = [generate_pnr() for _ in parties]
+        from_stop, to_stop = stops if stops is not None else (None, None)
+        booking_rows = [
+            (user_id, schedule_id, pnr, fare * len(passengers), status, payment_method,
+             from_stop, to_stop, boarding, alighting)
+            for pnr, passengers in zip(pnrs, parties)
+        ]
+        insert_booking = """
+            INSERT INTO bookings 
+            (user_id, schedule_id, pnr, total_fare, status, payment_method,
+             from_stop, to_stop, boarding, alighting)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """
+        if len(parties) == 1:
+            cursor.execute(insert_booking, booking_rows[0])
+            booking_ids = [cursor.lastrowid]
+        else:
+            cursor.executemany(insert_booking, booking_rows)
+            placeholders = ", ".join(["%s"] * len(pnrs))
+            cursor.execute(f"SELECT pnr, id FROM bookings WHERE pnr IN ({placeholders})", pnrs)
+            ids_by_pnr = dict(cursor.fetchall())
+            booking_ids = [ids_by_pnr[pnr] for pnr in pnrs]
+        
+        # mysql.connector sends this as a single multi-row INSERT
+        cursor.executemany(
+            """
+            INSERT INTO passengers
+            (booking_id, name, age, gender, seat_class, seat_number)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            """,
+            [(booking_id, passenger['name'], passenger['age'], passenger['gender'], seat_class, seat_number)
+             for booking_id, passengers, party_seats in zip(booking_ids, parties, seat_numbers)
+             for passenger, seat_number in zip(passengers, party_seats)]
+        )
+        return list(zip(booking_ids, pnrs))
+    
+    def _book_group(self, connection, user_id, schedule_id, seat_class, parties, fare, payment_method, stops):
+        cursor = connection.cursor()
+        try:
+            requested = sum(len(passengers) for passengers in parties)
+            allocator = SeatInventory.lock(cursor, schedule_id, seat_class)
+            if allocator is None:
+                raise SeatsUnavailableError(0, requested)
+            first, last, boarding, alighting = self._stop_names(cursor, schedule_id, allocator, stops)
+            
+            available = allocator.free_count(first, last)
+            if requested > available:
+                raise SeatsUnavailableError(available, requested)
+            seats = [allocator.allocate(len(passengers), first, last) for passengers in parties]
+            
+            booked = self._insert_bookings(
+                cursor, user_id, schedule_id, seat_class, parties,
+                [[allocator.label(seat) for seat in party_seats] for party_seats in seats],
+                fare, payment_method, 'confirmed', stops, boarding, alighting
+            )
+            booking_ids = [booking_id for booking_id, _ in booked]
+            
+            SeatInventory.store(cursor, schedule_id, allocator)
+            RevenueRollup.record_bookings(cursor, booking_ids)
+            FareLedger.record_bookings(cursor, booking_ids, fare)
+            return booked
+        finally:
+            cursor.close()
+    
+    def _join_waitlist(self, connection, user_id, schedule_id, seat_class, passengers, fare, payment_method, stops):
+        cursor = connection.cursor()
+        try:
+            # The inventory row lock also serializes the queue with promotions
+            allocator = SeatInventory.lock(cursor, schedule_id, seat_class)
+            if allocator is None or len(passengers) > allocator.total_seats:
+                raise SeatsUnavailableError(0 if allocator is None else allocator.total_seats, len(passengers))
+            _, _, boarding, alighting = self._stop_names(cursor, schedule_id, allocator, stops)
+            if Waitlist.length(cursor, schedule_id, seat_class) >= self.waitlist_limit:
+                raise WaitlistFullError(self.waitlist_limit)
+            
+            [(booking_id, pnr)] = self._insert_bookings(
+                cursor, user_id, schedule_id, seat_class, [passengers], [[None] * len(passengers)],
+                fare, payment_method, 'waitlisted', stops, boarding, alighting
+            )
+            Waitlist.enqueue(cursor, booking_id, schedule_id, seat_class, len(passengers), fare)
+            # Seats may have come back since the search
+            Waitlist.promote(cursor, schedule_id, allocator)
+            return booking_id, pnr, Waitlist.positions(cursor, [booking_id]).get(booking_id)
+        finally:
+            cursor.close()
+    
+    def release(self, cursor, booking_id):
+        """Undo a confirmed booking's seat, revenue and ledger entries.
+        
+        Must run in the cancelling transaction before the booking's status is
+        set to cancelled; does nothing for bookings that aren't confirmed.
+        Returns the locked allocators of the released rows, as
+        SeatInventory.release_booking does.
+        """
+        freed = SeatInventory.release_booking(cursor, booking_id)
+        RevenueRollup.record_cancellation(cursor, booking_id)
+        FareLedger.cancel_booking(cursor, booking_id)
+        return freed
+    
+    def cancel_booking(self, connection, booking_id, user_id=None):
+        """Cancel a booking in its own transaction, retrying deadlocks; returns what cancel() does"""
+        def work():
+            cursor = connection.cursor()
+            try:
+                return self.cancel(cursor, booking_id, user_id)
+            finally:
+                cursor.close()
+        return self._run(connection, work)
+    
+    def cancel(self, cursor, booking_id, user_id=None):
+        """Cancel a booking in the caller's transaction and promote the waitlist.
+        
+        A confirmed booking gives back its seats, which go to the oldest
+        waiting bookings that fit; a waitlisted one just leaves its queue.
+        With user_id, only that user's booking is cancelled. Returns
+        [(booking_id, pnr), ...] of the bookings promoted.
+        """
+        query = "SELECT b.schedule_id, w.seat_class FROM bookings b " \
+                "LEFT JOIN waitlist w ON w.booking_id = b.id WHERE b.id = %s"
+        params = (booking_id,)
+        if user_id is not None:
+            query += " AND b.user_id = %s"
+            params += (user_id,)
+        cursor.execute(query, params)
+        row = cursor.fetchone()
+        if row is None:
+            return []
+        if isinstance(row, dict):
+            row = tuple(row.values())
+        schedule_id, waiting_class = row
+        
+        if waiting_class is not None:
+            # Take the inventory lock before the queue rows, in the same order as promote()
+            SeatInventory.lock(cursor, schedule_id, waiting_class)
+            fare = Waitlist.leave(cursor, booking_id)
+            if fare is not None:
+                cursor.execute("UPDATE bookings SET status = 'cancelled' WHERE id = %s", (booking_id,))
+                # Recorded as a cancelled booking, as a rollup rebuild would count it
+                RevenueRollup.record_bookings(cursor, [booking_id])
+                FareLedger.record_bookings(cursor, [booking_id], fare)
+                return []
+            # Promoted since it was read, so cancel it as a confirmed booking
+        
+        freed = self.release(cursor, booking_id)
+        cursor.execute("UPDATE bookings SET status = 'cancelled' WHERE id = %s", (booking_id,))
+        promoted = []
+        for freed_schedule_id, allocator in freed:
+            promoted.extend(Waitlist.promote(cursor, freed_schedule_id, allocator))
+        return promoted
+
+# Waitlist
+class WaitlistFullError(Exception):
+    """Raised when a schedule/class already has as many waiting bookings as allowed"""
+    def __init__(self, limit):
+        self.limit = limit
+        super().__init__(f"The waitlist is full ({limit} bookings waiting)")
+
+
+class Waitlist:
+    """First come, first served queue of bookings waiting for seats.
+
+    A waitlisted booking is an ordinary bookings row with status
+    'waitlisted' and passengers without seat numbers, plus a waitlist row
+    whose auto-increment id orders the schedule/class queue. Like
+    SeatInventory, every method takes the caller's cursor; promote() runs
+    inside the transaction that freed the seats, so a new booking can never
+    take them ahead of the queue.
+    """
+    @staticmethod
+    def create_table(cursor):
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS waitlist (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                booking_id INT NOT NULL UNIQUE,
+                schedule_id INT NOT NULL,
+                seat_class ENUM('sleeper', 'ac', 'general') NOT NULL,
+                passenger_count INT NOT NULL,
+                fare DECIMAL(10, 2) NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                INDEX idx_waitlist_queue (schedule_id, seat_class, id),
+                FOREIGN KEY (booking_id) REFERENCES bookings(id) ON DELETE CASCADE,
+                FOREIGN KEY (schedule_id) REFERENCES schedules(id) ON DELETE CASCADE
+            )
+        ''')
+    
+    @staticmethod
+    def enqueue(cursor, booking_id, schedule_id, seat_class, passenger_count, fare):
+        """Add a waitlisted booking to the back of its queue; fare is per seat"""
+        cursor.execute(
+            "INSERT INTO waitlist (booking_id, schedule_id, seat_class, passenger_count, fare) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            (booking_id, schedule_id, seat_class, passenger_count, fare)
+        )
+    
+    @staticmethod
+    def length(cursor, schedule_id, seat_class):
+        cursor.execute(
+            "SELECT COUNT(*) FROM waitlist WHERE schedule_id = %s AND seat_class = %s",
+            (schedule_id, seat_class)
+        )
+        row = cursor.fetchone()
+        return tuple(row.values())[0] if isinstance(row, dict) else row[0]
+    
+    @staticmethod
+    def positions(cursor, booking_ids):
+        """Return {booking_id: place in its queue, from 1} for the bookings still waiting"""
+        booking_ids = list(booking_ids)
+        if not booking_ids:
+            return {}
+        placeholders = ", ".join(["%s"] * len(booking_ids))
+        cursor.execute(f'''
+            SELECT w.booking_id, COUNT(*)
+            FROM waitlist w
+            JOIN waitlist ahead ON ahead.schedule_id = w.schedule_id
+                AND ahead.seat_class = w.seat_class AND ahead.id <= w.id
+            WHERE w.booking_id IN ({placeholders})
+            GROUP BY w.booking_id
+        ''', tuple(booking_ids))
+        positions = {}
+        for row in cursor.fetchall():
+            if isinstance(row, dict):
+                row = tuple(row.values())
+            positions[row[0]] = int(row[1])
+        return positions
+    
+    @staticmethod
+    def leave(cursor, booking_id):
+        """Take a booking out of its queue; returns its per-seat fare, or None if it isn't waiting"""
+        cursor.execute("SELECT fare FROM waitlist WHERE booking_id = %s FOR UPDATE", (booking_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        cursor.execute("DELETE FROM waitlist WHERE booking_id = %s", (booking_id,))
+        return tuple(row.values())[0] if isinstance(row, dict) else row[0]
+    
+    @staticmethod
+    def promote(cursor, schedule_id, allocator, batch_size=100):
+        """Confirm the oldest waiting bookings that fit in the allocator's free seats.
+        
+        allocator must be the schedule/class row locked by this transaction
+        (SeatInventory.lock). The queue is read in batches, oldest first,
+        until no segment has a free seat; a booking too large or too long
+        for the free seats keeps its place while later ones that fit go
+        ahead. Seats are assigned, the bookings confirmed and recorded in the
+        rollup and ledger, a notification is queued for each user and the
+        seat map is stored, all with a handful of statements. Returns
+        [(booking_id, pnr), ...] in queue order.
+        """
+        promoted = []
+        after = 0
+        while allocator.most_free():
+            cursor.execute('''
+                SELECT w.id, w.booking_id, w.passenger_count, w.fare, b.pnr, b.user_id, b.from_stop, b.to_stop
+                FROM waitlist w JOIN bookings b ON b.id = w.booking_id
+                WHERE w.schedule_id = %s AND w.seat_class = %s AND w.id > %s AND w.passenger_count <= %s
+                ORDER BY w.id
+                LIMIT %s
+                FOR UPDATE
+            ''', (schedule_id, allocator.seat_class, after, allocator.most_free(), batch_size))
+            rows = cursor.fetchall()
+            for row in rows:
+                if isinstance(row, dict):
+                    row = tuple(row.values())
+                after, booking_id, count, fare, pnr, user_id, from_stop, to_stop = row
+                first, last = (from_stop or 0), (allocator.segments if to_stop is None else to_stop)
+                if count <= allocator.free_count(first, last):
+                    seats = allocator.allocate(count, first, last)
+                    promoted.append((booking_id, pnr, user_id, fare, [allocator.label(seat) for seat in seats]))
+                    if not allocator.most_free():
+                        break
+            if len(rows) < batch_size:
+                break
+        if not promoted:
+            return []
+        
+        booking_ids = [booking_id for booking_id, _, _, _, _ in promoted]
+        placeholders = ", ".join(["%s"] * len(booking_ids))
+        cursor.execute(
+            f"SELECT id, booking_id FROM passengers WHERE booking_id IN ({placeholders}) ORDER BY id",
+            tuple(booking_ids)
+        )
+        passenger_ids = defaultdict(list)
+        for row in cursor.fetchall():
+            if isinstance(row, dict):
+                row = tuple(row.values())
+            passenger_ids[row[1]].append(row[0])
+        assignments = [
+            (passenger_id, seat_number)
+            for booking_id, _, _, _, seat_numbers in promoted
+            for passenger_id, seat_number in zip(passenger_ids[booking_id], seat_numbers)
+        ]
+        # One UPDATE for every promoted passenger rather than one per seat
+        cursor.execute(
+            f"UPDATE passengers SET seat_number = CASE id "
+            f"{' '.join(['WHEN %s THEN %s'] * len(assignments))} END "
+            f"WHERE id IN ({', '.join(['%s'] * len(assignments))})",
+            tuple(value for assignment in assignments for value in assignment)
+            + tuple(passenger_id for passenger_id, _ in assignments)
+        )
+        cursor.execute(
+            f"UPDATE bookings SET status = 'confirmed' WHERE id IN ({placeholders})", tuple(booking_ids)
+        )
+        cursor.execute(f"DELETE FROM waitlist WHERE booking_id IN ({placeholders})", tuple(booking_ids))
+        
+        SeatInventory.store(cursor, schedule_id, allocator)
+        RevenueRollup.record_bookings(cursor, booking_ids)
+        by_fare = defaultdict(list)
+        for booking_id, _, _, fare, _ in promoted:
+            by_fare[fare].append(booking_id)
+        for fare, fare_booking_ids in by_fare.items():
+            FareLedger.record_bookings(cursor, fare_booking_ids, fare)
+        cursor.executemany(
+            "INSERT INTO notifications (user_id, message) VALUES (%s, %s)",
+            [(user_id, f"Waitlisted booking {pnr} is confirmed. "
+                       f"{allocator.seat_class.capitalize()} seat(s): {', '.join(seat_numbers)}")
+             for _, pnr, user_id, _, seat_numbers in promoted]
+        )
+        return [(booking_id, pnr) for booking_id, pnr, _, _, _ in promoted]
+
+# Revenue rollup
+class RevenueRollup:
+    """Pre-aggregated revenue per booking day, route, class and payment method.
+
+    revenue_daily is kept current by the booking and cancellation
+    transactions, so the revenue views sum a few rows per day instead of
+    grouping the raw bookings. rebuild() recomputes it from bookings, either
+    completely or for a date range.
+    """
+    # One row per booking with the rollup dimensions and measures
+    _BOOKING_ROWS = """
+        SELECT 
+            DATE(b.booking_date) AS booking_day, s.source, s.destination,
+            COALESCE(MIN(p.seat_class), 'general') AS seat_class, b.payment_method,
+            CASE WHEN b.status = 'confirmed' THEN b.total_fare ELSE 0 END AS revenue,
+            CASE WHEN b.status = 'confirmed' THEN 1 ELSE 0 END AS confirmed_bookings,
+            CASE WHEN b.status = 'cancelled' THEN 1 ELSE 0 END AS cancelled_bookings,
+            1 AS total_bookings,
+            COUNT(p.id) AS passengers
+        FROM 
+            bookings b
+        JOIN 
+            schedules s ON b.schedule_id = s.id
+        LEFT JOIN 
+            passengers p ON p.booking_id = b.id
+        WHERE 
+            {where}
+        GROUP BY 
+            b.id
+    """
+    _COLUMNS = ("booking_day, source, destination, seat_class, payment_method, "
+                "revenue, confirmed_bookings, cancelled_bookings, total_bookings, passengers")
+    
+    @staticmethod
+    def create_table(cursor):
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS revenue_daily (
+                booking_day DATE NOT NULL,
+                source VARCHAR(100) NOT NULL,
+                destination VARCHAR(100) NOT NULL,
+                seat_class ENUM('sleeper', 'ac', 'general') NOT NULL,
+                payment_method VARCHAR(20) NOT NULL,
+                revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+                confirmed_bookings INT NOT NULL DEFAULT 0,
+                cancelled_bookings INT NOT NULL DEFAULT 0,
+                total_bookings INT NOT NULL DEFAULT 0,
+                passengers INT NOT NULL DEFAULT 0,
+                PRIMARY KEY (booking_day, source, destination, seat_class, payment_method)
+            )
+        ''')
+    
+    @classmethod
+    def record_bookings(cls, cursor, booking_ids):
+        """Add newly inserted bookings (and their passengers) to the rollup"""
+        placeholders = ", ".join(["%s"] * len(booking_ids))
+        cursor.execute(f"""
+            INSERT INTO revenue_daily ({cls._COLUMNS})
+            {cls._BOOKING_ROWS.format(where=f"b.id IN ({placeholders})")}
+            ON DUPLICATE KEY UPDATE
+                revenue = revenue + VALUES(revenue),
+                confirmed_bookings = confirmed_bookings + VALUES(confirmed_bookings),
+                cancelled_bookings = cancelled_bookings + VALUES(cancelled_bookings),
+                total_bookings = total_bookings + VALUES(total_bookings),
+                passengers = passengers + VALUES(passengers)
+        """, tuple(booking_ids))
+    
+    @classmethod
+    def record_cancellation(cls, cursor, booking_id):
+        """Move a confirmed booking to cancelled; call before its status changes"""
+        cursor.execute(f"""
+            UPDATE revenue_daily r
+            JOIN ({cls._BOOKING_ROWS.format(where="b.id = %s AND b.status = 'confirmed'")}) x
+                ON r.booking_day = x.booking_day AND r.source = x.source
+                AND r.destination = x.destination AND r.seat_class = x.seat_class
+                AND r.payment_method = x.payment_method
+            SET 
+                r.revenue = r.revenue - x.revenue,
+                r.confirmed_bookings = r.confirmed_bookings - 1,
+                r.cancelled_bookings = r.cancelled_bookings + 1
+        """, (booking_id,))
+    
+    @classmethod
+    def rebuild(cls, cursor, from_date=None, to_date=None):
+        """Recompute the rollup from bookings, for all days or a date range"""
+        if from_date and to_date:
+            params = (from_date.strftime('%Y-%m-%d'), to_date.strftime('%Y-%m-%d'))
+            cursor.execute("DELETE FROM revenue_daily WHERE booking_day BETWEEN %s AND %s", params)
+            where = "b.booking_date >= %s AND b.booking_date < %s + INTERVAL 1 DAY"
+        else:
+            params = ()
+            cursor.execute("DELETE FROM revenue_daily")
+            where = "1 = 1"
+        # Waitlisted bookings are added when they are confirmed or cancelled
+        where += " AND b.status <> 'waitlisted'"
+        
+        cursor.execute(f"""
+            INSERT INTO revenue_daily ({cls._COLUMNS})
+            SELECT 
+                booking_day, source, destination, seat_class, payment_method,
+                SUM(revenue), SUM(confirmed_bookings), SUM(cancelled_bookings),
+                SUM(total_bookings), SUM(passengers)
+            FROM ({cls._BOOKING_ROWS.format(where=where)}) x
+            GROUP BY 
+                booking_day, source, destination, seat_class, payment_method
+        """, params)
+        return cursor.rowcount
+
+def rebuild_revenue_rollup():
+    """Command-line entry point: recompute revenue_daily from scratch"""
+    connection = get_db_connection()
+    if not connection:
+        return False
+    cursor = connection.cursor()
+    try:
+        RevenueRollup.create_table(cursor)
+        rows = RevenueRollup.rebuild(cursor)
+        connection.commit()
+        print(f"Revenue rollup rebuilt: {rows} rows")
+        return True
+    finally:
+        cursor.close()
+        connection.close()
+
+# Fare ledger
+class FareLedger:
+    """One row per passenger with the fare paid for that seat.
+
+    Class-level revenue sums the ledger directly instead of joining bookings
+    to passengers, where every booking's total_fare would be counted once
+    per passenger. reconcile() checks the ledger against bookings.total_fare.
+    """
+    @staticmethod
+    def create_table(cursor):
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS fare_ledger (
+                passenger_id INT PRIMARY KEY,
+                booking_id INT NOT NULL,
+                schedule_id INT NOT NULL,
+                seat_class ENUM('sleeper', 'ac', 'general') NOT NULL,
+                fare DECIMAL(10, 2) NOT NULL,
+                booking_day DATE NOT NULL,
+                status ENUM('confirmed', 'cancelled') NOT NULL DEFAULT 'confirmed',
+                INDEX idx_fare_ledger_day_class (booking_day, seat_class, status),
+                INDEX idx_fare_ledger_booking (booking_id),
+                FOREIGN KEY (passenger_id) REFERENCES passengers(id) ON DELETE CASCADE,
+                FOREIGN KEY (booking_id) REFERENCES bookings(id) ON DELETE CASCADE
+            )
+        ''')
+    
+    @staticmethod
+    def backfill(cursor):
+        """Add ledger rows for passengers that don't have one, splitting each
+        booking's total_fare evenly and giving the rounding remainder to its
+        last passenger"""
+        cursor.execute('''
+            INSERT INTO fare_ledger (passenger_id, booking_id, schedule_id, seat_class, fare, booking_day, status)
+            SELECT 
+                p.id, p.booking_id, b.schedule_id, p.seat_class,
+                ROUND(b.total_fare / x.passengers, 2) + CASE WHEN p.id = x.last_id
+                    THEN b.total_fare - ROUND(b.total_fare / x.passengers, 2) * x.passengers
+                    ELSE 0 END,
+                DATE(b.booking_date), b.status
+            FROM 
+                passengers p
+            JOIN 
+                bookings b ON p.booking_id = b.id
+            JOIN 
+                (SELECT booking_id, COUNT(*) AS passengers, MAX(id) AS last_id
+                 FROM passengers GROUP BY booking_id) x ON x.booking_id = p.booking_id
+            LEFT JOIN 
+                fare_ledger f ON f.passenger_id = p.id
+            WHERE 
+                f.passenger_id IS NULL AND b.status <> 'waitlisted'
+        ''')
+    
+    @staticmethod
+    def record_bookings(cursor, booking_ids, fare):
+        """Write one ledger row per passenger of new bookings at the given per-seat fare"""
+        placeholders = ", ".join(["%s"] * len(booking_ids))
+        cursor.execute(f'''
+            INSERT INTO fare_ledger (passenger_id, booking_id, schedule_id, seat_class, fare, booking_day, status)
+            SELECT p.id, b.id, b.schedule_id, p.seat_class, %s, DATE(b.booking_date), b.status
+            FROM passengers p JOIN bookings b ON p.booking_id = b.id
+            WHERE b.id IN ({placeholders})
+        ''', (fare,) + tuple(booking_ids))
+    
+    @staticmethod
+    def cancel_booking(cursor, booking_id):
+        cursor.execute(
+            "UPDATE fare_ledger SET status = 'cancelled' WHERE booking_id = %s",
+            (booking_id,)
+        )
+    
+    @staticmethod
+    def reconcile(cursor):
+        """Return bookings whose ledger rows don't add up to total_fare or
+        don't match the booking's status; waitlisted bookings have no rows yet"""
+        cursor.execute('''
+            SELECT 
+                b.id, b.pnr, b.total_fare, COALESCE(SUM(f.fare), 0) AS ledger_total,
+                COUNT(f.passenger_id) AS ledger_rows,
+                COALESCE(SUM(f.status <> b.status), 0) AS status_mismatches
+            FROM 
+                bookings b
+            LEFT JOIN 
+                fare_ledger f ON f.booking_id = b.id
+            WHERE 
+                b.status <> 'waitlisted'
+            GROUP BY 
+                b.id
+            HAVING 
+                ledger_total <> b.total_fare OR status_mismatches > 0
+            ORDER BY 
+                b.id
+        ''')
+        mismatches = []
+        for row in cursor.fetchall():
+            if isinstance(row, dict):
+                row = tuple(row.values())
+            booking_id, pnr, total_fare, ledger_total, ledger_rows, status_mismatches = row
+            mismatches.append({
+                "booking_id": booking_id,
+                "pnr": pnr,
+                "total_fare": total_fare,
+                "ledger_total": ledger_total,
+                "ledger_rows": ledger_rows,
+                "status_mismatches": int(status_mismatches),
+            })
+        return mismatches
+
+def check_fare_ledger():
+    """Command-line entry point: report bookings that disagree with the fare ledger"""
+    connection = get_db_connection()
+    if not connection:
+        return False
+    cursor = connection.cursor()
+    try:
+        mismatches = FareLedger.reconcile(cursor)
+    finally:
+        cursor.close()
+        connection.close()
+    
+    for entry in mismatches:
+        print(
+            f"Booking {entry['booking_id']} ({entry['pnr']}): total_fare {entry['total_fare']}, "
+            f"ledger {entry['ledger_total']} over {entry['ledger_rows']} passenger(s), "
+            f"{entry['status_mismatches']} status mismatch(es)"
+        )
+    print(f"Fare ledger check: {len(mismatches)} inconsistent booking(s)")
+    return not mismatches
+
+# Admin search
+class SearchIndex:
+    """Ranked prefix and fuzzy search for the admin search boxes.
+
+    A search never scans a table: it collects a bounded set of candidate ids
+    from indexed lookups only, namely prefix matches (LIKE 'term%') on B-tree
+    indexes and fuzzy matches on the ngram FULLTEXT indexes from schema
+    migration 4, which match on shared character bigrams and so find infixes
+    and tolerate typos. Candidates are ranked exact match first, then prefix
+    match, then full-text relevance, and paged with a (score, id) keyset
+    cursor.
+    """
+    PAGE_SIZE = 50
+    CANDIDATE_LIMIT = 500
+    MATCH = "AGAINST (%s IN NATURAL LANGUAGE MODE)"
+    
+    # candidates are (query, kind): kind says whether the query's
+    # placeholders take the prefix pattern or the raw term, and each query
+    # yields (id, relevance). rank columns earn the exact and prefix bonuses.
+    ENTITIES = {
+        "trains": {
+            "table": "trains",
+            "joins": "",
+            "columns": "x.*",
+            "candidates": [
+                ("SELECT id, 0 AS relevance FROM trains WHERE train_number LIKE %s", "prefix"),
+                ("SELECT id, 0 AS relevance FROM trains WHERE train_name LIKE %s", "prefix"),
+                ("SELECT id, MATCH(train_number, train_name) " + MATCH + " AS relevance "
+                 "FROM trains WHERE MATCH(train_number, train_name) " + MATCH, "term"),
+            ],
+            "rank": ["x.train_number", "x.train_name"],
+        },
+        "bookings": {
+            "table": "bookings",
+            "joins": """
+                JOIN users u ON x.user_id = u.id
+                JOIN schedules s ON x.schedule_id = s.id
+                JOIN trains t ON s.train_id = t.id
+            """,
+            "columns": """
+                x.id, x.pnr, u.name as user_name, u.email as user_email, x.booking_date, 
+                x.total_fare, x.status, x.payment_method, t.train_number, t.train_name, 
+                s.source, s.destination, s.departure_date, s.departure_time
+            """,
+            "candidates": [
+                ("SELECT id, 0 AS relevance FROM bookings WHERE pnr LIKE %s", "prefix"),
+                ("SELECT b.id, 0 AS relevance FROM users u JOIN bookings b ON b.user_id = u.id "
+                 "WHERE u.name LIKE %s", "prefix"),
+                ("SELECT b.id, MATCH(u.name, u.email) " + MATCH + " AS relevance "
+                 "FROM users u JOIN bookings b ON b.user_id = u.id WHERE MATCH(u.name, u.email) " + MATCH, "term"),
+            ],
+            "rank": ["x.pnr", "u.name"],
+        },
+        "passengers": {
+            "table": "passengers",
+            "joins": """
+                JOIN bookings b ON x.booking_id = b.id
+                JOIN schedules s ON b.schedule_id = s.id
+                JOIN trains t ON s.train_id = t.id
+            """,
+            "columns": """
+                x.id, x.name, x.age, x.gender, x.seat_class, x.seat_number,
+                b.pnr, b.booking_date, b.status,
+                s.source, s.destination, s.departure_date, s.departure_time,
+                t.train_number, t.train_name
+            """,
+            "candidates": [
+                ("SELECT id, 0 AS relevance FROM passengers WHERE name LIKE %s", "prefix"),
+                ("SELECT p.id, 0 AS relevance FROM bookings b JOIN passengers p ON p.booking_id = b.id "
+                 "WHERE b.pnr LIKE %s", "prefix"),
+                ("SELECT id, MATCH(name) " + MATCH + " AS relevance "
+                 "FROM passengers WHERE MATCH(name) " + MATCH, "term"),
+            ],
+            "rank": ["x.name", "b.pnr"],
+        },
+        "users": {
+            "table": "users",
+            "joins": "",
+            "columns": "x.id, x.name, x.email, x.is_admin, x.theme, DATE_FORMAT(x.created_at, '%Y-%m-%d') as joined_date",
+            "candidates": [
+                ("SELECT id, 0 AS relevance FROM users WHERE name LIKE %s", "prefix"),
+                ("SELECT id, 0 AS relevance FROM users WHERE email LIKE %s", "prefix"),
+                ("SELECT id, MATCH(name, email) " + MATCH + " AS relevance "
+                 "FROM users WHERE MATCH(name, email) " + MATCH, "term"),
+            ],
+            "rank": ["x.name", "x.email"],
+        },
+    }
+    
+    @staticmethod
+    def prefix_pattern(term):
+        escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return escaped + "%"
+    
+    @classmethod
+    def search(cls, cursor, entity, term, after=None, page_size=None, where=None, where_params=()):
+        """Return (rows, next_cursor) for one page of ranked matches for term.
+
+        Pass the previous page's next_cursor as after to get the following
+        page; next_cursor is None on the last page. where adds a filter on
+        the joined rows (e.g. "x.status = 'cancelled'"). cursor must be a
+        dictionary cursor.
+        """
+        spec = cls.ENTITIES[entity]
+        page_size = page_size or cls.PAGE_SIZE
+        term = term.strip()
+        prefix = cls.prefix_pattern(term)
+        
+        score_terms = ["c.relevance"]
+        params = []
+        for column in spec["rank"]:
+            score_terms.append(f"({column} = %s) * 100 + ({column} LIKE %s) * 10")
+            params.extend([term, prefix])
+        
+        # Natural language MATCH returns rows by relevance, so each LIMIT
+        # keeps the best full-text candidates
+        candidates = []
+        for query, kind in spec["candidates"]:
+            candidates.append(f"({query} LIMIT {cls.CANDIDATE_LIMIT})")
+            params.extend([prefix if kind == "prefix" else term] * query.count("%s"))
+        
+        query = f"""
+            SELECT * FROM (
+                SELECT {spec['columns']}, ROUND({' + '.join(score_terms)}, 4) AS search_score
+                FROM (
+                    SELECT id, MAX(relevance) AS relevance
+                    FROM ({' UNION ALL '.join(candidates)}) matches
+                    GROUP BY id
+                ) c
+                JOIN {spec['table']} x ON x.id = c.id
+                {spec['joins']}
+                {'WHERE ' + where if where else ''}
+            ) ranked
+        """
+        params.extend(where_params)
+        
+        if after is not None:
+            query += " WHERE search_score < %s OR (search_score = %s AND id < %s)"
+            params.extend([after[0], after[0], after[1]])
+        
+        query += " ORDER BY search_score DESC, id DESC LIMIT %s"
+        params.append(page_size + 1)
+        
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            return rows, (rows[-1]['search_score'], rows[-1]['id'])
+        return rows, None
+
+def search_records(entity, term, after=None, page_size=None, where=None, where_params=()):
+    """SearchIndex.search on a pooled connection; raises on errors so it can run on a worker"""
+    connection = get_db_pool().get_connection()
+    cursor = connection.cursor(dictionary=True)
+    try:
+        return SearchIndex.search(cursor, entity, term, after, page_size, where, where_params)
+    finally:
+        cursor.close()
+        connection.close()
+
+# Time-bucketed booking aggregates
+BOOKING_BUCKETS = {
+    "day": "r.booking_day",
+    "week": "r.booking_day - INTERVAL WEEKDAY(r.booking_day) DAY",
+    "month": "r.booking_day - INTERVAL (DAYOFMONTH(r.booking_day) - 1) DAY",
+}
+
+def bucket_start(day, bucket="day"):
+    """Return the first day of the bucket (day, Monday-based week, month) containing day"""
+    if isinstance(day, datetime):
+        day = day.date()
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+def bucket_range(from_date, to_date, bucket="day"):
+    """All bucket start dates between from_date and to_date, inclusive"""
+    current = bucket_start(from_date, bucket)
+    last = bucket_start(to_date, bucket)
+    buckets = []
+    while current <= last:
+        buckets.append(current)
+        if bucket == "week":
+            current += timedelta(days=7)
+        elif bucket == "month":
+            current = (current.replace(day=28) + timedelta(days=4)).replace(day=1)
+        else:
+            current += timedelta(days=1)
+    return buckets
+
+def aggregate_bookings(cursor, from_date, to_date, bucket="day"):
+    """Booking counts and revenue per bucket between from_date and to_date.
+    
+    Runs one grouped range query over the revenue_daily rollup and returns a
+    list of dicts with keys date, revenue, confirmed_bookings,
+    cancelled_bookings and total_bookings, one per bucket in order, with
+    empty buckets filled with zeros.
+    """
+    if bucket not in BOOKING_BUCKETS:
+        raise ValueError(f"Unknown bucket: {bucket}")
+    if isinstance(from_date, datetime):
+        from_date = from_date.date()
+    if isinstance(to_date, datetime):
+        to_date = to_date.date()
+    
+    cursor.execute(f"""
+        SELECT 
+            {BOOKING_BUCKETS[bucket]} as bucket_date,
+            SUM(r.revenue) as revenue,
+            CAST(SUM(r.confirmed_bookings) AS SIGNED) as confirmed_bookings,
+            CAST(SUM(r.cancelled_bookings) AS SIGNED) as cancelled_bookings,
+            CAST(SUM(r.total_bookings) AS SIGNED) as total_bookings
+        FROM 
+            revenue_daily r
+        WHERE 
+            r.booking_day BETWEEN %s AND %s
+        GROUP BY 
+            bucket_date
+    """, (from_date.strftime('%Y-%m-%d'), to_date.strftime('%Y-%m-%d')))
+    
+    totals = {}
+    for row in cursor.fetchall():
+        if isinstance(row, dict):
+            row = tuple(row.values())
+        bucket_date, revenue, confirmed, cancelled, total = row
+        if isinstance(bucket_date, str):
+            bucket_date = datetime.strptime(bucket_date, '%Y-%m-%d').date()
+        totals[bucket_date] = (revenue or 0, confirmed, cancelled, total)
+    
+    results = []
+    for day in bucket_range(from_date, to_date, bucket):
+        revenue, confirmed, cancelled, total = totals.get(day, (0, 0, 0, 0))
+        results.append({
+            "date": day,
+            "revenue": revenue,
+            "confirmed_bookings": confirmed,
+            "cancelled_bookings": cancelled,
+            "total_bookings": total,
+        })
+    return results
+
+# Dashboard statistics
+class DashboardStats:
+    """Everything the admin dashboard shows, fetched on one connection and
+    cached for ttl seconds: the KPI cards, the last 7 days of bookings for
+    the chart, the 5 most recent bookings and the next 5 departures.
+
+    Call invalidate() after any change to trains, schedules or bookings so
+    the next dashboard visit sees fresh numbers; until then re-entering the
+    dashboard does not touch the database. If the fetch fails the counts are
+    zero and chart, recent_bookings and upcoming_schedules are None.
+    """
+    def __init__(self, ttl=30):
+        self.ttl = ttl
+        self._stats = None
+        self._loaded_at = 0
+    
+    def get(self):
+        today = datetime.now().date()
+        if (self._stats is None or time.monotonic() - self._loaded_at > self.ttl
+                or self._stats["day"] != today):
+            stats = self._fetch(today)
+            if stats is None:
+                return {"trains": 0, "schedules": 0, "bookings": 0, "revenue": 0, "day": today,
+                        "chart": None, "recent_bookings": None, "upcoming_schedules": None}
+            self._stats = stats
+            self._loaded_at = time.monotonic()
+        return self._stats
+    
+    def invalidate(self):
+        self._stats = None
+    
+    def _fetch(self, today):
+        connection = get_db_connection()
+        if connection:
+            cursor = connection.cursor(dictionary=True)
+            try:
+                cursor.execute("""
+                    SELECT 
+                        (SELECT COUNT(*) FROM trains) AS trains,
+                        (SELECT COUNT(*) FROM schedules) AS schedules,
+                        (SELECT COUNT(*) FROM bookings) AS bookings,
+                        (SELECT COALESCE(SUM(total_fare), 0) FROM bookings WHERE status = 'confirmed') AS revenue
+                """)
+                stats = dict(cursor.fetchone())
+                stats["day"] = today
+                # Last 7 days in one grouped query
+                stats["chart"] = [
+                    (entry['date'], entry['total_bookings'])
+                    for entry in aggregate_bookings(cursor, today - timedelta(days=6), today)
+                ]
+                cursor.execute("""
+                    SELECT 
+                        b.id, b.pnr, u.name as user_name, b.booking_date, b.total_fare, b.status,
+                        t.train_name, s.source, s.destination, s.departure_date, s.departure_time
+                    FROM 
+                        bookings b
+                    JOIN 
+                        users u ON b.user_id = u.id
+                    JOIN 
+                        schedules s ON b.schedule_id = s.id
+                    JOIN 
+                        trains t ON s.train_id = t.id
+                    ORDER BY 
+                        b.booking_date DESC
+                    LIMIT 5
+                """)
+                stats["recent_bookings"] = cursor.fetchall()
+                # Schedules departing today or in the future
+                current_date = today.strftime('%Y-%m-%d')
+                cursor.execute("""
+                    SELECT 
+                        s.id, t.train_number, t.train_name, s.source, s.destination, 
+                        s.departure_date, s.departure_time, s.status, s.delay_minutes
+                    FROM 
+                        schedules s
+                    JOIN 
+                        trains t ON s.train_id = t.id
+                    WHERE 
+                        (s.departure_date > %s) OR 
+                        (s.departure_date = %s AND s.departure_time >= %s)
+                    ORDER BY 
+                        s.departure_date, s.departure_time
+                    LIMIT 5
+                """, (current_date, current_date, datetime.now().strftime('%H:%M')))
+                stats["upcoming_schedules"] = cursor.fetchall()
+                return stats
+            except Exception as e:
+                print(f"Error getting dashboard statistics: {e}")
+                return None
+            finally:
+                cursor.close()
+                connection.close()
+        return None
+
+# Stations
+class UnknownStationError(Exception):
+    """Raised when a typed station matches no station name, code or alias"""
+    def __init__(self, name, suggestions=()):
+        self.name = name
+        self.suggestions = list(suggestions)
+        super().__init__(f"Unknown station '{name}'")
+
+class SameStationError(Exception):
+    """Raised when the source and destination resolve to the same station"""
+    def __init__(self, station):
+        self.station = station
+        super().__init__("Source and destination stations cannot be the same")
+
+class Stations:
+    """Station master table (code, name, aliases) that schedules reference by id.
+
+    Aliases are stored comma-separated. Schedules keep their source and
+    destination text for display; source_station_id and
+    destination_station_id are what booking search matches on.
+    """
+    # Well-known stations seeded with their codes and former names
+    SEED = [
+        ("NDLS", "Delhi", "New Delhi"),
+        ("CSMT", "Mumbai", "Bombay,Mumbai CST"),
+        ("MAS", "Chennai", "Madras,Chennai Central"),
+        ("SBC", "Bangalore", "Bengaluru,KSR Bengaluru"),
+        ("HWH", "Kolkata", "Calcutta,Howrah"),
+        ("PUNE", "Pune", "Poona"),
+    ]
+    
+    @staticmethod
+    def create_table(cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stations (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                code VARCHAR(8) NOT NULL UNIQUE,
+                name VARCHAR(100) NOT NULL UNIQUE,
+                aliases VARCHAR(255) NOT NULL DEFAULT ''
+            )
+        """)
+    
+    @classmethod
+    def backfill(cls, cursor):
+        """Seed the known stations, add every name schedules use and link schedules to them"""
+        cursor.executemany(
+            "INSERT IGNORE INTO stations (code, name, aliases) VALUES (%s, %s, %s)",
+            cls.SEED
+        )
+        cursor.execute("SELECT source FROM schedules UNION SELECT destination FROM schedules")
+        for (name,) in cursor.fetchall():
+            station_id, _ = cls.resolve(cursor, name)
+            cursor.execute(
+                "UPDATE schedules SET source_station_id = %s WHERE source_key = LOWER(%s)",
+                (station_id, name)
+            )
+            cursor.execute(
+                "UPDATE schedules SET destination_station_id = %s WHERE destination_key = LOWER(%s)",
+                (station_id, name)
+            )
+    
+    @classmethod
+    def resolve(cls, cursor, name):
+        """Return (id, name) of the station matching name, code or alias, adding it if unknown"""
+        name = " ".join(name.split())
+        cursor.execute(
+            """SELECT id, name FROM stations
+               WHERE name = %s OR code = %s OR FIND_IN_SET(%s, aliases)
+               ORDER BY name = %s DESC
+               LIMIT 1""",
+            (name, name, name, name)
+        )
+        row = cursor.fetchone()
+        if row:
+            return row[0], row[1]
+        
+        cursor.execute(
+            "INSERT INTO stations (code, name) VALUES (%s, %s)",
+            (cls.new_code(cursor, name), name)
+        )
+        return cursor.lastrowid, name
+    
+    @staticmethod
+    def new_code(cursor, name):
+        """An unused code made from the first letters of name (e.g. PUNE, PUN2)"""
+        letters = re.sub(r"[^A-Za-z]", "", name).upper()[:4] or "STN"
+        code, suffix = letters, 1
+        while True:
+            cursor.execute("SELECT 1 FROM stations WHERE code = %s", (code,))
+            if not cursor.fetchone():
+                return code
+            suffix += 1
+            code = f"{letters[:3]}{suffix}"
+
+class StationTrie:
+    """Prefix trie over station names, name words, codes and aliases.
+
+    Every node keeps the first limit stations (by name) whose keys pass
+    through it, so suggest() takes one dict step per typed character and
+    never walks a subtree. Nodes are [children, stations] lists.
+    """
+    def __init__(self, stations, limit=8):
+        self.limit = limit
+        self._root = [{}, []]
+        for station in sorted(stations, key=lambda s: s["name"].lower()):
+            for key in self.keys(station):
+                self._insert(key, station)
+    
+    @staticmethod
+    def keys(station):
+        """Lowercase strings a station can be found by"""
+        name = station["name"].lower()
+        keys = {name, station["code"].lower()}
+        keys.update(name.split())
+        keys.update(alias.strip().lower() for alias in station["aliases"].split(",") if alias.strip())
+        return keys
+    
+    def _insert(self, key, station):
+        node = self._root
+        for char in key:
+            node = node[0].setdefault(char, [{}, []])
+            matches = node[1]
+            if len(matches) < self.limit and not any(match is station for match in matches):
+                matches.append(station)
+    
+    def suggest(self, prefix):
+        """Stations with a key starting with prefix, best first"""
+        node = self._root
+        for char in prefix.strip().lower():
+            node = node[0].get(char)
+            if node is None:
+                return []
+        return list(node[1]) if node is not self._root else []
+    
+    def closest(self, text):
+        """Suggestions for the longest prefix of text that matches anything (for typos)"""
+        node = self._root
+        for char in text.strip().lower():
+            child = node[0].get(char)
+            if child is None:
+                break
+            node = child
+        return list(node[1])
+
+# Schedule stops
+class ScheduleStops:
+    """Ordered stops of each schedule: stop 0 is the source, the last one the destination.
+
+    Segment k of a schedule runs from stop k to stop k + 1, and
+    seat_inventory.segments holds how many there are. fare_fraction is the
+    share of the full fare accrued by the time the train reaches a stop, so
+    a ticket from stop i to stop j costs fare * (fraction[j] - fraction[i]).
+    """
+    @staticmethod
+    def create_table(cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schedule_stops (
+                schedule_id INT NOT NULL,
+                stop_index INT NOT NULL,
+                station_id INT NOT NULL,
+                arrival_at DATETIME NULL,
+                departure_at DATETIME NULL,
+                fare_fraction DECIMAL(6, 5) NOT NULL,
+                PRIMARY KEY (schedule_id, stop_index),
+                INDEX idx_schedule_stops_station_departure (station_id, departure_at),
+                FOREIGN KEY (schedule_id) REFERENCES schedules(id) ON DELETE CASCADE,
+                FOREIGN KEY (station_id) REFERENCES stations(id)
+            )
+        """)
+    
+    @staticmethod
+    def backfill(cursor):
+        """Give schedules without stops their source and destination as the only two"""
+        cursor.execute("""
+            INSERT IGNORE INTO schedule_stops
+                (schedule_id, stop_index, station_id, arrival_at, departure_at, fare_fraction)
+            SELECT id, 0, source_station_id, NULL, TIMESTAMP(departure_date, departure_time), 0
+            FROM schedules WHERE source_station_id IS NOT NULL
+        """)
+        cursor.execute("""
+            INSERT IGNORE INTO schedule_stops
+                (schedule_id, stop_index, station_id, arrival_at, departure_at, fare_fraction)
+            SELECT id, 1, destination_station_id, TIMESTAMP(arrival_date, arrival_time), NULL, 1
+            FROM schedules WHERE destination_station_id IS NOT NULL
+        """)
+    
+    @staticmethod
+    def parse_via(text, departure_at, arrival_at):
+        """Parse "Kota 10:30, Ratlam 14:05" into [(name, datetime)] between departure_at and arrival_at.
+        
+        Each time is when the train leaves that stop; a time earlier than
+        the previous one is taken to be on the next day. Raises ValueError
+        with a message for the user.
+        """
+        stops = []
+        previous = departure_at
+        for item in filter(None, (part.strip() for part in text.split(","))):
+            match = re.match(r'^(.+?)\s+([01]?[0-9]|2[0-3]):([0-5][0-9])$', item)
+            if not match:
+                raise ValueError(f"Stop '{item}' must be a station name followed by HH:MM")
+            at = previous.replace(hour=int(match.group(2)), minute=int(match.group(3)), second=0)
+            while at <= previous:
+                at += timedelta(days=1)
+            if at >= arrival_at:
+                raise ValueError(f"Stop '{item}' is not before the arrival time")
+            stops.append((match.group(1), at))
+            previous = at
+        return stops
+    
+    @staticmethod
+    def build(source_id, departure_at, destination_id, arrival_at, via=()):
+        """Stop rows for a schedule; via is [(station_id, departure datetime)] in order.
+        
+        Without distances between stations the fare is shared out by
+        travel time.
+        """
+        duration = max((arrival_at - departure_at).total_seconds(), 1)
+        stops = [(source_id, None, departure_at, 0)]
+        for station_id, at in via:
+            fraction = round((at - departure_at).total_seconds() / duration, 5)
+            stops.append((station_id, at, at, fraction))
+        stops.append((destination_id, arrival_at, None, 1))
+        return stops
+    
+    @staticmethod
+    def replace(cursor, schedule_id, stops):
+        """Store a schedule's stops and size its seat inventory to match.
+        
+        Seat maps and bookings refer to segments by stop index, so this
+        raises ValueError for a schedule with sold seats or open bookings.
+        The inventory rows stay locked until the caller's transaction ends.
+        """
+        cursor.execute(
+            "SELECT COALESCE(SUM(sold_seats), 0) FROM seat_inventory WHERE schedule_id = %s FOR UPDATE",
+            (schedule_id,)
+        )
+        sold = cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT COUNT(*) FROM bookings WHERE schedule_id = %s AND status <> 'cancelled'",
+            (schedule_id,)
+        )
+        if sold or cursor.fetchone()[0]:
+            raise ValueError(f"Stops can't be changed on schedule {schedule_id}, it already has bookings")
+        cursor.execute("DELETE FROM schedule_stops WHERE schedule_id = %s", (schedule_id,))
+        cursor.executemany(
+            """INSERT INTO schedule_stops
+               (schedule_id, stop_index, station_id, arrival_at, departure_at, fare_fraction)
+               VALUES (%s, %s, %s, %s, %s, %s)""",
+            [(schedule_id, index) + tuple(stop) for index, stop in enumerate(stops)]
+        )
+        # Empty maps are rebuilt at the new width on the next booking
+        cursor.execute(
+            "UPDATE seat_inventory SET segments = %s, seat_map = NULL WHERE schedule_id = %s",
+            (len(stops) - 1, schedule_id)
+        )
+    
+    @staticmethod
+    def update_ends(cursor, schedule_id, source_id, departure_at, destination_id, arrival_at):
+        """Move the first and last stop after the schedule's route or times were edited"""
+        cursor.execute(
+            "UPDATE schedule_stops SET station_id = %s, departure_at = %s "
+            "WHERE schedule_id = %s AND stop_index = 0",
+            (source_id, departure_at, schedule_id)
+        )
+        cursor.execute("SELECT MAX(stop_index) FROM schedule_stops WHERE schedule_id = %s", (schedule_id,))
+        last_stop = cursor.fetchone()[0]
+        cursor.execute(
+            "UPDATE schedule_stops SET station_id = %s, arrival_at = %s "
+            "WHERE schedule_id = %s AND stop_index = %s",
+            (destination_id, arrival_at, schedule_id, last_stop)
+        )
+
+# Reference data
+class ReferenceData:
+    """Trains and stations cached in memory for O(1) lookups.
+
+    Trains are indexed by id, train_number and lowercase train_name; stations
+    by lowercase name, code and alias, with a StationTrie for autocomplete.
+    The JourneyPlanner over upcoming schedules is built on first use after
+    each reload.
+
+    Mutators of trains or schedules call bump() inside their transaction,
+    which raises the version in reference_data_version, and invalidate()
+    after commit. Other app instances notice the bump through a one-row
+    version read at most every check_interval seconds; max_age forces a
+    reload to pick up edits made outside the app. Reads raise on database
+    errors, so they are safe on QueryExecutor worker threads.
+    """
+    def __init__(self, check_interval=5, max_age=600, min_connection=30):
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self.min_connection = min_connection
+        self._lock = threading.Lock()
+        self._version = None
+        self._loaded_at = 0
+        self._checked_at = 0
+        self._trains = []
+        self._by_id = {}
+        self._by_number = {}
+        self._by_name = {}
+        self._stations = []
+        self._station_keys = {}
+        self._station_trie = StationTrie([])
+        self._stations_by_id = {}
+        self._planner = None
+    
+    @staticmethod
+    def create_table(cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS reference_data_version (
+                id TINYINT PRIMARY KEY,
+                version BIGINT NOT NULL
+            )
+        """)
+        cursor.execute("INSERT IGNORE INTO reference_data_version (id, version) VALUES (1, 0)")
+    
+    @staticmethod
+    def bump(cursor):
+        """Mark trains or schedules as changed, within the caller's transaction"""
+        cursor.execute("UPDATE reference_data_version SET version = version + 1 WHERE id = 1")
+    
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+    
+    def trains(self):
+        """All trains ordered by name, as dicts of the trains columns"""
+        self._refresh()
+        return self._trains
+    
+    def train(self, train_id):
+        self._refresh()
+        return self._by_id.get(train_id)
+    
+    def train_by_number(self, train_number):
+        self._refresh()
+        return self._by_number.get(train_number.strip().upper())
+    
+    def trains_named(self, train_name):
+        self._refresh()
+        return self._by_name.get(train_name.strip().lower(), [])
+    
+    def stations(self):
+        """All stations ordered by name, as dicts of the stations columns"""
+        self._refresh()
+        return self._stations
+    
+    def station(self, text):
+        """The station whose name, code or alias is text (any case), or None"""
+        self._refresh()
+        return self._station_keys.get(" ".join(text.split()).lower())
+    
+    def station_by_id(self, station_id):
+        self._refresh()
+        return self._stations_by_id.get(station_id)
+    
+    def journey_planner(self):
+        """JourneyPlanner over every stop-to-stop ride of the schedules departing from yesterday on"""
+        self._refresh()
+        with self._lock:
+            if self._planner is None:
+                rows = fetch_all("""
+                    SELECT s.id, s.train_id,
+                           a.station_id AS source_station_id, b.station_id AS destination_station_id,
+                           DATE(a.departure_at) AS departure_date, TIME(a.departure_at) AS departure_time,
+                           DATE(b.arrival_at) AS arrival_date, TIME(b.arrival_at) AS arrival_time,
+                           s.fare_sleeper * (b.fare_fraction - a.fare_fraction) AS fare_sleeper,
+                           s.fare_ac * (b.fare_fraction - a.fare_fraction) AS fare_ac,
+                           s.fare_general * (b.fare_fraction - a.fare_fraction) AS fare_general,
+                           s.status, s.delay_minutes
+                    FROM schedules s
+                    JOIN schedule_stops a ON a.schedule_id = s.id
+                    JOIN schedule_stops b ON b.schedule_id = s.id AND b.stop_index > a.stop_index
+                    WHERE s.departure_date >= CURDATE() - INTERVAL 1 DAY
+                """)
+                self._planner = JourneyPlanner.from_schedules(rows, min_connection=self.min_connection)
+            return self._planner
+    
+    def suggest(self, prefix):
+        """Autocomplete from the stations loaded so far; never touches the database"""
+        return self._station_trie.suggest(prefix)
+    
+    def closest(self, text):
+        """Stations sharing the longest known prefix with text, for "did you mean" hints"""
+        return self._station_trie.closest(text)
+    
+    def _refresh(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._version is not None and now - self._loaded_at < self.max_age:
+                if now - self._checked_at < self.check_interval:
+                    return
+                connection = get_db_pool().get_connection()
+                cursor = connection.cursor()
+                try:
+                    version = self._read_version(cursor)
+                finally:
+                    cursor.close()
+                    connection.close()
+                self._checked_at = now
+                if version == self._version:
+                    return
+            self._load()
+    
+    @staticmethod
+    def _read_version(cursor):
+        cursor.execute("SELECT version FROM reference_data_version WHERE id = 1")
+        row = cursor.fetchone()
+        return row[0] if row else 0
+    
+    def _load(self):
+        connection = get_db_pool().get_connection()
+        cursor = connection.cursor(dictionary=True)
+        try:
+            # Read the version first so a change racing the load is seen on the next check
+            cursor.execute("SELECT version FROM reference_data_version WHERE id = 1")
+            row = cursor.fetchone()
+            version = row["version"] if row else 0
+            cursor.execute("SELECT * FROM trains ORDER BY train_name, id")
+            trains = cursor.fetchall()
+            cursor.execute("SELECT id, code, name, aliases FROM stations ORDER BY name")
+            stations = cursor.fetchall()
+        finally:
+            cursor.close()
+            connection.close()
+        
+        by_name = {}
+        for train in trains:
+            by_name.setdefault(train["train_name"].lower(), []).append(train)
+        station_keys = {}
+        for station in stations:
+            for key in [station["code"]] + station["aliases"].split(","):
+                if key.strip():
+                    station_keys.setdefault(" ".join(key.split()).lower(), station)
+        # Names win over another station's code or alias
+        station_keys.update({station["name"].lower(): station for station in stations})
+        
+        self._trains = trains
+        self._by_id = {train["id"]: train for train in trains}
+        self._by_number = {train["train_number"].upper(): train for train in trains}
+        self._by_name = by_name
+        self._stations = stations
+        self._station_keys = station_keys
+        self._station_trie = StationTrie(stations)
+        self._stations_by_id = {station["id"]: station for station in stations}
+        self._planner = None
+        self._version = version
+        self._loaded_at = self._checked_at = time.monotonic()
+
+# Journey planning
+JourneyLeg = namedtuple("JourneyLeg", "schedule_id train_id origin destination depart arrive fares")
+
+# Index of each seat class in JourneyLeg.fares
+JOURNEY_FARE_CLASSES = ("sleeper", "ac", "general")
+
+# Times inside the planner are whole minutes since this instant
+JOURNEY_EPOCH = datetime(2024, 1, 1)
+
+# Most train changes booking search offers when there is no direct train
+JOURNEY_MAX_CHANGES = 2
+
+def journey_minutes(day, clock=None):
+    """Minutes since JOURNEY_EPOCH of a datetime, or of a date plus a TIME value"""
+    if clock is not None:
+        if not isinstance(clock, timedelta):
+            clock = timedelta(hours=clock.hour, minutes=clock.minute, seconds=clock.second)
+        day = datetime(day.year, day.month, day.day) + clock
+    return int((day - JOURNEY_EPOCH).total_seconds() // 60)
+
+def journey_datetime(minutes):
+    return JOURNEY_EPOCH + timedelta(minutes=minutes)
+
+class _JourneyLabel:
+    """One Pareto-optimal way of reaching a station: when, for how much, and via which leg"""
+    __slots__ = ("arrive", "fare", "leg", "parent", "alive")
+    
+    def __init__(self, arrive, fare, leg, parent):
+        self.arrive = arrive
+        self.fare = fare
+        self.leg = leg
+        self.parent = parent
+        self.alive = True
+
+class JourneyPlanner:
+    """Connecting-train itineraries over an in-memory index of schedules.
+
+    Each ride between two stops of a schedule is one leg. The index keeps
+    every station's departures sorted by time, so the legs that can be caught
+    after arriving are a bisect away. plan() works in RAPTOR-style rounds:
+    round k extends the journeys of round k - 1 by one more train, and each
+    station keeps only the journeys no other journey beats on both arrival
+    time and fare. Changing trains needs at least min_connection minutes
+    and waits longer than max_wait minutes are not considered.
+    """
+    def __init__(self, legs, min_connection=30, max_wait=12 * 60):
+        self.min_connection = min_connection
+        self.max_wait = max_wait
+        departures = defaultdict(list)
+        for leg in legs:
+            if leg.origin != leg.destination and leg.arrive > leg.depart:
+                departures[leg.origin].append(leg)
+        self._departures = {}
+        self._times = {}
+        for station, station_legs in departures.items():
+            station_legs.sort(key=lambda leg: leg.depart)
+            self._departures[station] = station_legs
+            self._times[station] = [leg.depart for leg in station_legs]
+    
+    @classmethod
+    def from_schedules(cls, rows, **kwargs):
+        """Build from schedule rows (dicts with the schedules columns); delays are applied"""
+        legs = []
+        for row in rows:
+            if row["status"] == "cancelled" or row["source_station_id"] is None or row["destination_station_id"] is None:
+                continue
+            delay = row["delay_minutes"] or 0
+            legs.append(JourneyLeg(
+                row["id"],
+                row["train_id"],
+                row["source_station_id"],
+                row["destination_station_id"],
+                journey_minutes(row["departure_date"], row["departure_time"]) + delay,
+                journey_minutes(row["arrival_date"], row["arrival_time"]) + delay,
+                (float(row["fare_sleeper"]), float(row["fare_ac"]), float(row["fare_general"])),
+            ))
+        return cls(legs, **kwargs)
+    
+    def __len__(self):
+        return sum(len(legs) for legs in self._departures.values())
+    
+    def plan(self, origin, destination, depart_after, seat_class="all", max_changes=2, limit=5, window=None):
+        """Fastest-to-cheapest itineraries from origin to destination leaving at or after depart_after.
+
+        Stations are ids and depart_after is a datetime. seat_class picks
+        the fare column; "all" uses each leg's cheapest class. Returns up
+        to limit dicts with legs, depart, arrive, fare and changes, sorted
+        by arrival time, where every later entry is cheaper than the ones
+        before it. The first train leaves within window minutes (default
+        max_wait) of depart_after.
+        """
+        if origin == destination:
+            return []
+        fare_index = None if seat_class == "all" else JOURNEY_FARE_CLASSES.index(seat_class)
+        # No connection time is needed before the first train
+        start = _JourneyLabel(journey_minutes(depart_after) - self.min_connection, 0.0, None, None)
+        first_wait = self.max_wait if window is None else window
+        bags = {origin: [start]}
+        marked = {origin: [start]}
+        
+        for _ in range(max_changes + 1):
+            target = bags.setdefault(destination, [])
+            improved = defaultdict(list)
+            for station, labels in marked.items():
+                departures = self._departures.get(station)
+                if not departures:
+                    continue
+                times = self._times[station]
+                for label in labels:
+                    if not label.alive:
+                        continue
+                    ready = label.arrive + self.min_connection
+                    first = bisect.bisect_left(times, ready)
+                    wait = first_wait if label is start else self.max_wait
+                    last = bisect.bisect_right(times, ready + wait, first)
+                    for leg in departures[first:last]:
+                        if leg.destination == origin:
+                            continue
+                        fare = label.fare + (min(leg.fares) if fare_index is None else leg.fares[fare_index])
+                        # Nothing that reaches a station after a journey that is
+                        # already at the destination, for more, can ever win
+                        if any(best.arrive <= leg.arrive and best.fare <= fare for best in target):
+                            continue
+                        new = _JourneyLabel(leg.arrive, fare, leg, label)
+                        if self._merge(bags.setdefault(leg.destination, []), new):
+                            improved[leg.destination].append(new)
+            improved.pop(destination, None)
+            if not improved:
+                break
+            marked = improved
+        
+        itineraries = []
+        for final in sorted(bags.get(destination, ()), key=lambda label: (label.arrive, label.fare)):
+            legs = []
+            label = final
+            while label.leg is not None:
+                legs.append(label.leg)
+                label = label.parent
+            legs.reverse()
+            itineraries.append({
+                "legs": legs,
+                "depart": journey_datetime(legs[0].depart),
+                "arrive": journey_datetime(legs[-1].arrive),
+                "fare": round(final.fare, 2),
+                "changes": len(legs) - 1,
+            })
+        return itineraries[:limit]
+    
+    @staticmethod
+    def _merge(bag, new):
+        """Add new to a station's Pareto set unless something there beats it"""
+        for label in bag:
+            if label.arrive <= new.arrive and label.fare <= new.fare:
+                return False
+        for label in bag:
+            if new.arrive <= label.arrive and new.fare <= label.fare:
+                label.alive = False
+        bag[:] = [label for label in bag if label.alive]
+        bag.append(new)
+        return True
+
+# Background queries
+def fetch_all(query, params=()):
+    """Run a read query on a pooled connection and return the rows as dicts.
+
+    Unlike get_db_connection() this raises instead of showing a message box,
+    so it is safe to call from QueryExecutor worker threads.
+    """
+    connection = get_db_pool().get_connection()
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        connection.close()
+
+class QueryExecutor:
+    """Runs database work on a thread pool so the Tk main loop never waits on it.
+
+    submit() returns the Future of work(). Workers never touch Tk: finished
+    futures are queued and the main loop drains the queue once per frame
+    with app.after, calling on_done(result) or on_error(exception) there.
+
+    Requests sharing a key supersede each other, e.g. a new search typed
+    before the previous one returned: the older request is cancelled if it
+    has not started and its result is dropped if it has.
+    """
+    FRAME_MS = 16
+    
+    def __init__(self, app, workers=4):
+        self.app = app
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db-query")
+        self._finished = queue.SimpleQueue()
+        self._latest = {}
+        self._outstanding = 0
+        self._polling = False
+    
+    def submit(self, work, on_done=None, on_error=None, key=None):
+        if key is not None:
+            self.cancel(key)
+        
+        future = self._executor.submit(work)
+        if key is not None:
+            self._latest[key] = future
+        self._outstanding += 1
+        future.add_done_callback(lambda f: self._finished.put((f, key, on_done, on_error)))
+        
+        if not self._polling:
+            self._polling = True
+            self.app.after(self.FRAME_MS, self._drain)
+        return future
+    
+    def cancel(self, key):
+        future = self._latest.pop(key, None)
+        if future is not None:
+            future.cancel()
+    
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _drain(self):
+        while True:
+            try:
+                future, key, on_done, on_error = self._finished.get_nowait()
+            except queue.Empty:
+                break
+            self._outstanding -= 1
+            
+            # Superseded or cancelled requests are dropped silently
+            if key is not None:
+                if self._latest.get(key) is not future:
+                    continue
+                del self._latest[key]
+            if future.cancelled():
+                continue
+            
+            try:
+                error = future.exception()
+                if error is None:
+                    if on_done:
+                        on_done(future.result())
+                elif on_error:
+                    on_error(error)
+                else:
+                    print(f"Background query failed: {error}")
+            except Exception as e:
+                print(f"Error handling query result: {e}")
+        
+        if self._outstanding:
+            self.app.after(self.FRAME_MS, self._drain)
+        else:
+            self._polling = False
+
+# Keyset pagination
+def estimate_row_count(from_clause, where=None, params=(), table=None):
+    """Cheap row estimate: InnoDB table statistics when unfiltered, else the optimizer's EXPLAIN estimate"""
+    if where is None and table:
+        rows = fetch_all(
+            "SELECT TABLE_ROWS AS estimate FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            (table,)
+        )
+        return int(rows[0]['estimate'] or 0) if rows else 0
+    
+    plan = fetch_all(f"EXPLAIN SELECT 1 {from_clause} {'WHERE ' + where if where else ''}", params)
+    if not plan:
+        return 0
+    return int((plan[0]['rows'] or 0) * float(plan[0].get('filtered') or 100) / 100)
+
+class KeysetPager:
+    """Pages through a query by keyset ("seek") instead of OFFSET.
+
+    order lists the (column, row_key) pairs of a unique sort key, e.g.
+    [("b.booking_date", "booking_date"), ("b.id", "id")], all sorted in one
+    direction. Each page remembers the keys of its first and last rows and
+    the next or previous page seeks past them with a row comparison, so a
+    page costs O(page_size) on an index matching the order, however deep
+    into the table it is. Methods run queries through fetch_all() and may
+    be called from QueryExecutor workers; a lock makes each call see and
+    leave a consistent page state.
+    """
+    def __init__(self, columns, from_clause, order, descending=True, where=None, params=(),
+                 page_size=50, count_table=None):
+        self.columns = columns
+        self.from_clause = from_clause
+        self.order = order
+        self.descending = descending
+        self.where = where
+        self.params = tuple(params)
+        self.page_size = page_size
+        self.count_table = count_table
+        self.rows = []
+        self.page_number = 0
+        self.has_next = False
+        self.has_previous = False
+        self._first_key = None
+        self._last_key = None
+        self._lock = threading.RLock()
+    
+    def first_page(self):
+        with self._lock:
+            self.page_number = 1
+            return self._load(None, forward=True)
+    
+    def next_page(self):
+        with self._lock:
+            if not self.has_next:
+                return self.rows
+            self.page_number += 1
+            return self._load(self._last_key, forward=True)
+    
+    def previous_page(self):
+        with self._lock:
+            if not self.has_previous:
+                return self.rows
+            self.page_number -= 1
+            return self._load(self._first_key, forward=False)
+    
+    def set_page_size(self, page_size):
+        with self._lock:
+            self.page_size = page_size
+            return self.first_page()
+    
+    def approximate_count(self):
+        return estimate_row_count(self.from_clause, self.where, self.params, self.count_table)
+    
+    def _where_sql(self, conditions):
+        conditions = ([self.where] if self.where else []) + conditions
+        return "WHERE " + " AND ".join(f"({condition})" for condition in conditions) if conditions else ""
+    
+    def _load(self, key, forward):
+        # Walking backwards flips both the comparison and the sort, and the
+        # rows are reversed afterwards
+        ascending = forward != self.descending
+        params = list(self.params)
+        conditions = []
+        if key is not None:
+            columns = ", ".join(column for column, _ in self.order)
+            placeholders = ", ".join(["%s"] * len(self.order))
+            conditions.append(f"({columns}) {'>' if ascending else '<'} ({placeholders})")
+            params.extend(key)
+        
+        direction = "ASC" if ascending else "DESC"
+        query = f"""
+            SELECT {self.columns}
+            {self.from_clause}
+            {self._where_sql(conditions)}
+            ORDER BY {', '.join(f'{column} {direction}' for column, _ in self.order)}
+            LIMIT %s
+        """
+        params.append(self.page_size + 1)
+        
+        rows = fetch_all(query, params)
+        more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        
+        if forward:
+            self.has_next = more
+            self.has_previous = key is not None
+        else:
+            rows.reverse()
+            self.has_next = True
+            self.has_previous = more
+            if not more:
+                self.page_number = 1
+        
+        if rows:
+            self._first_key = tuple(rows[0][row_key] for _, row_key in self.order)
+            self._last_key = tuple(rows[-1][row_key] for _, row_key in self.order)
+        self.rows = rows
+        return rows
+
+# Streaming exports
+EXPORT_BATCH_SIZE = 5000
+
+class ExportCancelled(Exception):
+    pass
+
+def stream_query(query, params=(), batch_size=EXPORT_BATCH_SIZE, connection=None):
+    """Yield the column names of query, then its rows in batches of tuples.
+
+    Uses an unbuffered cursor, so rows are pulled from the server with
+    fetchmany() only as the consumer asks for them and memory holds one
+    batch however large the result. A stream that is closed before the end
+    (e.g. a cancelled export) drops its connection instead of returning it
+    to the pool, since draining the unread rows would take as long as the
+    export itself. A connection passed in (e.g. one holding a snapshot) is
+    used as is and left to the caller, who must discard it if the stream
+    is abandoned.
+    """
+    owned = connection is None
+    if owned:
+        connection = get_db_pool().get_connection()
+    finished = False
+    try:
+        cursor = connection.cursor(buffered=False)
+        cursor.execute(query, params)
+        yield [column[0] for column in cursor.description]
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+        cursor.close()
+        finished = True
+    finally:
+        if owned and finished:
+            connection.close()
+        elif owned:
+            connection.discard()
+
+def write_csv_export(file_path, stream, progress=None, cancel_event=None):
+    """Write a stream_query()-style stream to file_path as CSV and return the row count.
+
+    The file is gzip-compressed when file_path ends in .gz. progress(rows)
+    is called after each batch. Setting cancel_event stops the export,
+    deletes the partial file and raises ExportCancelled.
+    """
+    opener = gzip.open if file_path.endswith(".gz") else open
+    rows_written = 0
+    try:
+        with opener(file_path, "wt", newline="") as export_file:
+            writer = csv.writer(export_file)
+            writer.writerow(next(stream))
+            for batch in stream:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ExportCancelled()
+                writer.writerows(batch)
+                rows_written += len(batch)
+                if progress:
+                    progress(rows_written)
+    except BaseException:
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+        raise
+    finally:
+        stream.close()
+    return rows_written
+
+# Columnar exports
+COLUMNAR_BATCH_SIZE = 50000
+
+COLUMNAR_DATASETS = {
+    "bookings": {
+        "query": """
+            SELECT b.id, b.pnr, b.user_id, b.schedule_id, b.booking_date,
+                   b.total_fare, b.status, b.payment_method,
+                   t.train_number, t.train_name, s.source, s.destination,
+                   s.departure_date, s.departure_time,
+                   (SELECT COUNT(*) FROM passengers p WHERE p.booking_id = b.id) as passengers
+            FROM bookings b
+            JOIN schedules s ON b.schedule_id = s.id
+            JOIN trains t ON s.train_id = t.id
+        """,
+        "columns": [
+            ("id", "int"), ("pnr", "string"), ("user_id", "int"), ("schedule_id", "int"),
+            ("booking_date", "timestamp"), ("total_fare", "money"), ("status", "category"),
+            ("payment_method", "category"), ("train_number", "string"), ("train_name", "string"),
+            ("source", "category"), ("destination", "category"), ("departure_date", "date"),
+            ("departure_time", "time"), ("passengers", "int"),
+        ],
+        "order": "b.id",
+        # (SQL column, result column) that incremental exports resume from
+        "watermark": ("b.id", "id"),
+    },
+    "revenue_daily": {
+        "query": """
+            SELECT r.booking_day, r.source, r.destination, r.seat_class, r.payment_method,
+                   r.revenue, r.confirmed_bookings, r.cancelled_bookings,
+                   r.total_bookings, r.passengers
+            FROM revenue_daily r
+        """,
+        "columns": [
+            ("booking_day", "date"), ("source", "category"), ("destination", "category"),
+            ("seat_class", "category"), ("payment_method", "category"), ("revenue", "money"),
+            ("confirmed_bookings", "int"), ("cancelled_bookings", "int"),
+            ("total_bookings", "int"), ("passengers", "int"),
+        ],
+        "order": "r.booking_day, r.source, r.destination, r.seat_class, r.payment_method",
+        "watermark": None,
+    },
+}
+
+COLUMNAR_FORMATS = {
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".jsonl": "jsonl",
+    ".jsonl.gz": "jsonl",
+}
+
+def columnar_format(file_path):
+    """Export format for file_path, chosen by its extension"""
+    for extension, export_format in COLUMNAR_FORMATS.items():
+        if file_path.lower().endswith(extension):
+            return export_format
+    raise ValueError(f"Unsupported export file type: {file_path} (use .parquet, .arrow or .jsonl[.gz])")
+
+def _arrow_schema(pa, columns, dictionaries=True):
+    types = {
+        "int": pa.int64(),
+        "string": pa.string(),
+        "category": pa.dictionary(pa.int32(), pa.string()) if dictionaries else pa.string(),
+        "money": pa.decimal128(14, 2),
+        "timestamp": pa.timestamp("s"),
+        "date": pa.date32(),
+        "time": pa.time32("s"),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+def _arrow_batch(pa, schema, columns, rows):
+    arrays = []
+    for index, (name, kind) in enumerate(columns):
+        values = [row[index] for row in rows]
+        if pa.types.is_dictionary(schema.field(name).type):
+            arrays.append(pa.array(values, pa.string()).dictionary_encode())
+            continue
+        if kind == "time":
+            # MySQL TIME columns come back as timedelta
+            values = [None if value is None else int(value.total_seconds()) for value in values]
+        arrays.append(pa.array(values, schema.field(name).type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        # Keep the exact amount; floats would round fares
+        return str(value)
+    if isinstance(value, timedelta):
+        seconds = int(value.total_seconds())
+        return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+@contextmanager
+def _parquet_writer(file_path, columns):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    schema = _arrow_schema(pa, columns)
+    writer = pq.ParquetWriter(file_path, schema, compression="zstd")
+    try:
+        # One row group per batch
+        yield lambda rows: writer.write_batch(_arrow_batch(pa, schema, columns, rows))
+    finally:
+        writer.close()
+
+@contextmanager
+def _arrow_writer(file_path, columns):
+    import pyarrow as pa
+    
+    # An IPC file holds one dictionary per field for the whole file, and
+    # every batch would bring its own, so categories are plain strings here
+    schema = _arrow_schema(pa, columns, dictionaries=False)
+    writer = pa.ipc.new_file(file_path, schema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+    try:
+        yield lambda rows: writer.write_batch(_arrow_batch(pa, schema, columns, rows))
+    finally:
+        writer.close()
+
+@contextmanager
+def _jsonl_writer(file_path, columns):
+    # JSON has no date or decimal types, so the column types go in a sidecar
+    # file for the reader to cast with
+    with open(file_path + ".schema.json", "w") as schema_file:
+        json.dump([{"name": name, "type": kind} for name, kind in columns], schema_file, indent=2)
+    
+    opener = gzip.open if file_path.endswith(".gz") else open
+    names = [name for name, _ in columns]
+    with opener(file_path, "wt", encoding="utf-8") as export_file:
+        def write(rows):
+            for row in rows:
+                record = {name: _json_value(value) for name, value in zip(names, row)}
+                export_file.write(json.dumps(record) + "\n")
+        yield write
+
+COLUMNAR_WRITERS = {
+    "parquet": _parquet_writer,
+    "arrow": _arrow_writer,
+    "jsonl": _jsonl_writer,
+}
+
+def get_export_watermark(dataset):
+    """Highest id already exported for dataset, or 0"""
+    connection = get_db_pool().get_connection()
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT last_id FROM export_watermarks WHERE dataset = %s", (dataset,))
+        row = cursor.fetchone()
+        return row[0] if row else 0
+    finally:
+        cursor.close()
+        connection.close()
+
+def set_export_watermark(dataset, last_id, rows):
+    connection = get_db_pool().get_connection()
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO export_watermarks (dataset, last_id, last_rows)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE last_id = VALUES(last_id), last_rows = VALUES(last_rows),
+                                    exported_at = CURRENT_TIMESTAMP
+        """, (dataset, last_id, rows))
+        connection.commit()
+    finally:
+        cursor.close()
+        connection.close()
+
+def export_columnar(dataset, file_path, incremental=False, batch_size=COLUMNAR_BATCH_SIZE,
+                    progress=None, cancel_event=None):
+    """Export a COLUMNAR_DATASETS entry to file_path and return (rows, file_path).
+
+    The format follows the extension: .parquet (zstd, one row group per
+    batch), .arrow/.feather (Arrow IPC file) or .jsonl[.gz]. Parquet and
+    Arrow need pyarrow; without it the export falls back to gzipped JSON
+    lines next to the requested path, which is why the path actually
+    written is returned. Rows are streamed batch_size at a time, so memory
+    holds one batch whatever the table size.
+
+    With incremental=True only rows above the dataset's watermark are
+    exported, and the watermark moves to the last exported id once the file
+    is complete, so a nightly job hands over just the new bookings.
+    """
+    spec = COLUMNAR_DATASETS[dataset]
+    if incremental and not spec["watermark"]:
+        raise ValueError(f"{dataset} has no watermark column for incremental exports")
+    
+    export_format = columnar_format(file_path)
+    if export_format != "jsonl":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            file_path = os.path.splitext(file_path)[0] + ".jsonl.gz"
+            export_format = "jsonl"
+    
+    query = spec["query"]
+    params = []
+    since = 0
+    if incremental:
+        since = get_export_watermark(dataset)
+        query += f" WHERE {spec['watermark'][0]} > %s"
+        params.append(since)
+    query += f" ORDER BY {spec['order']}"
+    
+    stream = stream_query(query, params, batch_size)
+    rows_written = 0
+    last_id = since
+    try:
+        names = next(stream)
+        watermark_index = names.index(spec["watermark"][1]) if incremental else None
+        with COLUMNAR_WRITERS[export_format](file_path, spec["columns"]) as write:
+            for batch in stream:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ExportCancelled()
+                write(batch)
+                rows_written += len(batch)
+                if watermark_index is not None:
+                    last_id = batch[-1][watermark_index]
+                if progress:
+                    progress(rows_written)
+    except BaseException:
+        for path in (file_path, file_path + ".schema.json"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        raise
+    finally:
+        stream.close()
+    
+    if incremental and rows_written:
+        set_export_watermark(dataset, last_id, rows_written)
+    return rows_written, file_path
+
+def run_columnar_export(dataset, file_path, incremental=False):
+    """Command-line entry point for export_columnar()"""
+    # Make sure the export_watermarks table exists
+    if not initialize_database():
+        return False
+    try:
+        rows, written_path = export_columnar(dataset, file_path, incremental)
+    except (mysql.connector.Error, ValueError) as err:
+        print(f"Export failed: {err}")
+        return False
+    if written_path != file_path:
+        print("pyarrow is not installed; wrote JSON lines instead")
+    print(f"Exported {rows} {dataset} rows to {written_path}")
+    return True
+
+# Backup and restore
+BACKUP_FORMAT = 1
+BACKUP_CHUNK_ROWS = 10000
+RESTORE_BATCH_ROWS = 500
+
+def _backup_value(value):
+    # json.dumps default= hook for the MySQL types JSON can't hold; restore
+    # sends them back as strings, which MySQL converts on insert
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, timedelta):
+        seconds = int(value.total_seconds())
+        sign = "-" if seconds < 0 else ""
+        seconds = abs(seconds)
+        return f"{sign}{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray)):
+        return {"$base64": base64.b64encode(value).decode("ascii")}
+    if isinstance(value, set):
+        # SET columns
+        return ",".join(sorted(value))
+    raise TypeError(f"Can't back up value of type {type(value).__name__}")
+
+def _restore_value(record):
+    if "$base64" in record:
+        return base64.b64decode(record["$base64"])
+    return record
+
+class BackupProgress:
+    """Thread-safe row and byte counters shared by the backup/restore workers."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rows = 0
+        self.bytes = 0
+        self.tables_done = 0
+        self.started = time.perf_counter()
+    
+    def add(self, rows, raw_bytes):
+        with self.lock:
+            self.rows += rows
+            self.bytes += raw_bytes
+    
+    def table_done(self):
+        with self.lock:
+            self.tables_done += 1
+    
+    def elapsed(self):
+        return time.perf_counter() - self.started
+    
+    def mb_per_second(self):
+        elapsed = self.elapsed()
+        return self.bytes / 1048576 / elapsed if elapsed else 0.0
+
+def backup_tables(cursor):
+    """Describe every base table for backup_database_to().
+
+    Returns {table: {"columns", "binary", "key"}}; generated columns are
+    left out since MySQL computes them again on restore, and "key" is "id"
+    for tables with an AUTO_INCREMENT id, which can be backed up
+    incrementally.
+    """
+    cursor.execute("""
+        SELECT c.TABLE_NAME, c.COLUMN_NAME, c.DATA_TYPE, c.EXTRA, c.GENERATION_EXPRESSION
+        FROM information_schema.COLUMNS c
+        JOIN information_schema.TABLES t
+          ON t.TABLE_SCHEMA = c.TABLE_SCHEMA AND t.TABLE_NAME = c.TABLE_NAME
+        WHERE c.TABLE_SCHEMA = DATABASE() AND t.TABLE_TYPE = 'BASE TABLE'
+        ORDER BY c.TABLE_NAME, c.ORDINAL_POSITION
+    """)
+    tables = {}
+    for table, column, data_type, extra, expression in cursor.fetchall():
+        table, column, extra = str(table), str(column), str(extra or "").lower()
+        info = tables.setdefault(table, {"columns": [], "binary": [], "key": None})
+        # Only real generated columns; EXTRA also says DEFAULT_GENERATED for
+        # every DEFAULT CURRENT_TIMESTAMP column, which must be backed up
+        if expression:
+            continue
+        info["columns"].append(column)
+        if str(data_type).lower() in ("blob", "tinyblob", "mediumblob", "longblob", "binary", "varbinary"):
+            info["binary"].append(column)
+        if column == "id" and "auto_increment" in extra:
+            info["key"] = "id"
+    return tables
+
+def _backup_table(connection, archive, archive_lock, table, info, progress, cancel_event, chunk_rows):
+    # Runs on a backup worker: streams one table into gzip chunks, reading
+    # through the worker's snapshot connection, and returns its manifest entry
+    columns = ", ".join(f"`{column}`" for column in info["columns"])
+    query = f"SELECT {columns} FROM `{table}`"
+    params = ()
+    if info["key"]:
+        query += " WHERE id > %s AND id <= %s ORDER BY id"
+        params = (info["since"], info["high_water"])
+    
+    chunks = []
+    rows = 0
+    stream = stream_query(query, params, chunk_rows, connection=connection)
+    try:
+        next(stream)
+        for batch in stream:
+            if cancel_event.is_set():
+                raise ExportCancelled()
+            raw = "".join(json.dumps(row, default=_backup_value) + "\n" for row in batch).encode("utf-8")
+            data = gzip.compress(raw, compresslevel=6)
+            name = f"{table}/{len(chunks):06d}.jsonl.gz"
+            with archive_lock:
+                archive.writestr(name, data)
+            chunks.append({
+                "name": name,
+                "rows": len(batch),
+                "bytes": len(raw),
+                "sha256": hashlib.sha256(data).hexdigest(),
+            })
+            rows += len(batch)
+            progress.add(len(batch), len(raw))
+    finally:
+        stream.close()
+    progress.table_done()
+    
+    return dict(info, rows=rows, chunks=chunks)
+
+def _backup_worker(connection, pending, pending_lock, archive, archive_lock, progress, cancel_event, chunk_rows):
+    # Runs on a backup worker: backs up tables from pending through one
+    # snapshot connection until none are left
+    entries = {}
+    while not cancel_event.is_set():
+        with pending_lock:
+            item = next(pending, None)
+        if item is None:
+            break
+        table, info = item
+        entries[table] = _backup_table(connection, archive, archive_lock, table, info,
+                                       progress, cancel_event, chunk_rows)
+    return entries
+
+def _start_backup_snapshots(coordinator, connections, tables):
+    """Open a consistent snapshot on every worker connection, all at the same point.
+
+    While coordinator holds a read lock on every table no write can
+    commit, so snapshots opened under it see the same data. Without the
+    LOCK TABLES privilege only the first connection gets a snapshot and
+    the others are returned; the remaining list is what the backup uses.
+    """
+    cursor = coordinator.cursor()
+    try:
+        if len(connections) > 1:
+            try:
+                cursor.execute("LOCK TABLES " + ", ".join(f"`{table}` READ" for table in tables))
+            except mysql.connector.Error as err:
+                print(f"Backing up with one worker, no table lock: {err}")
+                for connection in connections[1:]:
+                    connection.close()
+                del connections[1:]
+            else:
+                try:
+                    for connection in connections:
+                        connection.start_transaction(consistent_snapshot=True, readonly=True)
+                finally:
+                    cursor.execute("UNLOCK TABLES")
+                return connections
+        connections[0].start_transaction(consistent_snapshot=True, readonly=True)
+        return connections
+    finally:
+        cursor.close()
+
+def backup_database_to(file_path, incremental=False, workers=None, progress=None,
+                       cancel_event=None, chunk_rows=BACKUP_CHUNK_ROWS):
+    """Back up every table of the database to a zip archive and return its manifest.
+
+    Each table is streamed by one of up to BACKUP_WORKERS workers into
+    gzipped JSON-lines chunks of chunk_rows rows; manifest.json lists the
+    chunks with their SHA-256 so restore_database_from() can verify them.
+    Full backups also record each table's CREATE TABLE.
+
+    Every worker reads through its own consistent snapshot, and all of the
+    snapshots are opened at once under a brief LOCK TABLES ... READ, so
+    the archive is a single point in time across tables: seat maps, the
+    ledger and the rollup match the bookings it holds. Without the LOCK
+    TABLES privilege the backup falls back to one worker and one snapshot.
+
+    With incremental=True, tables with an AUTO_INCREMENT id only include
+    rows above the previous backup's high-water mark; updates and deletes
+    of older rows are not captured, so take a full backup regularly.
+    Tables without an id are always backed up in full.
+    """
+    progress = progress or BackupProgress()
+    cancel_event = cancel_event or threading.Event()
+    workers = workers or int(os.getenv("BACKUP_WORKERS", "3"))
+    pool = get_db_pool()
+    
+    coordinator = pool.get_connection()
+    connections = []
+    cursor = coordinator.cursor()
+    try:
+        tables = backup_tables(cursor)
+        for table, info in tables.items():
+            if not info["key"]:
+                continue
+            info["since"] = 0
+            if incremental:
+                cursor.execute("SELECT last_id FROM export_watermarks WHERE dataset = %s", (f"backup:{table}",))
+                row = cursor.fetchone()
+                info["since"] = row[0] if row else 0
+        if not incremental:
+            for table, info in tables.items():
+                cursor.execute(f"SHOW CREATE TABLE `{table}`")
+                info["create"] = cursor.fetchone()[1]
+        
+        connections = [pool.get_connection() for _ in range(max(1, min(workers, len(tables))))]
+        connections = _start_backup_snapshots(coordinator, connections, tables)
+        snapshot = connections[0].cursor()
+        for table, info in tables.items():
+            if info["key"]:
+                snapshot.execute(f"SELECT COALESCE(MAX(id), 0) FROM `{table}`")
+                info["high_water"] = snapshot.fetchone()[0]
+        snapshot.close()
+    except BaseException:
+        for connection in connections:
+            connection.discard()
+        raise
+    finally:
+        cursor.close()
+        coordinator.close()
+    
+    archive_lock = threading.Lock()
+    pending = iter(list(tables.items()))
+    pending_lock = threading.Lock()
+    finished = False
+    try:
+        with zipfile.ZipFile(file_path, "w", zipfile.ZIP_STORED) as archive:
+            with ThreadPoolExecutor(max_workers=len(connections)) as executor:
+                futures = [
+                    executor.submit(
+                        _backup_worker, connection, pending, pending_lock, archive, archive_lock,
+                        progress, cancel_event, chunk_rows
+                    )
+                    for connection in connections
+                ]
+                try:
+                    entries = {}
+                    for future in futures:
+                        entries.update(future.result())
+                except BaseException:
+                    cancel_event.set()  # stop the other workers
+                    raise
+            if cancel_event.is_set():
+                raise ExportCancelled()
+            
+            manifest = {
+                "format": BACKUP_FORMAT,
+                "database": os.getenv("MYSQL_DATABASE"),
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "incremental": incremental,
+                "tables": entries,
+                "rows": progress.rows,
+                "bytes": progress.bytes,
+                "seconds": round(progress.elapsed(), 3),
+            }
+            archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+        finished = True
+    except BaseException:
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+        raise
+    finally:
+        # A worker stopped mid-table leaves unread rows behind
+        for connection in connections:
+            if finished:
+                connection.commit()
+                connection.close()
+            else:
+                connection.discard()
+    
+    # Only move the high-water marks once the archive is complete
+    for table, entry in entries.items():
+        if entry["key"]:
+            set_export_watermark(f"backup:{table}", entry["high_water"], entry["rows"])
+    return manifest
+
+def _restore_table(archive, archive_lock, table, entry, progress, cancel_event, batch_rows):
+    columns = entry["columns"]
+    column_list = ", ".join(f"`{column}`" for column in columns)
+    row_placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    # Upsert so incremental archives can be applied on top of a full restore
+    update = ", ".join(f"`{column}` = VALUES(`{column}`)" for column in columns)
+    
+    connection = get_db_pool().get_connection()
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SET SESSION foreign_key_checks = 0")
+        for chunk in entry["chunks"]:
+            if cancel_event.is_set():
+                raise ExportCancelled()
+            with archive_lock:
+                data = archive.read(chunk["name"])
+            if hashlib.sha256(data).hexdigest() != chunk["sha256"]:
+                raise ValueError(f"Checksum mismatch in {chunk['name']}; the archive is damaged")
+            raw = gzip.decompress(data)
+            rows = [
+                json.loads(line, object_hook=_restore_value)
+                for line in raw.decode("utf-8").splitlines()
+            ]
+            for start in range(0, len(rows), batch_rows):
+                batch = rows[start:start + batch_rows]
+                cursor.execute(
+                    f"INSERT INTO `{table}` ({column_list}) VALUES "
+                    + ", ".join([row_placeholder] * len(batch))
+                    + f" ON DUPLICATE KEY UPDATE {update}",
+                    [value for row in batch for value in row]
+                )
+            connection.commit()
+            progress.add(chunk["rows"], chunk["bytes"])
+        cursor.execute("SET SESSION foreign_key_checks = 1")
+    except BaseException:
+        # Don't hand a session with foreign key checks off back to the pool
+        connection.discard()
+        raise
+    cursor.close()
+    connection.close()
+    progress.table_done()
+
+def restore_database_from(file_path, workers=None, progress=None, cancel_event=None,
+                          batch_rows=RESTORE_BATCH_ROWS):
+    """Load an archive written by backup_database_to() and return its manifest.
+
+    Tables missing from the database are created from the archive's CREATE
+    TABLE statements, then each table is loaded by its own worker with
+    multi-row INSERT ... ON DUPLICATE KEY UPDATE statements of batch_rows
+    rows, committed per chunk. Every chunk's checksum is verified before it
+    is loaded.
+    """
+    progress = progress or BackupProgress()
+    cancel_event = cancel_event or threading.Event()
+    workers = workers or int(os.getenv("BACKUP_WORKERS", "3"))
+    
+    with zipfile.ZipFile(file_path) as archive:
+        manifest = json.loads(archive.read("manifest.json"))
+        if manifest.get("format") != BACKUP_FORMAT:
+            raise ValueError(f"{os.path.basename(file_path)} is not a supported backup archive")
+        tables = manifest["tables"]
+        
+        connection = get_db_pool().get_connection()
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SET SESSION foreign_key_checks = 0")
+            for entry in tables.values():
+                if entry.get("create"):
+                    cursor.execute(entry["create"].replace("CREATE TABLE", "CREATE TABLE IF NOT EXISTS", 1))
+            cursor.execute("SET SESSION foreign_key_checks = 1")
+        except BaseException:
+            connection.discard()
+            raise
+        cursor.close()
+        connection.close()
+        
+        archive_lock = threading.Lock()
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(tables)))) as executor:
+            futures = [
+                executor.submit(
+                    _restore_table, archive, archive_lock, table, entry,
+                    progress, cancel_event, batch_rows
+                )
+                for table, entry in tables.items()
+            ]
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                cancel_event.set()
+                raise
+    return manifest
+
+def run_backup(file_path, incremental=False):
+    """Command-line entry point for backup_database_to()"""
+    if not initialize_database():
+        return False
+    progress = BackupProgress()
+    try:
+        manifest = backup_database_to(file_path, incremental, progress=progress)
+    except (mysql.connector.Error, OSError) as err:
+        print(f"Backup failed: {err}")
+        return False
+    kind = "Incremental" if incremental else "Full"
+    print(f"{kind} backup of {len(manifest['tables'])} tables, {progress.rows:,} rows to {file_path}")
+    print(f"{progress.bytes / 1048576:.1f} MB in {progress.elapsed():.1f} s "
+          f"({progress.mb_per_second():.1f} MB/s), archive {os.path.getsize(file_path) / 1048576:.1f} MB")
+    return True
+
+def run_restore(file_path):
+    """Command-line entry point for restore_database_from()"""
+    progress = BackupProgress()
+    try:
+        manifest = restore_database_from(file_path, progress=progress)
+    except (mysql.connector.Error, OSError, ValueError, KeyError, zipfile.BadZipFile) as err:
+        print(f"Restore failed: {err}")
+        return False
+    print(f"Restored {len(manifest['tables'])} tables, {progress.rows:,} rows from {file_path}")
+    print(f"{progress.bytes / 1048576:.1f} MB in {progress.elapsed():.1f} s ({progress.mb_per_second():.1f} MB/s)")
+    return True
+
+# Virtualized tables
+class ListRowSource:
+    """Row source over rows that are already in memory (search results)."""
+    def __init__(self, rows):
+        self.rows = rows
+    
+    def __len__(self):
+        return len(self.rows)
+    
+    def get_rows(self, start, stop):
+        return self.rows[start:stop]
+
+class VirtualGrid(ctk.CTkFrame):
+    """Table that only creates widgets for the rows that are in view.
+
+    columns is a list of (title, width) pairs. build_row(row_frame) creates
+    the cell widgets of one row and returns them; fill_row(cells, row, index)
+    points those widgets at a record. One pooled row per visible line is
+    created and re-filled while scrolling, so the number of widgets does not
+    grow with the number of rows in source.
+    """
+    def __init__(self, master, columns, source, build_row, fill_row, row_height=50, visible_rows=10, **kwargs):
+        kwargs.setdefault("fg_color", "transparent")
+        super().__init__(master, **kwargs)
+        self.columns = columns
+        self.source = self._as_source(source)
+        self.build_row = build_row
+        self.fill_row = fill_row
+        self.row_height = row_height
+        self.first = 0
+        self.visible = 0
+        self.pool = []
+        
+        header_frame = ctk.CTkFrame(self, fg_color=("gray80", "gray25"))
+        header_frame.pack(fill="x")
+        self._configure_columns(header_frame)
+        for i, (text, width) in enumerate(columns):
+            ctk.CTkLabel(
+                header_frame,
+                text=text,
+                font=ctk.CTkFont(weight="bold"),
+                width=width,
+                anchor="w"
+            ).grid(row=0, column=i, padx=5, pady=8, sticky="w")
+        
+        body_frame = ctk.CTkFrame(self, fg_color="transparent")
+        body_frame.pack(fill="both", expand=True)
+        
+        self.scrollbar = ctk.CTkScrollbar(body_frame, command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        
+        # Rows are placed by hand, so the viewport keeps the height it is given
+        viewport_rows = max(1, min(visible_rows, len(self.source)))
+        self.viewport = ctk.CTkFrame(body_frame, fg_color="transparent", height=viewport_rows * row_height)
+        self.viewport.pack(side="left", fill="both", expand=True)
+        self.viewport.bind("<Configure>", self._on_resize, add="+")
+        self._bind_wheel(self.viewport)
+        
+        self._ensure_pool(viewport_rows)
+        self._render()
+    
+    def set_source(self, source):
+        self.source = self._as_source(source)
+        self.first = min(self.first, self._max_first())
+        self._render()
+    
+    def refresh(self):
+        self._render()
+    
+    def scroll_to(self, index):
+        index = max(0, min(index, self._max_first()))
+        if index != self.first:
+            self.first = index
+            self._render()
+    
+    @staticmethod
+    def _as_source(rows):
+        # Plain lists (search results) are wrapped; lazy sources pass through
+        return rows if hasattr(rows, "get_rows") else ListRowSource(rows)
+    
+    def _max_first(self):
+        return max(0, len(self.source) - self.visible)
+    
+    def _configure_columns(self, frame):
+        for i, (_, width) in enumerate(self.columns):
+            frame.grid_columnconfigure(i, minsize=width + 10)
+    
+    def _ensure_pool(self, rows):
+        self.visible = rows
+        while len(self.pool) < rows + 1:
+            row_frame = ctk.CTkFrame(self.viewport, fg_color="transparent", corner_radius=0, height=self.row_height)
+            row_frame.grid_propagate(False)
+            self._configure_columns(row_frame)
+            cells = self.build_row(row_frame)
+            self._bind_wheel(row_frame)
+            self.pool.append([row_frame, cells, 0])
+    
+    def _render(self):
+        total = len(self.source)
+        rows = self.source.get_rows(self.first, self.first + len(self.pool)) if total else []
+        
+        for slot, entry in enumerate(self.pool):
+            row_frame, cells, parity = entry
+            if slot < len(rows):
+                index = self.first + slot
+                if index % 2 != parity:
+                    row_frame.configure(fg_color="transparent" if index % 2 == 0 else ("gray90", "gray20"))
+                    entry[2] = index % 2
+                self.fill_row(cells, rows[slot], index)
+                row_frame.place(x=0, y=slot * self.row_height, relwidth=1)
+            else:
+                row_frame.place_forget()
+        
+        if total:
+            self.scrollbar.set(self.first / total, min(1.0, (self.first + self.visible) / total))
+        else:
+            self.scrollbar.set(0, 1)
+    
+    def _on_resize(self, event):
+        rows = max(1, math.ceil(event.height / self._apply_widget_scaling(self.row_height)))
+        if rows != self.visible:
+            self._ensure_pool(rows)
+            self.first = min(self.first, self._max_first())
+            self._render()
+    
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(value) * len(self.source)))
+        elif action == "scroll":
+            step = self.visible if unit == "pages" else 1
+            self.scroll_to(self.first + int(value) * step)
+    
+    def _on_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.scroll_to(self.first - 3)
+        else:
+            self.scroll_to(self.first + 3)
+        return "break"
+    
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self._on_wheel, add="+")
+        widget.bind("<Button-4>", self._on_wheel, add="+")
+        widget.bind("<Button-5>", self._on_wheel, add="+")
+        # CTk widgets forward bind() to their own canvas and label, so only
+        # nested CTk widgets need to be visited
+        for child in widget.winfo_children():
+            if isinstance(child, ctk.CTkBaseClass):
+                self._bind_wheel(child)
+
+# Create assets directory if it doesn't exist
+os.makedirs("assets", exist_ok=True)
+
+# Main Application
+class RailwayReservationSystem:
+    def __init__(self):
+        window_started = time.perf_counter()
+        self.app = ctk.CTk()
+        self.app.title("Railways | Modern Railway Reservation System")
+        self.app.geometry("1200x700")
+        self.app.minsize(900, 600)
+        self.app.resizable(True, True)
+        
+        # Try to set icon if file exists
+        try:
+            if platform.system() == "Windows":
+                self.app.iconbitmap("assets/train_icon.ico")
+            else:
+                logo_img = Image.open("assets/train_icon.png")
+                logo_photo = ImageTk.PhotoImage(logo_img)
+                self.app.wm_iconphoto(True, logo_photo)
+        except:
+            pass
+        
+        # Set appearance mode and color theme
+        self.current_theme = "light"
+        ctk.set_appearance_mode("light")
+        ctk.set_default_color_theme("blue")
+        STARTUP_PROFILE.record("create window", window_started)
+        
+        # Current user data
+        self.current_user = None
+        
+        # Serializes bookings against the seat inventory
+        self.booking_engine = BookingEngine(waitlist_limit=int(os.getenv("WAITLIST_LIMIT", "100")))
+        
+        # Cached admin dashboard KPIs
+        self.dashboard_stats = DashboardStats(ttl=int(os.getenv("DASHBOARD_STATS_TTL", "30")))
+        
+        # Cached trains and station names
+        self.reference_data = ReferenceData(
+            check_interval=int(os.getenv("REFERENCE_CHECK_INTERVAL", "5")),
+            max_age=int(os.getenv("REFERENCE_MAX_AGE", "600")),
+            min_connection=int(os.getenv("MIN_CONNECTION_MINUTES", "30"))
+        )
+        
+        # Runs database work off the Tk thread
+        self.query_executor = QueryExecutor(self.app, workers=int(os.getenv("QUERY_WORKERS", "4")))
+        
+        # Show splashscreen; the database is initialized behind it
+        with STARTUP_PROFILE.phase("splash screen"):
+            self.show_splash_screen()
+    
+    def show_loading_placeholder(self, container, text="Loading..."):
+        for widget in container.winfo_children():
+            widget.destroy()
+        
+        loading_frame = ctk.CTkFrame(container, fg_color="transparent")
+        loading_frame.pack(fill="x", pady=20)
+        
+        loading_label = ctk.CTkLabel(
+            loading_frame,
+            text=text,
+            text_color=("gray50", "gray70")
+        )
+        loading_label.pack()
+        
+        progress_bar = ctk.CTkProgressBar(loading_frame, mode="indeterminate", width=200)
+        progress_bar.pack(pady=10)
+        progress_bar.start()
+        return loading_frame
+    
+    def load_in_background(self, container, key, work, render, error_text, loading_text="Loading..."):
+        # Show a placeholder in container while work() runs on the query
+        # executor, then replace it with render(result) or an error label.
+        # A later call with the same key supersedes this one.
+        self.show_loading_placeholder(container, loading_text)
+        
+        def on_done(result):
+            if not container.winfo_exists():
+                return
+            for widget in container.winfo_children():
+                widget.destroy()
+            render(result)
+        
+        def on_error(e):
+            print(f"{error_text}: {e}")
+            if not container.winfo_exists():
+                return
+            for widget in container.winfo_children():
+                widget.destroy()
+            error_label = ctk.CTkLabel(
+                container, 
+                text=f"{error_text}: {str(e)}",
+                text_color=("gray50", "gray70")
+            )
+            error_label.pack(pady=20)
+        
+        return self.query_executor.submit(work, on_done, on_error, key=key)
+    
+    def attach_station_autocomplete(self, entry):
+        # Shows station suggestions from the in-memory trie in a list under
+        # entry as the user types; clicking one fills it in. The trie is
+        # loaded on the query executor so keystrokes never wait on MySQL.
+        self.query_executor.submit(self.reference_data.stations, key="stations")
+        toplevel = entry.winfo_toplevel()
+        popup = None
+        buttons = []
+        
+        def hide(_event=None):
+            if popup is not None and popup.winfo_exists():
+                popup.place_forget()
+        
+        def choose(name):
+            entry.delete(0, "end")
+            entry.insert(0, name)
+            hide()
+            entry.icursor("end")
+        
+        def show(event=None):
+            nonlocal popup
+            if event is not None and event.keysym in ("Escape", "Tab", "Return"):
+                return
+            text = entry.get()
+            stations = self.reference_data.suggest(text) if text.strip() else []
+            if not stations or (len(stations) == 1 and stations[0]["name"] == text.strip()):
+                hide()
+                return
+            
+            if popup is None or not popup.winfo_exists():
+                popup = ctk.CTkFrame(toplevel, border_width=1)
+                buttons.clear()
+            while len(buttons) < len(stations):
+                buttons.append(ctk.CTkButton(
+                    popup,
+                    text="",
+                    anchor="w",
+                    fg_color="transparent",
+                    text_color=("gray10", "gray90"),
+                    hover_color=("gray80", "gray30"),
+                    height=28
+                ))
+            for button, station in zip(buttons, stations):
+                button.configure(
+                    text=f"{station['name']} ({station['code']})",
+                    command=lambda name=station["name"]: choose(name)
+                )
+                button.pack(fill="x", padx=2, pady=1)
+            for button in buttons[len(stations):]:
+                button.pack_forget()
+            
+            popup.place(
+                x=entry.winfo_rootx() - toplevel.winfo_rootx(),
+                y=entry.winfo_rooty() - toplevel.winfo_rooty() + entry.winfo_height(),
+                width=entry.winfo_width()
+            )
+            popup.lift()
+        
+        entry.bind("<KeyRelease>", show, add="+")
+        entry.bind("<Escape>", hide, add="+")
+        # Let a click on a suggestion land before the list goes away
+        entry.bind("<FocusOut>", lambda _event: entry.after(200, hide), add="+")
+    
+    def run_csv_export(self, title, file_path, stream, estimate=None, success_message="",
+                       empty_message="", error_message="Export failed", noun="rows"):
+        # Writes stream() to file_path on the query executor behind a
+        # progress dialog with a cancel button; estimate() gives the
+        # expected row count for the progress bar
+        dialog = ctk.CTkToplevel(self.app)
+        dialog.title(title)
+        dialog.geometry("420x200")
+        dialog.resizable(False, False)
+        dialog.grab_set()  # Make the dialog modal
+        
+        # Center the dialog
+        dialog.update_idletasks()
+        width = dialog.winfo_width()
+        height = dialog.winfo_height()
+        x = (dialog.winfo_screenwidth() // 2) - (width // 2)
+        y = (dialog.winfo_screenheight() // 2) - (height // 2)
+        dialog.geometry('{}x{}+{}+{}'.format(width, height, x, y))
+        
+        status_label = ctk.CTkLabel(
+            dialog,
+            text=f"Exporting to {os.path.basename(file_path)}...",
+            font=ctk.CTkFont(size=14),
+            wraplength=380
+        )
+        status_label.pack(pady=(20, 10), padx=20)
+        
+        progress_bar = ctk.CTkProgressBar(dialog, width=360)
+        progress_bar.set(0)
+        progress_bar.pack(pady=5)
+        
+        count_label = ctk.CTkLabel(dialog, text="Starting...", text_color=("gray50", "gray70"))
+        count_label.pack(pady=5)
+        
+        cancel_event = threading.Event()
+        progress = {"rows": 0, "estimate": 0}
+        
+        def cancel_export():
+            cancel_event.set()
+            cancel_button.configure(text="Cancelling...", state="disabled")
+        
+        cancel_button = ctk.CTkButton(
+            dialog,
+            text="Cancel",
+            command=cancel_export,
+            fg_color="#e53935",
+            hover_color="#c62828",
+            height=35
+        )
+        cancel_button.pack(pady=10)
+        dialog.protocol("WM_DELETE_WINDOW", cancel_export)
+        
+        def export():
+            if estimate:
+                progress["estimate"] = estimate()
+            rows = write_csv_export(
+                file_path, stream(),
+                lambda rows: progress.update(rows=rows),
+                cancel_event
+            )
+            if not rows:
+                os.remove(file_path)
+            return rows
+        
+        def update_progress():
+            if not dialog.winfo_exists():
+                return
+            rows = progress["rows"]
+            if progress["estimate"]:
+                progress_bar.set(min(rows / progress["estimate"], 0.99))
+                count_label.configure(text=f"{rows:,} of about {progress['estimate']:,} {noun}")
+            else:
+                count_label.configure(text=f"{rows:,} {noun}")
+            dialog.after(100, update_progress)
+        
+        def show_result(rows):
+            dialog.destroy()
+            if rows:
+                CTkMessagebox(title="Success", message=success_message, icon="check")
+            else:
+                CTkMessagebox(title="No Data", message=empty_message, icon="warning")
+        
+        def show_error(e):
+            dialog.destroy()
+            if isinstance(e, ExportCancelled):
+                CTkMessagebox(title="Export Cancelled", message="The export was cancelled", icon="info")
+            else:
+                CTkMessagebox(title="Export Error", message=f"{error_message}: {str(e)}", icon="cancel")
+        
+        self.query_executor.submit(export, show_result, show_error)
+        update_progress()
+    
+    def load_paged_results(self, container, key, pager, display, show_empty, error_text, noun):
+        # Loads pager's first page in the background and shows it with
+        # display(rows), which returns the grid, plus a bar with previous/
+        # next buttons, the position and a page size selector
+        def load_first_page():
+            return pager.first_page(), pager.approximate_count()
+        
+        def show_first_page(result):
+            rows, estimate = result
+            if not rows:
+                show_empty()
+                return
+            
+            grid = display(rows)
+            
+            pager_frame = ctk.CTkFrame(container, fg_color="transparent")
+            pager_frame.pack(fill="x", padx=5, pady=(0, 5))
+            
+            previous_button = ctk.CTkButton(pager_frame, text="< Previous", width=100, height=30)
+            previous_button.pack(side="left")
+            
+            next_button = ctk.CTkButton(pager_frame, text="Next >", width=100, height=30)
+            next_button.pack(side="left", padx=10)
+            
+            position_label = ctk.CTkLabel(pager_frame, text="", text_color=("gray50", "gray70"))
+            position_label.pack(side="left", padx=10)
+            
+            page_size_var = StringVar(value=str(pager.page_size))
+            page_size_menu = ctk.CTkOptionMenu(
+                pager_frame,
+                values=["25", "50", "100", "200"],
+                variable=page_size_var,
+                width=80
+            )
+            page_size_menu.pack(side="right")
+            
+            page_size_label = ctk.CTkLabel(pager_frame, text="Rows per page:")
+            page_size_label.pack(side="right", padx=10)
+            
+            def update_pager_bar():
+                first_row = (pager.page_number - 1) * pager.page_size + 1
+                last_row = first_row + len(pager.rows) - 1
+                position_label.configure(
+                    text=f"Page {pager.page_number} · rows {first_row}-{last_row} of about {max(estimate, last_row):,} {noun}"
+                )
+                previous_button.configure(state="normal" if pager.has_previous else "disabled")
+                next_button.configure(state="normal" if pager.has_next else "disabled")
+                page_size_menu.configure(state="normal")
+            
+            def show_page(rows):
+                grid.set_source(rows)
+                grid.scroll_to(0)
+                update_pager_bar()
+            
+            def show_page_error(e):
+                print(f"{error_text}: {e}")
+                update_pager_bar()
+            
+            def go_to(load_page):
+                # One page load at a time, so an older one cannot move the
+                # pager while a newer one runs
+                previous_button.configure(state="disabled")
+                next_button.configure(state="disabled")
+                page_size_menu.configure(state="disabled")
+                self.query_executor.submit(load_page, show_page, show_page_error, key=key)
+            
+            previous_button.configure(command=lambda: go_to(pager.previous_page))
+            next_button.configure(command=lambda: go_to(pager.next_page))
+            page_size_menu.configure(command=lambda value: go_to(lambda: pager.set_page_size(int(value))))
+            update_pager_bar()
+        
+        self.load_in_background(container, key, load_first_page, show_first_page, error_text, f"Loading {noun}...")
+    
+    def load_search_results(self, container, entity, search_term, display, show_no_results, error_text,
+                            where=None, where_params=()):
+        # Runs a SearchIndex search in the background and shows the first
+        # page with display(rows), which returns the grid. Later pages are
+        # fetched by keyset cursor through a "Show more results" button.
+        rows = []
+        
+        def show_page(result):
+            page, next_cursor = result
+            if not page:
+                show_no_results()
+                return
+            
+            rows.extend(page)
+            grid = display(rows)
+            if next_cursor is None:
+                return
+            
+            more_button = ctk.CTkButton(container, text="Show more results", height=35)
+            more_button.pack(pady=10)
+            state = {"cursor": next_cursor}
+            
+            def show_more(result):
+                page, next_cursor = result
+                rows.extend(page)
+                grid.set_source(rows)
+                if next_cursor is None:
+                    more_button.destroy()
+                else:
+                    state["cursor"] = next_cursor
+                    more_button.configure(text="Show more results", state="normal")
+            
+            def show_more_error(e):
+                print(f"{error_text}: {e}")
+                more_button.configure(text="Show more results", state="normal")
+            
+            def load_more():
+                more_button.configure(text="Loading...", state="disabled")
+                self.query_executor.submit(
+                    lambda: search_records(entity, search_term, state["cursor"], where=where, where_params=where_params),
+                    show_more, show_more_error, key=entity
+                )
+            
+            more_button.configure(command=load_more)
+        
+        self.load_in_background(
+            container, entity,
+            lambda: search_records(entity, search_term, where=where, where_params=where_params),
+            show_page, error_text, "Searching..."
+        )
+        
+    def show_splash_screen(self):
+        # Clear the window
+        for widget in self.app.winfo_children():
+            widget.destroy()
+        
+        splash_frame = ctk.CTkFrame(self.app, corner_radius=0)
+        splash_frame.pack(fill="both", expand=True)
+        
+        # Center frame
+        center_frame = ctk.CTkFrame(splash_frame, fg_color="transparent")
+        center_frame.place(relx=0.5, rely=0.5, anchor="center")
+        
+        # Logo
+        try:
+            logo_img = Image.open("assets/train_logo.png")
+            logo_img = logo_img.resize((200, 200), Image.Resampling.LANCZOS)
             logo_photo = ImageTk.PhotoImage(logo_img)
             
             logo_label = ctk.CTkLabel(center_frame, image=logo_photo, text="")
@@ -351,28 +4626,59 @@ class RailwayReservationSystem:
         status_label = ctk.CTkLabel(center_frame, text="Loading...")
         status_label.pack(pady=10)
         
-        # Schedule tasks
-        self.schedule_progress_tasks(progress, status_label)
+        # Connect and check the schema behind the splash screen
+        self.run_startup_tasks(progress, status_label)
     
-    def schedule_progress_tasks(self, progress_bar, status_label, step=0):
-        steps = [
-            ("Connecting to database...", 0.2),
-            ("Loading resources...", 0.4),
-            ("Initializing application...", 0.6),
-            ("Preparing user interface...", 0.8),
-            ("Ready!", 1.0)
-        ]
+    def run_startup_tasks(self, progress_bar, status_label):
+        # Connects and brings the schema up to date on a worker while the
+        # splash screen shows how far it got, then opens the login screen
+        state = {"value": 0.05, "text": "Connecting to database...", "done": False}
+        
+        def report(value, text):
+            state.update(value=value, text=text)
+        
+        def startup():
+            with STARTUP_PROFILE.phase("connect to database"):
+                get_db_pool().get_connection().close()
+            report(0.2, "Checking database schema...")
+            with STARTUP_PROFILE.phase("schema check / bootstrap"):
+                bootstrap_database(report)
+            with STARTUP_PROFILE.phase("lease PNR node"):
+                start_pnr_generator()
+            report(1.0, "Ready!")
         
-        if step < len(steps):
-            status, value = steps[step]
-            status_label.configure(text=status)
-            progress_bar.set(value)
-            self.app.after(800, lambda: self.schedule_progress_tasks(progress_bar, status_label, step+1))
-        else:
-            # Once loading is complete, show the login screen
-            self.app.after(500, self.show_login_screen)
+        def update_progress():
+            if state["done"] or not status_label.winfo_exists():
+                return
+            progress_bar.set(state["value"])
+            status_label.configure(text=state["text"])
+            self.app.after(50, update_progress)
+        
+        def started(_):
+            state["done"] = True
+            with STARTUP_PROFILE.phase("login screen"):
+                self.show_login_screen()
+            if STARTUP_PROFILE.enabled:
+                self.app.update_idletasks()
+                STARTUP_PROFILE.report()
+        
+        def failed(e):
+            state["done"] = True
+            message_box = CTkMessagebox(
+                title="Database Connection Error",
+                message=f"Failed to connect to database: {e}",
+                icon="cancel"
+            )
+            message_box.get()
+            self.app.destroy()
+        
+        self.query_executor.submit(startup, started, failed)
+        update_progress()
     
     def show_login_screen(self):
+        # Have a hashing process ready by the time the password is typed
+        get_password_hasher().warm_up()
+        
         # Clear the window
         for widget in self.app.winfo_children():
             widget.destroy()
@@ -842,41 +5148,40 @@ class RailwayReservationSystem:
             )
             return
         
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
-            
-            try:
-                # Get user by email
-                cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
-                user = cursor.fetchone()
-                
-                if user and bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
-                    self.current_user = user
-                    
-                    # Set theme based on user preference
-                    self.current_theme = user.get('theme', 'light')
-                    ctk.set_appearance_mode(self.current_theme)
-                    
-                    if user['is_admin']:
-                        self.show_admin_dashboard()
-                    else:
-                        self.show_user_dashboard()
-                else:
-                    CTkMessagebox(
-                        title="Login Error", 
-                        message="Invalid email or password",
-                        icon="cancel"
-                    )
-            except Exception as e:
+        def logged_in(user):
+            if not user:
                 CTkMessagebox(
                     title="Login Error", 
-                    message=f"An error occurred: {str(e)}",
+                    message="Invalid email or password",
                     icon="cancel"
                 )
-            finally:
-                cursor.close()
-                connection.close()
+                return
+            
+            self.current_user = user
+            
+            # Set theme based on user preference
+            self.current_theme = user.get('theme', 'light')
+            ctk.set_appearance_mode(self.current_theme)
+            
+            if user['is_admin']:
+                self.show_admin_dashboard()
+            else:
+                self.show_user_dashboard()
+        
+        def login_failed(e):
+            CTkMessagebox(
+                title="Login Error", 
+                message=f"An error occurred: {str(e)}",
+                icon="cancel"
+            )
+        
+        # bcrypt is slow on purpose, so check the password off the Tk thread
+        self.query_executor.submit(
+            lambda: authenticate_user(email, password),
+            logged_in,
+            login_failed,
+            key="auth"
+        )
     
     def register(self, name, email, password, confirm_password, phone=None, terms_accepted=0):
         if not name or not email or not password or not confirm_password:
@@ -927,23 +5232,18 @@ class RailwayReservationSystem:
             )
             return
         
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor()
+        def create_account():
+            # Runs on a worker: bcrypt and the insert stay off the Tk thread
+            # Hash before taking a connection so none is held during bcrypt
+            hashed_password = get_password_hasher().hash(password)
             
+            connection = get_db_pool().get_connection()
+            cursor = connection.cursor()
             try:
                 # Check if email already exists
                 cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
                 if cursor.fetchone():
-                    CTkMessagebox(
-                        title="Registration Error", 
-                        message="Email already registered",
-                        icon="cancel"
-                    )
-                    return
-                
-                # Hash the password
-                hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+                    return False
                 
                 # Insert new user
                 if phone:
@@ -958,27 +5258,41 @@ class RailwayReservationSystem:
                     )
                 
                 connection.commit()
-                
-                # Show success message
-                CTkMessagebox(
-                    title="Registration Successful", 
-                    message="Your account has been created successfully. You can now login.",
-                    icon="check"
-                )
-                
-                # Safely navigate to login screen (FIX ADDED HERE)
-                self.app.after(1000, self.show_login_screen)
-                
-            except Exception as e:
+                return True
+            except Exception:
                 connection.rollback()
+                raise
+            finally:
+                cursor.close()
+                connection.close()
+        
+        def account_created(created):
+            if not created:
                 CTkMessagebox(
                     title="Registration Error", 
-                    message=f"An error occurred: {str(e)}",
+                    message="Email already registered",
                     icon="cancel"
                 )
-            finally:
-                cursor.close()
-                connection.close()
+                return
+            
+            # Show success message
+            CTkMessagebox(
+                title="Registration Successful", 
+                message="Your account has been created successfully. You can now login.",
+                icon="check"
+            )
+            
+            # Safely navigate to login screen (FIX ADDED HERE)
+            self.app.after(1000, self.show_login_screen)
+        
+        def registration_failed(e):
+            CTkMessagebox(
+                title="Registration Error", 
+                message=f"An error occurred: {str(e)}",
+                icon="cancel"
+            )
+        
+        self.query_executor.submit(create_account, account_created, registration_failed, key="auth")
     
     def logout(self):
         self.current_user = None
@@ -1238,94 +5552,25 @@ class RailwayReservationSystem:
         value_label.pack(anchor="w", pady=(5, 0))
     
     def get_total_trains(self):
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor()
-            try:
-                cursor.execute("SELECT COUNT(*) FROM trains")
-                return cursor.fetchone()[0]
-            except Exception as e:
-                print(f"Error getting total trains: {e}")
-                return 0
-            finally:
-                cursor.close()
-                connection.close()
-        return 0
-    
-    def get_total_schedules(self):
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor()
-            try:
-                cursor.execute("SELECT COUNT(*) FROM schedules")
-                return cursor.fetchone()[0]
-            except Exception as e:
-                print(f"Error getting total schedules: {e}")
-                return 0
-            finally:
-                cursor.close()
-                connection.close()
-        return 0
+        return self.dashboard_stats.get()["trains"]
     
-    def get_total_bookings(self):
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor()
-            try:
-                cursor.execute("SELECT COUNT(*) FROM bookings")
-                return cursor.fetchone()[0]
-            except Exception as e:
-                print(f"Error getting total bookings: {e}")
-                return 0
-            finally:
-                cursor.close()
-                connection.close()
-        return 0
+    def get_total_schedules(self):
+        return self.dashboard_stats.get()["schedules"]
+    
+    def get_total_bookings(self):
+        return self.dashboard_stats.get()["bookings"]
     
     def get_total_revenue(self):
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor()
-            try:
-                cursor.execute("SELECT COALESCE(SUM(total_fare), 0) FROM bookings WHERE status = 'confirmed'")
-                return cursor.fetchone()[0]
-            except Exception as e:
-                print(f"Error getting total revenue: {e}")
-                return 0
-            finally:
-                cursor.close()
-                connection.close()
-        return 0
+        return self.dashboard_stats.get()["revenue"]
     
     def create_booking_chart(self, parent):
-        # Get booking data for last 7 days
-        connection = get_db_connection()
-        dates = []
-        bookings = []
-        
-        if connection:
-            cursor = connection.cursor()
-            try:
-                # Generate last 7 days
-                for i in range(6, -1, -1):
-                    date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-                    dates.append((datetime.now() - timedelta(days=i)).strftime('%b %d'))
-                    
-                    cursor.execute(
-                        "SELECT COUNT(*) FROM bookings WHERE DATE(booking_date) = %s",
-                        (date,)
-                    )
-                    bookings.append(cursor.fetchone()[0])
-            except Exception as e:
-                print(f"Error getting booking data: {e}")
-                # Add dummy data if there's an error
-                dates = [(datetime.now() - timedelta(days=i)).strftime('%b %d') for i in range(6, -1, -1)]
-                bookings = [random.randint(5, 20) for _ in range(7)]
-            finally:
-                cursor.close()
-                connection.close()
+        # Booking data for the last 7 days, from the dashboard cache
+        chart = self.dashboard_stats.get()["chart"]
+        if chart is not None:
+            dates = [day.strftime('%b %d') for day, _ in chart]
+            bookings = [count for _, count in chart]
         else:
-            # Add dummy data if no connection
+            # Add dummy data if the statistics could not be loaded
             dates = [(datetime.now() - timedelta(days=i)).strftime('%b %d') for i in range(6, -1, -1)]
             bookings = [random.randint(5, 20) for _ in range(7)]
         
@@ -1368,7 +5613,7 @@ class RailwayReservationSystem:
         plt.tight_layout()
         
         # Create canvas
-        canvas = FigureCanvasTkAgg(fig, parent)
+        canvas = backend_tkagg.FigureCanvasTkAgg(fig, parent)
         canvas_widget = canvas.get_tk_widget()
         
         return canvas_widget
@@ -1382,18 +5627,16 @@ class RailwayReservationSystem:
         if connection:
             cursor = connection.cursor()
             try:
-                # Query for each class
+                # Revenue for each class from the per-passenger fare ledger
                 cursor.execute("""
                     SELECT 
-                        SUM(CASE WHEN p.seat_class = 'sleeper' THEN b.total_fare ELSE 0 END) AS sleeper_revenue,
-                        SUM(CASE WHEN p.seat_class = 'ac' THEN b.total_fare ELSE 0 END) AS ac_revenue,
-                        SUM(CASE WHEN p.seat_class = 'general' THEN b.total_fare ELSE 0 END) AS general_revenue
+                        SUM(CASE WHEN f.seat_class = 'sleeper' THEN f.fare ELSE 0 END) AS sleeper_revenue,
+                        SUM(CASE WHEN f.seat_class = 'ac' THEN f.fare ELSE 0 END) AS ac_revenue,
+                        SUM(CASE WHEN f.seat_class = 'general' THEN f.fare ELSE 0 END) AS general_revenue
                     FROM 
-                        passengers p
-                    JOIN 
-                        bookings b ON p.booking_id = b.id
+                        fare_ledger f
                     WHERE 
-                        b.status = 'confirmed'
+                        f.status = 'confirmed'
                 """)
                 result = cursor.fetchone()
                 
@@ -1470,7 +5713,7 @@ class RailwayReservationSystem:
         plt.tight_layout()
         
         # Create canvas
-        canvas = FigureCanvasTkAgg(fig, parent)
+        canvas = backend_tkagg.FigureCanvasTkAgg(fig, parent)
         canvas_widget = canvas.get_tk_widget()
         
         return canvas_widget
@@ -1480,243 +5723,177 @@ class RailwayReservationSystem:
         bookings_scroll = ctk.CTkScrollableFrame(parent)
         bookings_scroll.pack(fill="both", expand=True, padx=15, pady=(0, 15))
         
-        # Get recent bookings
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
-            
-            try:
-                cursor.execute("""
-                    SELECT 
-                        b.id, b.pnr, u.name as user_name, b.booking_date, b.total_fare, b.status,
-                        t.train_name, s.source, s.destination, s.departure_date, s.departure_time
-                    FROM 
-                        bookings b
-                    JOIN 
-                        users u ON b.user_id = u.id
-                    JOIN 
-                        schedules s ON b.schedule_id = s.id
-                    JOIN 
-                        trains t ON s.train_id = t.id
-                    ORDER BY 
-                        b.booking_date DESC
-                    LIMIT 5
-                """)
-                bookings = cursor.fetchall()
-                
-                if not bookings:
-                    no_data_label = ctk.CTkLabel(
-                        bookings_scroll, 
-                        text="No recent bookings found",
-                        font=ctk.CTkFont(size=14),
-                        text_color=("gray50", "gray70")
-                    )
-                    no_data_label.pack(pady=20)
-                    return
-                
-                # Create bookings list
-                for booking in bookings:
-                    booking_frame = ctk.CTkFrame(bookings_scroll)
-                    booking_frame.pack(fill="x", pady=5)
-                    
-                    # PNR and status
-                    header_frame = ctk.CTkFrame(booking_frame, fg_color="transparent")
-                    header_frame.pack(fill="x", padx=10, pady=(10, 5))
-                    
-                    pnr_label = ctk.CTkLabel(
-                        header_frame,
-                        text=f"PNR: {booking['pnr']}",
-                        font=ctk.CTkFont(size=14, weight="bold")
-                    )
-                    pnr_label.pack(side="left")
-                    
-                    status_color = "#43a047" if booking['status'] == 'confirmed' else "#e53935"
-                    status_text = "Confirmed" if booking['status'] == 'confirmed' else "Cancelled"
-                    
-                    status_label = ctk.CTkLabel(
-                        header_frame,
-                        text=status_text,
-                        font=ctk.CTkFont(size=12),
-                        text_color=status_color
-                    )
-                    status_label.pack(side="right")
-                    
-                    # Train details
-                    train_frame = ctk.CTkFrame(booking_frame, fg_color="transparent")
-                    train_frame.pack(fill="x", padx=10, pady=(0, 5))
-                    
-                    train_label = ctk.CTkLabel(
-                        train_frame,
-                        text=f"{booking['train_name']}",
-                        font=ctk.CTkFont(size=13)
-                    )
-                    train_label.pack(side="left")
-                    
-                    route_label = ctk.CTkLabel(
-                        train_frame,
-                        text=f"{booking['source']} → {booking['destination']}",
-                        font=ctk.CTkFont(size=12),
-                        text_color=("gray50", "gray70")
-                    )
-                    route_label.pack(side="right")
-                    
-                    # Bottom details
-                    bottom_frame = ctk.CTkFrame(booking_frame, fg_color="transparent")
-                    bottom_frame.pack(fill="x", padx=10, pady=(0, 10))
-                    
-                    date_str = f"{booking['departure_date']} {booking['departure_time']}"
-                    date_label = ctk.CTkLabel(
-                        bottom_frame,
-                        text=f"Departure: {date_str}",
-                        font=ctk.CTkFont(size=12),
-                        text_color=("gray50", "gray70")
-                    )
-                    date_label.pack(side="left")
-                    
-                    fare_label = ctk.CTkLabel(
-                        bottom_frame,
-                        text=format_currency(booking['total_fare']),
-                        font=ctk.CTkFont(size=12, weight="bold")
-                    )
-                    fare_label.pack(side="right")
-            except Exception as e:
-                print(f"Error loading recent bookings: {e}")
-                no_data_label = ctk.CTkLabel(
-                    bookings_scroll, 
-                    text="Error loading recent bookings",
-                    font=ctk.CTkFont(size=14),
-                    text_color=("gray50", "gray70")
-                )
-                no_data_label.pack(pady=20)
-            finally:
-                cursor.close()
-                connection.close()
-        else:
+        # Recent bookings from the dashboard cache
+        bookings = self.dashboard_stats.get()["recent_bookings"]
+        if bookings is None:
             no_data_label = ctk.CTkLabel(
                 bookings_scroll, 
-                text="Could not connect to database",
+                text="Error loading recent bookings",
                 font=ctk.CTkFont(size=14),
                 text_color=("gray50", "gray70")
             )
             no_data_label.pack(pady=20)
-    
-    def show_upcoming_schedules(self, parent):
-        # Create scrollable frame
-        schedules_scroll = ctk.CTkScrollableFrame(parent)
-        schedules_scroll.pack(fill="both", expand=True, padx=15, pady=(0, 15))
+            return
         
-        # Get upcoming schedules
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
+        if not bookings:
+            no_data_label = ctk.CTkLabel(
+                bookings_scroll, 
+                text="No recent bookings found",
+                font=ctk.CTkFont(size=14),
+                text_color=("gray50", "gray70")
+            )
+            no_data_label.pack(pady=20)
+            return
+        
+        # Create bookings list
+        for booking in bookings:
+            booking_frame = ctk.CTkFrame(bookings_scroll)
+            booking_frame.pack(fill="x", pady=5)
             
-            try:
-                # Get schedules departing today or in the future
-                current_date = datetime.now().strftime('%Y-%m-%d')
-                cursor.execute("""
-                    SELECT 
-                        s.id, t.train_number, t.train_name, s.source, s.destination, 
-                        s.departure_date, s.departure_time, s.status, s.delay_minutes
-                    FROM 
-                        schedules s
-                    JOIN 
-                        trains t ON s.train_id = t.id
-                    WHERE 
-                        (s.departure_date > %s) OR 
-                        (s.departure_date = %s AND s.departure_time >= %s)
-                    ORDER BY 
-                        s.departure_date, s.departure_time
-                    LIMIT 5
-                """, (current_date, current_date, datetime.now().strftime('%H:%M')))
-                schedules = cursor.fetchall()
-                
-                if not schedules:
-                    no_data_label = ctk.CTkLabel(
-                        schedules_scroll, 
-                        text="No upcoming schedules found",
-                        font=ctk.CTkFont(size=14),
-                        text_color=("gray50", "gray70")
-                    )
-                    no_data_label.pack(pady=20)
-                    return
-                
-                # Create schedules list
-                for schedule in schedules:
-                    schedule_frame = ctk.CTkFrame(schedules_scroll)
-                    schedule_frame.pack(fill="x", pady=5)
-                    
-                    # Train details
-                    header_frame = ctk.CTkFrame(schedule_frame, fg_color="transparent")
-                    header_frame.pack(fill="x", padx=10, pady=(10, 5))
-                    
-                    train_label = ctk.CTkLabel(
-                        header_frame,
-                        text=f"{schedule['train_number']} - {schedule['train_name']}",
-                        font=ctk.CTkFont(size=14, weight="bold")
-                    )
-                    train_label.pack(side="left")
-                    
-                    # Status indicator
-                    status_color = "#43a047"  # Default green for on-time
-                    status_text = "On Time"
-                    
-                    if schedule['status'] == 'delayed':
-                        status_color = "#ffb300"  # Orange for delayed
-                        status_text = f"Delayed {schedule['delay_minutes']} min"
-                    elif schedule['status'] == 'cancelled':
-                        status_color = "#e53935"  # Red for cancelled
-                        status_text = "Cancelled"
-                    
-                    status_label = ctk.CTkLabel(
-                        header_frame,
-                        text=status_text,
-                        font=ctk.CTkFont(size=12),
-                        text_color=status_color
-                    )
-                    status_label.pack(side="right")
-                    
-                    # Route
-                    route_frame = ctk.CTkFrame(schedule_frame, fg_color="transparent")
-                    route_frame.pack(fill="x", padx=10, pady=(0, 5))
-                    
-                    route_label = ctk.CTkLabel(
-                        route_frame,
-                        text=f"{schedule['source']} → {schedule['destination']}",
-                        font=ctk.CTkFont(size=13)
-                    )
-                    route_label.pack(side="left")
-                    
-                    # Departure details
-                    bottom_frame = ctk.CTkFrame(schedule_frame, fg_color="transparent")
-                    bottom_frame.pack(fill="x", padx=10, pady=(0, 10))
-                    
-                    date_label = ctk.CTkLabel(
-                        bottom_frame,
-                        text=f"Departure: {schedule['departure_date']} {schedule['departure_time']}",
-                        font=ctk.CTkFont(size=12),
-                        text_color=("gray50", "gray70")
-                    )
-                    date_label.pack(side="left")
-            except Exception as e:
-                print(f"Error loading upcoming schedules: {e}")
-                no_data_label = ctk.CTkLabel(
-                    schedules_scroll, 
-                    text="Error loading upcoming schedules",
-                    font=ctk.CTkFont(size=14),
-                    text_color=("gray50", "gray70")
-                )
-                no_data_label.pack(pady=20)
-            finally:
-                cursor.close()
-                connection.close()
-        else:
+            # PNR and status
+            header_frame = ctk.CTkFrame(booking_frame, fg_color="transparent")
+            header_frame.pack(fill="x", padx=10, pady=(10, 5))
+            
+            pnr_label = ctk.CTkLabel(
+                header_frame,
+                text=f"PNR: {booking['pnr']}",
+                font=ctk.CTkFont(size=14, weight="bold")
+            )
+            pnr_label.pack(side="left")
+            
+            status_text, status_color = booking_status_style(booking['status'])
+            
+            status_label = ctk.CTkLabel(
+                header_frame,
+                text=status_text,
+                font=ctk.CTkFont(size=12),
+                text_color=status_color
+            )
+            status_label.pack(side="right")
+            
+            # Train details
+            train_frame = ctk.CTkFrame(booking_frame, fg_color="transparent")
+            train_frame.pack(fill="x", padx=10, pady=(0, 5))
+            
+            train_label = ctk.CTkLabel(
+                train_frame,
+                text=f"{booking['train_name']}",
+                font=ctk.CTkFont(size=13)
+            )
+            train_label.pack(side="left")
+            
+            route_label = ctk.CTkLabel(
+                train_frame,
+                text=f"{booking['source']} → {booking['destination']}",
+                font=ctk.CTkFont(size=12),
+                text_color=("gray50", "gray70")
+            )
+            route_label.pack(side="right")
+            
+            # Bottom details
+            bottom_frame = ctk.CTkFrame(booking_frame, fg_color="transparent")
+            bottom_frame.pack(fill="x", padx=10, pady=(0, 10))
+            
+            date_str = f"{booking['departure_date']} {booking['departure_time']}"
+            date_label = ctk.CTkLabel(
+                bottom_frame,
+                text=f"Departure: {date_str}",
+                font=ctk.CTkFont(size=12),
+                text_color=("gray50", "gray70")
+            )
+            date_label.pack(side="left")
+            
+            fare_label = ctk.CTkLabel(
+                bottom_frame,
+                text=format_currency(booking['total_fare']),
+                font=ctk.CTkFont(size=12, weight="bold")
+            )
+            fare_label.pack(side="right")
+    
+    def show_upcoming_schedules(self, parent):
+        # Create scrollable frame
+        schedules_scroll = ctk.CTkScrollableFrame(parent)
+        schedules_scroll.pack(fill="both", expand=True, padx=15, pady=(0, 15))
+        
+        # Upcoming schedules from the dashboard cache
+        schedules = self.dashboard_stats.get()["upcoming_schedules"]
+        if schedules is None:
             no_data_label = ctk.CTkLabel(
                 schedules_scroll, 
-                text="Could not connect to database",
+                text="Error loading upcoming schedules",
+                font=ctk.CTkFont(size=14),
+                text_color=("gray50", "gray70")
+            )
+            no_data_label.pack(pady=20)
+            return
+        
+        if not schedules:
+            no_data_label = ctk.CTkLabel(
+                schedules_scroll, 
+                text="No upcoming schedules found",
                 font=ctk.CTkFont(size=14),
                 text_color=("gray50", "gray70")
             )
             no_data_label.pack(pady=20)
+            return
+        
+        # Create schedules list
+        for schedule in schedules:
+            schedule_frame = ctk.CTkFrame(schedules_scroll)
+            schedule_frame.pack(fill="x", pady=5)
+            
+            # Train details
+            header_frame = ctk.CTkFrame(schedule_frame, fg_color="transparent")
+            header_frame.pack(fill="x", padx=10, pady=(10, 5))
+            
+            train_label = ctk.CTkLabel(
+                header_frame,
+                text=f"{schedule['train_number']} - {schedule['train_name']}",
+                font=ctk.CTkFont(size=14, weight="bold")
+            )
+            train_label.pack(side="left")
+            
+            # Status indicator
+            status_color = "#43a047"  # Default green for on-time
+            status_text = "On Time"
+            
+            if schedule['status'] == 'delayed':
+                status_color = "#ffb300"  # Orange for delayed
+                status_text = f"Delayed {schedule['delay_minutes']} min"
+            elif schedule['status'] == 'cancelled':
+                status_color = "#e53935"  # Red for cancelled
+                status_text = "Cancelled"
+            
+            status_label = ctk.CTkLabel(
+                header_frame,
+                text=status_text,
+                font=ctk.CTkFont(size=12),
+                text_color=status_color
+            )
+            status_label.pack(side="right")
+            
+            # Route
+            route_frame = ctk.CTkFrame(schedule_frame, fg_color="transparent")
+            route_frame.pack(fill="x", padx=10, pady=(0, 5))
+            
+            route_label = ctk.CTkLabel(
+                route_frame,
+                text=f"{schedule['source']} → {schedule['destination']}",
+                font=ctk.CTkFont(size=13)
+            )
+            route_label.pack(side="left")
+            
+            # Departure details
+            bottom_frame = ctk.CTkFrame(schedule_frame, fg_color="transparent")
+            bottom_frame.pack(fill="x", padx=10, pady=(0, 10))
+            
+            date_label = ctk.CTkLabel(
+                bottom_frame,
+                text=f"Departure: {schedule['departure_date']} {schedule['departure_time']}",
+                font=ctk.CTkFont(size=12),
+                text_color=("gray50", "gray70")
+            )
+            date_label.pack(side="left")
     
     def change_appearance_mode(self, appearance_mode):
         # Convert first letter to lowercase for customtkinter
@@ -2054,8 +6231,11 @@ class RailwayReservationSystem:
                     "INSERT INTO trains (train_number, train_name, total_seats_sleeper, total_seats_ac, total_seats_general) VALUES (%s, %s, %s, %s, %s)",
                     (train_number, train_name, seats_sleeper, seats_ac, seats_general)
                 )
+                ReferenceData.bump(cursor)
                 
                 connection.commit()
+                self.dashboard_stats.invalidate()
+                self.reference_data.invalidate()
                 CTkMessagebox(
                     title="Success", 
                     message="Train added successfully",
@@ -2095,145 +6275,28 @@ class RailwayReservationSystem:
         content_frame = ctk.CTkFrame(container, fg_color="transparent")
         content_frame.pack(fill="both", expand=True)
         
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
-            
-            try:
-                # Search by train number or name
-                search_pattern = f"%{search_term}%"
-                cursor.execute(
-                    "SELECT * FROM trains WHERE train_number LIKE %s OR train_name LIKE %s ORDER BY train_name",
-                    (search_pattern, search_pattern)
-                )
-                
-                trains = cursor.fetchall()
-                
-                if not trains:
-                    no_results_label = ctk.CTkLabel(
-                        content_frame, 
-                        text=f"No trains found matching '{search_term}'",
-                        text_color=("gray50", "gray70")
-                    )
-                    no_results_label.pack(pady=20)
-                    
-                    # Show reset search button
-                    reset_button = ctk.CTkButton(
-                        content_frame, 
-                        text="Show All Trains", 
-                        command=lambda: self.load_trains(container),
-                        height=35
-                    )
-                    reset_button.pack(pady=10)
-                    return
-                
-                # Create a table-like structure
-                table_frame = ctk.CTkFrame(content_frame)
-                table_frame.pack(fill="both", expand=True, padx=0, pady=0)
-                
-                # Header row (dark gray)
-                header_frame = ctk.CTkFrame(table_frame, fg_color=("gray80", "gray25"), height=40)
-                header_frame.pack(fill="x", pady=0)
-                header_frame.pack_propagate(False)  # Maintain fixed height
-                
-                # Configure header columns
-                header_frame.columnconfigure(0, weight=1, minsize=100)  # Train Number
-                header_frame.columnconfigure(1, weight=2, minsize=150)  # Train Name
-                header_frame.columnconfigure(2, weight=1, minsize=80)   # Sleeper
-                header_frame.columnconfigure(3, weight=1, minsize=80)   # AC
-                header_frame.columnconfigure(4, weight=1, minsize=80)   # General
-                header_frame.columnconfigure(5, weight=1, minsize=150)  # Actions
-                
-                # Create header labels
-                ctk.CTkLabel(header_frame, text="Train Number", font=ctk.CTkFont(weight="bold")).grid(row=0, column=0, padx=10, pady=10, sticky="w")
-                ctk.CTkLabel(header_frame, text="Train Name", font=ctk.CTkFont(weight="bold")).grid(row=0, column=1, padx=10, pady=10, sticky="w")
-                ctk.CTkLabel(header_frame, text="Sleeper", font=ctk.CTkFont(weight="bold")).grid(row=0, column=2, padx=10, pady=10, sticky="w")
-                ctk.CTkLabel(header_frame, text="AC", font=ctk.CTkFont(weight="bold")).grid(row=0, column=3, padx=10, pady=10, sticky="w")
-                ctk.CTkLabel(header_frame, text="General", font=ctk.CTkFont(weight="bold")).grid(row=0, column=4, padx=10, pady=10, sticky="w")
-                ctk.CTkLabel(header_frame, text="Actions", font=ctk.CTkFont(weight="bold")).grid(row=0, column=5, padx=10, pady=10, sticky="w")
-                
-                # Fix for customtkinter: Use a frame that doesn't expand vertically
-                scroll_container = ctk.CTkFrame(table_frame, fg_color="transparent")
-                scroll_container.pack(fill="x", anchor="n")
-                
-                # Calculate the height needed based on number of trains
-                # Each row is about 50 pixels high, add some padding
-                row_height = 50
-                max_visible_rows = 10  # Maximum number of rows to show before scrolling
-                total_rows = len(trains)
-                scroll_height = min(total_rows * row_height, max_visible_rows * row_height)
-                
-                # Data rows in scrollable frame with fixed height
-                rows_frame = ctk.CTkScrollableFrame(scroll_container, orientation="vertical", height=scroll_height)
-                rows_frame.pack(fill="x")
-                
-                # Use grid for the scrollable frame to make all rows have consistent width
-                rows_frame.grid_columnconfigure(0, weight=1)
-                
-                # Now create each data row with the same grid layout as the header
-                for i, train in enumerate(trains):
-                    # Alternate row colors for better readability
-                    bg_color = "transparent" if i % 2 == 0 else ("gray90", "gray20")
-                    
-                    row_frame = ctk.CTkFrame(rows_frame, fg_color=bg_color)
-                    row_frame.grid(row=i, column=0, sticky="ew", pady=1)
-                    
-                    # Match column configuration with header
-                    row_frame.columnconfigure(0, weight=1, minsize=100)
-                    row_frame.columnconfigure(1, weight=2, minsize=150)
-                    row_frame.columnconfigure(2, weight=1, minsize=80)
-                    row_frame.columnconfigure(3, weight=1, minsize=80)
-                    row_frame.columnconfigure(4, weight=1, minsize=80)
-                    row_frame.columnconfigure(5, weight=1, minsize=150)
-                    
-                    # Train data
-                    ctk.CTkLabel(row_frame, text=train['train_number']).grid(row=0, column=0, padx=10, pady=8, sticky="w")
-                    ctk.CTkLabel(row_frame, text=train['train_name']).grid(row=0, column=1, padx=10, pady=8, sticky="w")
-                    ctk.CTkLabel(row_frame, text=str(train['total_seats_sleeper'])).grid(row=0, column=2, padx=10, pady=8, sticky="w")
-                    ctk.CTkLabel(row_frame, text=str(train['total_seats_ac'])).grid(row=0, column=3, padx=10, pady=8, sticky="w")
-                    ctk.CTkLabel(row_frame, text=str(train['total_seats_general'])).grid(row=0, column=4, padx=10, pady=8, sticky="w")
-                    
-                    # Action buttons
-                    action_frame = ctk.CTkFrame(row_frame, fg_color="transparent")
-                    action_frame.grid(row=0, column=5, padx=5, pady=5, sticky="w")
-                    
-                    edit_button = ctk.CTkButton(
-                        action_frame, 
-                        text="Edit",
-                        width=60,
-                        height=30,
-                        command=lambda t=train: self.show_edit_train_dialog(t)
-                    )
-                    edit_button.pack(side="left", padx=(0, 5))
-                    
-                    delete_button = ctk.CTkButton(
-                        action_frame, 
-                        text="Delete",
-                        width=60,
-                        height=30,
-                        fg_color="#e53935",
-                        hover_color="#c62828",
-                        command=lambda t=train: self.delete_train(t['id'], container)
-                    )
-                    delete_button.pack(side="left")
-                
-                # Add a spacer at the bottom to push everything up
-                # This prevents the large gap at the bottom
-                spacer = ctk.CTkFrame(content_frame, fg_color="transparent", height=1)
-                spacer.pack(side="bottom", fill="x")
-                
-            except Exception as e:
-                print(f"Error searching trains: {e}")
-                error_label = ctk.CTkLabel(
-                    content_frame,
-                    text=f"Error searching trains: {str(e)}",
-                    text_color=("gray50", "gray70")
-                )
-                error_label.pack(pady=20)
-            finally:
-                cursor.close()
-                connection.close()
+        def show_no_results():
+            no_results_label = ctk.CTkLabel(
+                content_frame, 
+                text=f"No trains found matching '{search_term}'",
+                text_color=("gray50", "gray70")
+            )
+            no_results_label.pack(pady=20)
             
+            # Show reset search button
+            reset_button = ctk.CTkButton(
+                content_frame, 
+                text="Show All Trains", 
+                command=lambda: self.load_trains(container),
+                height=35
+            )
+            reset_button.pack(pady=10)
+        
+        self.load_search_results(
+            content_frame, "trains", search_term,
+            lambda trains: self.display_trains(content_frame, trains, container),
+            show_no_results, "Error searching trains"
+        )
     
     def load_trains(self, container):
         # Clear the container
@@ -2244,215 +6307,71 @@ class RailwayReservationSystem:
         content_frame = ctk.CTkFrame(container, fg_color="transparent")
         content_frame.pack(fill="both", expand=True)
         
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
-            
-            try:
-                cursor.execute("SELECT * FROM trains ORDER BY train_name")
-                trains = cursor.fetchall()
-                
-                if not trains:
-                    no_trains_label = ctk.CTkLabel(
-                        content_frame, 
-                        text="No trains found",
-                        text_color=("gray50", "gray70")
-                    )
-                    no_trains_label.pack(pady=20)
-                    return
-                
-                # Create a table-like structure
-                table_frame = ctk.CTkFrame(content_frame)
-                table_frame.pack(fill="both", expand=True, padx=0, pady=0)
-                
-                # Header row (dark gray)
-                header_frame = ctk.CTkFrame(table_frame, fg_color=("gray80", "gray25"), height=40)
-                header_frame.pack(fill="x", pady=0)
-                header_frame.pack_propagate(False)  # Maintain fixed height
-                
-                # Configure header columns
-                header_frame.columnconfigure(0, weight=1, minsize=100)  # Train Number
-                header_frame.columnconfigure(1, weight=2, minsize=150)  # Train Name
-                header_frame.columnconfigure(2, weight=1, minsize=80)   # Sleeper
-                header_frame.columnconfigure(3, weight=1, minsize=80)   # AC
-                header_frame.columnconfigure(4, weight=1, minsize=80)   # General
-                header_frame.columnconfigure(5, weight=1, minsize=150)  # Actions
-                
-                # Create header labels
-                ctk.CTkLabel(header_frame, text="Train Number", font=ctk.CTkFont(weight="bold")).grid(row=0, column=0, padx=10, pady=10, sticky="w")
-                ctk.CTkLabel(header_frame, text="Train Name", font=ctk.CTkFont(weight="bold")).grid(row=0, column=1, padx=10, pady=10, sticky="w")
-                ctk.CTkLabel(header_frame, text="Sleeper", font=ctk.CTkFont(weight="bold")).grid(row=0, column=2, padx=10, pady=10, sticky="w")
-                ctk.CTkLabel(header_frame, text="AC", font=ctk.CTkFont(weight="bold")).grid(row=0, column=3, padx=10, pady=10, sticky="w")
-                ctk.CTkLabel(header_frame, text="General", font=ctk.CTkFont(weight="bold")).grid(row=0, column=4, padx=10, pady=10, sticky="w")
-                ctk.CTkLabel(header_frame, text="Actions", font=ctk.CTkFont(weight="bold")).grid(row=0, column=5, padx=10, pady=10, sticky="w")
-                
-                # Fix for customtkinter: Use a frame that doesn't expand vertically
-                scroll_container = ctk.CTkFrame(table_frame, fg_color="transparent")
-                scroll_container.pack(fill="x", anchor="n")
-                
-                # Calculate the height needed based on number of trains
-                # Each row is about 50 pixels high, add some padding
-                row_height = 50
-                max_visible_rows = 10  # Maximum number of rows to show before scrolling
-                total_rows = len(trains)
-                scroll_height = min(total_rows * row_height, max_visible_rows * row_height)
-                
-                # Data rows in scrollable frame with fixed height
-                rows_frame = ctk.CTkScrollableFrame(scroll_container, orientation="vertical", height=scroll_height)
-                rows_frame.pack(fill="x")
-                
-                # Use grid for the scrollable frame to make all rows have consistent width
-                rows_frame.grid_columnconfigure(0, weight=1)
-                
-                # Now create each data row with the same grid layout as the header
-                for i, train in enumerate(trains):
-                    # Alternate row colors for better readability
-                    bg_color = "transparent" if i % 2 == 0 else ("gray90", "gray20")
-                    
-                    row_frame = ctk.CTkFrame(rows_frame, fg_color=bg_color)
-                    row_frame.grid(row=i, column=0, sticky="ew", pady=1)
-                    
-                    # Match column configuration with header
-                    row_frame.columnconfigure(0, weight=1, minsize=100)
-                    row_frame.columnconfigure(1, weight=2, minsize=150)
-                    row_frame.columnconfigure(2, weight=1, minsize=80)
-                    row_frame.columnconfigure(3, weight=1, minsize=80)
-                    row_frame.columnconfigure(4, weight=1, minsize=80)
-                    row_frame.columnconfigure(5, weight=1, minsize=150)
-                    
-                    # Train data
-                    ctk.CTkLabel(row_frame, text=train['train_number']).grid(row=0, column=0, padx=10, pady=8, sticky="w")
-                    ctk.CTkLabel(row_frame, text=train['train_name']).grid(row=0, column=1, padx=10, pady=8, sticky="w")
-                    ctk.CTkLabel(row_frame, text=str(train['total_seats_sleeper'])).grid(row=0, column=2, padx=10, pady=8, sticky="w")
-                    ctk.CTkLabel(row_frame, text=str(train['total_seats_ac'])).grid(row=0, column=3, padx=10, pady=8, sticky="w")
-                    ctk.CTkLabel(row_frame, text=str(train['total_seats_general'])).grid(row=0, column=4, padx=10, pady=8, sticky="w")
-                    
-                    # Action buttons
-                    action_frame = ctk.CTkFrame(row_frame, fg_color="transparent")
-                    action_frame.grid(row=0, column=5, padx=5, pady=5, sticky="w")
-                    
-                    edit_button = ctk.CTkButton(
-                        action_frame, 
-                        text="Edit",
-                        width=60,
-                        height=30,
-                        command=lambda t=train: self.show_edit_train_dialog(t)
-                    )
-                    edit_button.pack(side="left", padx=(0, 5))
-                    
-                    delete_button = ctk.CTkButton(
-                        action_frame, 
-                        text="Delete",
-                        width=60,
-                        height=30,
-                        fg_color="#e53935",
-                        hover_color="#c62828",
-                        command=lambda t=train: self.delete_train(t['id'], container)
-                    )
-                    delete_button.pack(side="left")
-                
-                # Add a spacer at the bottom to push everything up
-                # This prevents the large gap at the bottom
-                spacer = ctk.CTkFrame(content_frame, fg_color="transparent", height=1)
-                spacer.pack(side="bottom", fill="x")
-                
-            except Exception as e:
-                print(f"Error loading trains: {e}")
-                error_label = ctk.CTkLabel(
+        def show_trains(trains):
+            if not len(trains):
+                no_trains_label = ctk.CTkLabel(
                     content_frame, 
-                    text=f"Error loading trains: {str(e)}",
+                    text="No trains found",
                     text_color=("gray50", "gray70")
                 )
-                error_label.pack(pady=20)
-            finally:
-                cursor.close()
-                connection.close()
-    
-    def display_trains(self, container, trains):
-        # Headers
-        header_frame = ctk.CTkFrame(container, fg_color=("gray80", "gray25"))
-        header_frame.pack(fill="x", padx=5, pady=5)
+                no_trains_label.pack(pady=20)
+                return
+            
+            self.display_trains(content_frame, trains, container)
         
-        header_columns = [
-            ("Train Number", 120),
-            ("Train Name", 180),
+        self.load_in_background(
+            content_frame, "trains",
+            # Trains are reference data, served from the in-memory cache
+            lambda: ListRowSource(self.reference_data.trains()), show_trains,
+            "Error loading trains", "Loading trains..."
+        )
+    
+    def display_trains(self, container, trains, list_container=None):
+        # list_container is the frame that load_trains refreshes after a delete
+        list_container = list_container or container
+        columns = [
+            ("Train Number", 110),
+            ("Train Name", 200),
             ("Sleeper", 80),
             ("AC", 80),
             ("General", 80),
-            ("Actions", 120)
+            ("Actions", 140)
         ]
+        fields = ("train_number", "train_name", "total_seats_sleeper", "total_seats_ac", "total_seats_general")
         
-        for i, (text, width) in enumerate(header_columns):
-            header_label = ctk.CTkLabel(
-                header_frame, 
-                text=text, 
-                font=ctk.CTkFont(weight="bold"),
-                width=width
-            )
-            header_label.grid(row=0, column=i, padx=5, pady=5, sticky="w")
-        
-        # Train rows
-        for i, train in enumerate(trains):
-            row_frame = ctk.CTkFrame(container)
-            row_frame.pack(fill="x", padx=5, pady=2)
-            
-            ctk.CTkLabel(row_frame, text=train['train_number'], width=header_columns[0][1]).grid(row=0, column=0, padx=5, pady=8, sticky="w")
-            ctk.CTkLabel(row_frame, text=train['train_name'], width=header_columns[1][1]).grid(row=0, column=1, padx=5, pady=8, sticky="w")
-            ctk.CTkLabel(row_frame, text=str(train['total_seats_sleeper']), width=header_columns[2][1]).grid(row=0, column=2, padx=5, pady=8, sticky="w")
-            ctk.CTkLabel(row_frame, text=str(train['total_seats_ac']), width=header_columns[3][1]).grid(row=0, column=3, padx=5, pady=8, sticky="w")
-            ctk.CTkLabel(row_frame, text=str(train['total_seats_general']), width=header_columns[4][1]).grid(row=0, column=4, padx=5, pady=8, sticky="w")
+        def build_row(row_frame):
+            cells = {}
+            for i, field in enumerate(fields):
+                cells[field] = ctk.CTkLabel(row_frame, text="", width=columns[i][1], anchor="w")
+                cells[field].grid(row=0, column=i, padx=5, pady=8, sticky="w")
             
             # Action buttons
             action_frame = ctk.CTkFrame(row_frame, fg_color="transparent")
             action_frame.grid(row=0, column=5, padx=5, pady=5, sticky="w")
             
-            # Edit button with icon
-            try:
-                edit_icon = load_image("assets/edit_icon.png", (16, 16))
-                edit_button = ctk.CTkButton(
-                    action_frame, 
-                    text="",
-                    image=edit_icon,
-                    width=30,
-                    height=30,
-                    command=lambda t=train: self.show_edit_train_dialog(t)
-                )
-                edit_button.image = edit_icon
-            except:
-                edit_button = ctk.CTkButton(
-                    action_frame, 
-                    text="Edit",
-                    width=60,
-                    height=30,
-                    command=lambda t=train: self.show_edit_train_dialog(t)
-                )
-            edit_button.grid(row=0, column=0, padx=2)
+            cells["edit"] = ctk.CTkButton(action_frame, text="Edit", width=60, height=30)
+            cells["edit"].pack(side="left", padx=(0, 5))
             
-            # Delete button with icon
-            try:
-                delete_icon = load_image("assets/delete_icon.png", (16, 16))
-                delete_button = ctk.CTkButton(
-                    action_frame, 
-                    text="",
-                    image=delete_icon,
-                    width=30,
-                    height=30,
-                    fg_color="#e53935",
-                    hover_color="#c62828",
-                    command=lambda t=train: self.delete_train(t['id'], container)
-                )
-                delete_button.image = delete_icon
-            except:
-                delete_button = ctk.CTkButton(
-                    action_frame, 
-                    text="Delete",
-                    width=60,
-                    height=30,
-                    fg_color="#e53935",
-                    hover_color="#c62828",
-                    command=lambda t=train: self.delete_train(t['id'], container)
-                )
-            delete_button.grid(row=0, column=1, padx=2)
+            cells["delete"] = ctk.CTkButton(
+                action_frame, 
+                text="Delete",
+                width=60,
+                height=30,
+                fg_color="#e53935",
+                hover_color="#c62828"
+            )
+            cells["delete"].pack(side="left")
+            return cells
+        
+        def fill_row(cells, train, index):
+            for field in fields:
+                cells[field].configure(text=str(train[field]))
+            cells["edit"].configure(command=lambda t=train: self.show_edit_train_dialog(t))
+            cells["delete"].configure(command=lambda t=train: self.delete_train(t['id'], list_container))
+        
+        grid = VirtualGrid(container, columns, trains, build_row, fill_row)
+        grid.pack(fill="both", expand=True)
+        return grid
     
     def show_edit_train_dialog(self, train):
         # Create a dialog window
@@ -2596,13 +6515,17 @@ class RailwayReservationSystem:
                     )
                     return
                 
-                # Update train
+                # Update train; the seat inventory refuses to drop sold seats
                 cursor.execute(
                     "UPDATE trains SET train_number = %s, train_name = %s, total_seats_sleeper = %s, total_seats_ac = %s, total_seats_general = %s WHERE id = %s",
                     (train_number, train_name, seats_sleeper, seats_ac, seats_general, train_id)
                 )
+                SeatInventory.resize_for_train(cursor, train_id, seats_sleeper, seats_ac, seats_general)
+                ReferenceData.bump(cursor)
                 
                 connection.commit()
+                self.dashboard_stats.invalidate()
+                self.reference_data.invalidate()
                 dialog.destroy()
                 
                 CTkMessagebox(
@@ -2619,6 +6542,13 @@ class RailwayReservationSystem:
                                 for grandchild in child.winfo_children():
                                     if isinstance(grandchild, ctk.CTkScrollableFrame):
                                         self.load_trains(grandchild)
+            except CapacityConflictError as e:
+                connection.rollback()
+                CTkMessagebox(
+                    title="Seats Already Sold",
+                    message=f"Capacity not changed: {e}. Cancel or move those bookings first.",
+                    icon="warning"
+                )
             except Exception as e:
                 connection.rollback()
                 CTkMessagebox(
@@ -2696,7 +6626,10 @@ class RailwayReservationSystem:
             try:
                 # Delete train (cascading will handle related records)
                 cursor.execute("DELETE FROM trains WHERE id = %s", (train_id,))
+                ReferenceData.bump(cursor)
                 connection.commit()
+                self.dashboard_stats.invalidate()
+                self.reference_data.invalidate()
                 
                 dialog.destroy()
                 
@@ -2931,6 +6864,9 @@ class RailwayReservationSystem:
         destination_entry = ctk.CTkEntry(route_frame, height=35)
         destination_entry.grid(row=1, column=1, sticky="ew", padx=(10, 0))
         
+        self.attach_station_autocomplete(source_entry)
+        self.attach_station_autocomplete(destination_entry)
+        
         # Departure date and time - side by side
         departure_frame = ctk.CTkFrame(form_frame, fg_color="transparent")
         departure_frame.pack(fill="x", pady=10)
@@ -2946,7 +6882,7 @@ class RailwayReservationSystem:
         departure_date_frame = ctk.CTkFrame(departure_frame)
         departure_date_frame.grid(row=1, column=0, sticky="ew")
         
-        departure_date_entry = DateEntry(
+        departure_date_entry = tkcalendar.DateEntry(
             departure_date_frame, 
             width=15,
             background='darkblue',
@@ -2974,7 +6910,7 @@ class RailwayReservationSystem:
         arrival_date_frame = ctk.CTkFrame(arrival_frame)
         arrival_date_frame.grid(row=1, column=0, sticky="ew")
         
-        arrival_date_entry = DateEntry(
+        arrival_date_entry = tkcalendar.DateEntry(
             arrival_date_frame, 
             width=15,
             background='darkblue',
@@ -2987,6 +6923,13 @@ class RailwayReservationSystem:
         arrival_time_entry = ctk.CTkEntry(arrival_frame, height=35, placeholder_text="e.g., 18:45")
         arrival_time_entry.grid(row=1, column=1, sticky="ew", padx=(10, 0))
         
+        # Intermediate stops with the departure time from each
+        via_label = ctk.CTkLabel(form_frame, text="Intermediate Stops (optional)")
+        via_label.pack(anchor="w", pady=(10, 5))
+        
+        via_entry = ctk.CTkEntry(form_frame, height=35, placeholder_text="e.g., Kota 10:30, Ratlam 14:05")
+        via_entry.pack(fill="x")
+        
         # Fares section
         fares_label = ctk.CTkLabel(form_frame, text="Ticket Fares", font=ctk.CTkFont(size=16, weight="bold"))
         fares_label.pack(anchor="w", pady=(20, 10))
@@ -3034,7 +6977,8 @@ class RailwayReservationSystem:
                 arrival_time_entry.get(),
                 fare_sleeper_entry.get(),
                 fare_ac_entry.get(),
-                fare_general_entry.get()
+                fare_general_entry.get(),
+                via_entry.get()
             ),
             height=40
         )
@@ -3046,7 +6990,7 @@ class RailwayReservationSystem:
             text="Clear Form", 
             command=lambda: [entry.delete(0, 'end') for entry in [
                 source_entry, destination_entry, departure_time_entry,
-                arrival_time_entry, fare_sleeper_entry, fare_ac_entry, fare_general_entry
+                arrival_time_entry, via_entry, fare_sleeper_entry, fare_ac_entry, fare_general_entry
             ]],
             height=40,
             fg_color="gray",
@@ -3080,7 +7024,7 @@ class RailwayReservationSystem:
         filter_date_frame = ctk.CTkFrame(search_frame, fg_color="transparent")
         filter_date_frame.pack(side="left")
         
-        filter_date_entry = DateEntry(
+        filter_date_entry = tkcalendar.DateEntry(
             filter_date_frame, 
             width=10,
             background='darkblue',
@@ -3116,32 +7060,25 @@ class RailwayReservationSystem:
         self.load_schedules(schedules_scroll)
     
     def load_trains_into_combobox(self, combobox):
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
-            
-            try:
-                cursor.execute("SELECT id, train_number, train_name FROM trains ORDER BY train_name")
-                trains = cursor.fetchall()
-                
-                # Format: "Train Number - Train Name"
-                train_options = [f"{train['train_number']} - {train['train_name']}" for train in trains]
-                
-                # Store the train data for later use
-                self.train_data = {f"{train['train_number']} - {train['train_name']}": train['id'] for train in trains}
-                
-                combobox.configure(values=train_options)
-                if train_options:
-                    combobox.set(train_options[0])
-                else:
-                    combobox.set("")
-            except Exception as e:
-                print(f"Error loading trains: {e}")
-            finally:
-                cursor.close()
-                connection.close()
+        try:
+            trains = self.reference_data.trains()
+        except Exception as e:
+            print(f"Error loading trains: {e}")
+            return
+        
+        # Format: "Train Number - Train Name"
+        train_options = [f"{train['train_number']} - {train['train_name']}" for train in trains]
+        
+        # Store the train data for later use
+        self.train_data = {f"{train['train_number']} - {train['train_name']}": train['id'] for train in trains}
+        
+        combobox.configure(values=train_options)
+        if train_options:
+            combobox.set(train_options[0])
+        else:
+            combobox.set("")
     
-    def add_schedule(self, train_option, source, destination, departure_date, departure_time, arrival_date, arrival_time, fare_sleeper, fare_ac, fare_general):
+    def add_schedule(self, train_option, source, destination, departure_date, departure_time, arrival_date, arrival_time, fare_sleeper, fare_ac, fare_general, via=""):
         if not train_option or not source or not destination or not departure_time or not arrival_time or not fare_sleeper or not fare_ac or not fare_general:
             CTkMessagebox(
                 title="Error", 
@@ -3188,22 +7125,44 @@ class RailwayReservationSystem:
             departure_date_str = departure_date.strftime('%Y-%m-%d')
             arrival_date_str = arrival_date.strftime('%Y-%m-%d')
             
+            # Intermediate stops, e.g. "Kota 10:30, Ratlam 14:05"
+            departure_at = datetime.strptime(f"{departure_date_str} {departure_time}", '%Y-%m-%d %H:%M')
+            arrival_at = datetime.strptime(f"{arrival_date_str} {arrival_time}", '%Y-%m-%d %H:%M')
+            via_stops = ScheduleStops.parse_via(via, departure_at, arrival_at)
+            
             connection = get_db_connection()
             if connection:
                 cursor = connection.cursor()
                 
                 try:
+                    # Stations are matched by name, code or alias and added if new
+                    source_station_id, source = Stations.resolve(cursor, source)
+                    destination_station_id, destination = Stations.resolve(cursor, destination)
+                    
                     # Insert new schedule
                     cursor.execute(
                         """INSERT INTO schedules 
-                           (train_id, source, destination, departure_date, departure_time, 
+                           (train_id, source, destination, source_station_id, destination_station_id,
+                            departure_date, departure_time, 
                             arrival_date, arrival_time, fare_sleeper, fare_ac, fare_general) 
-                           VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
-                        (train_id, source, destination, departure_date_str, departure_time, 
+                           VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+                        (train_id, source, destination, source_station_id, destination_station_id,
+                         departure_date_str, departure_time, 
                          arrival_date_str, arrival_time, fare_sleeper, fare_ac, fare_general)
                     )
+                    schedule_id = cursor.lastrowid
+                    SeatInventory.create_for_schedule(cursor, schedule_id)
+                    
+                    # Each stop splits the route into segments sold separately
+                    via_station_ids = [(Stations.resolve(cursor, name)[0], at) for name, at in via_stops]
+                    ScheduleStops.replace(cursor, schedule_id, ScheduleStops.build(
+                        source_station_id, departure_at, destination_station_id, arrival_at, via_station_ids
+                    ))
+                    ReferenceData.bump(cursor)
                     
                     connection.commit()
+                    self.dashboard_stats.invalidate()
+                    self.reference_data.invalidate()
                     CTkMessagebox(
                         title="Success", 
                         message="Schedule added successfully",
@@ -3573,6 +7532,9 @@ class RailwayReservationSystem:
         destination_entry.insert(0, schedule['destination'])
         destination_entry.grid(row=1, column=1, sticky="ew", padx=(10, 0))
         
+        self.attach_station_autocomplete(source_entry)
+        self.attach_station_autocomplete(destination_entry)
+        
         # Departure date and time - side by side
         departure_frame = ctk.CTkFrame(scroll_frame, fg_color="transparent")
         departure_frame.pack(fill="x", pady=10)
@@ -3589,7 +7551,7 @@ class RailwayReservationSystem:
         departure_date_frame.grid(row=1, column=0, sticky="ew")
         
         departure_date = datetime.strptime(str(schedule['departure_date']), '%Y-%m-%d').date()
-        departure_date_entry = DateEntry(
+        departure_date_entry = tkcalendar.DateEntry(
             departure_date_frame, 
             width=15,
             background='darkblue',
@@ -3622,7 +7584,7 @@ class RailwayReservationSystem:
         arrival_date_frame.grid(row=1, column=0, sticky="ew")
         
         arrival_date = datetime.strptime(str(schedule['arrival_date']), '%Y-%m-%d').date()
-        arrival_date_entry = DateEntry(
+        arrival_date_entry = tkcalendar.DateEntry(
             arrival_date_frame, 
             width=15,
             background='darkblue',
@@ -3803,19 +7765,31 @@ class RailwayReservationSystem:
                 cursor = connection.cursor()
                 
                 try:
+                    source_station_id, source = Stations.resolve(cursor, source)
+                    destination_station_id, destination = Stations.resolve(cursor, destination)
+                    
                     # Update schedule
                     cursor.execute(
                         """UPDATE schedules 
-                           SET source = %s, destination = %s, departure_date = %s, departure_time = %s, 
+                           SET source = %s, destination = %s, source_station_id = %s, destination_station_id = %s,
+                               departure_date = %s, departure_time = %s, 
                                arrival_date = %s, arrival_time = %s, fare_sleeper = %s, fare_ac = %s, 
                                fare_general = %s, status = %s, delay_minutes = %s
                            WHERE id = %s""",
-                        (source, destination, departure_date_str, departure_time, 
+                        (source, destination, source_station_id, destination_station_id,
+                         departure_date_str, departure_time, 
                          arrival_date_str, arrival_time, fare_sleeper, fare_ac, fare_general,
                          status, delay_minutes, schedule_id)
                     )
+                    ScheduleStops.update_ends(
+                        cursor, schedule_id,
+                        source_station_id, f"{departure_date_str} {departure_time}",
+                        destination_station_id, f"{arrival_date_str} {arrival_time}"
+                    )
+                    ReferenceData.bump(cursor)
                     
                     connection.commit()
+                    self.reference_data.invalidate()
                     dialog.destroy()
                     
                     CTkMessagebox(
@@ -3918,7 +7892,10 @@ class RailwayReservationSystem:
             try:
                 # Delete schedule (cascading will handle related bookings)
                 cursor.execute("DELETE FROM schedules WHERE id = %s", (schedule_id,))
+                ReferenceData.bump(cursor)
                 connection.commit()
+                self.dashboard_stats.invalidate()
+                self.reference_data.invalidate()
                 
                 dialog.destroy()
                 
@@ -4131,7 +8108,7 @@ class RailwayReservationSystem:
             date_frame = ctk.CTkFrame(controls_frame, fg_color="transparent")
             date_frame.pack(side="left")
             
-            date_entry = DateEntry(
+            date_entry = tkcalendar.DateEntry(
                 date_frame, 
                 width=10,
                 background='darkblue',
@@ -4181,341 +8158,214 @@ class RailwayReservationSystem:
         self.load_bookings(bookings_scroll, mode)
     
     def load_bookings(self, container, mode="all"):
-        # Clear the container
-        for widget in container.winfo_children():
-            widget.destroy()
+        if mode == "today":
+            current_date = datetime.now().strftime('%Y-%m-%d')
+            where = "b.booking_date >= %s AND b.booking_date < %s + INTERVAL 1 DAY"
+            params = (current_date, current_date)
+        elif mode == "cancelled":
+            where = "b.status = 'cancelled'"
+            params = ()
+        else:
+            where = None
+            params = ()
+        
+        # Newest first, paged by (booking_date, id)
+        bookings = KeysetPager(
+            """
+                b.id, b.pnr, u.name as user_name, u.email as user_email, b.booking_date, 
+                b.total_fare, b.status, b.payment_method, t.train_number, t.train_name, 
+                s.source, s.destination, s.departure_date, s.departure_time
+            """,
+            """
+                FROM 
+                    bookings b
+                JOIN 
+                    users u ON b.user_id = u.id
+                JOIN 
+                    schedules s ON b.schedule_id = s.id
+                JOIN 
+                    trains t ON s.train_id = t.id
+            """,
+            [("b.booking_date", "booking_date"), ("b.id", "id")],
+            where=where,
+            params=params,
+            count_table="bookings"
+        )
+        
+        def show_no_bookings():
+            no_bookings_label = ctk.CTkLabel(
+                container, 
+                text=f"No bookings found",
+                text_color=("gray50", "gray70")
+            )
+            no_bookings_label.pack(pady=20)
         
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
-            
-            try:
-                query = """
-                    SELECT 
-                        b.id, b.pnr, u.name as user_name, u.email as user_email, b.booking_date, 
-                        b.total_fare, b.status, b.payment_method, t.train_number, t.train_name, 
-                        s.source, s.destination, s.departure_date, s.departure_time
-                    FROM 
-                        bookings b
-                    JOIN 
-                        users u ON b.user_id = u.id
-                    JOIN 
-                        schedules s ON b.schedule_id = s.id
-                    JOIN 
-                        trains t ON s.train_id = t.id
-                """
-                
-                if mode == "today":
-                    current_date = datetime.now().strftime('%Y-%m-%d')
-                    query += " WHERE DATE(b.booking_date) = %s"
-                    params = (current_date,)
-                elif mode == "cancelled":
-                    query += " WHERE b.status = 'cancelled'"
-                    params = ()
-                else:
-                    params = ()
-                
-                query += " ORDER BY b.booking_date DESC"
-                
-                if params:
-                    cursor.execute(query, params)
-                else:
-                    cursor.execute(query)
-                
-                bookings = cursor.fetchall()
-                
-                if not bookings:
-                    no_bookings_label = ctk.CTkLabel(
-                        container, 
-                        text=f"No bookings found",
-                        text_color=("gray50", "gray70")
-                    )
-                    no_bookings_label.pack(pady=20)
-                    return
-                
-                # Display the bookings
-                self.display_bookings(container, bookings)
-                
-            except Exception as e:
-                print(f"Error loading bookings: {e}")
-                error_label = ctk.CTkLabel(
-                    container, 
-                    text=f"Error loading bookings: {str(e)}",
-                    text_color=("gray50", "gray70")
-                )
-                error_label.pack(pady=20)
-            finally:
-                cursor.close()
-                connection.close()
+        self.load_paged_results(
+            container, "bookings", bookings,
+            lambda rows: self.display_bookings(container, rows),
+            show_no_bookings, "Error loading bookings", "bookings"
+        )
     
     def search_bookings(self, container, search_term, mode="all"):
-        # Clear the container
-        for widget in container.winfo_children():
-            widget.destroy()
-        
         if not search_term:
             self.load_bookings(container, mode)
             return
         
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
+        # Search by PNR or user name
+        if mode == "today":
+            current_date = datetime.now().strftime('%Y-%m-%d')
+            where = "x.booking_date >= %s AND x.booking_date < %s + INTERVAL 1 DAY"
+            where_params = (current_date, current_date)
+        elif mode == "cancelled":
+            where = "x.status = 'cancelled'"
+            where_params = ()
+        else:
+            where = None
+            where_params = ()
+        
+        def show_no_results():
+            no_bookings_label = ctk.CTkLabel(
+                container, 
+                text=f"No bookings found matching '{search_term}'",
+                text_color=("gray50", "gray70")
+            )
+            no_bookings_label.pack(pady=20)
             
-            try:
-                # Search by PNR or user name
-                search_pattern = f"%{search_term}%"
-                
-                query = """
-                    SELECT 
-                        b.id, b.pnr, u.name as user_name, u.email as user_email, b.booking_date, 
-                        b.total_fare, b.status, b.payment_method, t.train_number, t.train_name, 
-                        s.source, s.destination, s.departure_date, s.departure_time
-                    FROM 
-                        bookings b
-                    JOIN 
-                        users u ON b.user_id = u.id
-                    JOIN 
-                        schedules s ON b.schedule_id = s.id
-                    JOIN 
-                        trains t ON s.train_id = t.id
-                    WHERE 
-                        b.pnr LIKE %s OR u.name LIKE %s
-                """
-                
-                params = [search_pattern, search_pattern]
-                
-                if mode == "today":
-                    current_date = datetime.now().strftime('%Y-%m-%d')
-                    query += " AND DATE(b.booking_date) = %s"
-                    params.append(current_date)
-                elif mode == "cancelled":
-                    query += " AND b.status = 'cancelled'"
-                
-                query += " ORDER BY b.booking_date DESC"
-                
-                cursor.execute(query, params)
-                bookings = cursor.fetchall()
-                
-                if not bookings:
-                    no_bookings_label = ctk.CTkLabel(
-                        container, 
-                        text=f"No bookings found matching '{search_term}'",
-                        text_color=("gray50", "gray70")
-                    )
-                    no_bookings_label.pack(pady=20)
-                    
-                    # Show reset search button
-                    reset_button = ctk.CTkButton(
-                        container, 
-                        text="Show All Bookings", 
-                        command=lambda: self.load_bookings(container, mode),
-                        height=35
-                    )
-                    reset_button.pack(pady=10)
-                    return
-                
-                # Display the bookings
-                self.display_bookings(container, bookings)
-                
-            except Exception as e:
-                print(f"Error searching bookings: {e}")
-                error_label = ctk.CTkLabel(
-                    container, 
-                    text=f"Error searching bookings: {str(e)}",
-                    text_color=("gray50", "gray70")
-                )
-                error_label.pack(pady=20)
-            finally:
-                cursor.close()
-                connection.close()
+            # Show reset search button
+            reset_button = ctk.CTkButton(
+                container, 
+                text="Show All Bookings", 
+                command=lambda: self.load_bookings(container, mode),
+                height=35
+            )
+            reset_button.pack(pady=10)
+        
+        self.load_search_results(
+            container, "bookings", search_term,
+            lambda bookings: self.display_bookings(container, bookings),
+            show_no_results, "Error searching bookings",
+            where, where_params
+        )
     
     def filter_bookings_by_date(self, container, filter_date):
-        # Clear the container
-        for widget in container.winfo_children():
-            widget.destroy()
-        
         date_str = filter_date.strftime('%Y-%m-%d')
         
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
-            
-            try:
-                cursor.execute("""
-                    SELECT 
-                        b.id, b.pnr, u.name as user_name, u.email as user_email, b.booking_date, 
-                        b.total_fare, b.status, b.payment_method, t.train_number, t.train_name, 
-                        s.source, s.destination, s.departure_date, s.departure_time
-                    FROM 
-                        bookings b
-                    JOIN 
-                        users u ON b.user_id = u.id
-                    JOIN 
-                        schedules s ON b.schedule_id = s.id
-                    JOIN 
-                        trains t ON s.train_id = t.id
-                    WHERE 
-                        DATE(b.booking_date) = %s
-                    ORDER BY 
-                        b.booking_date DESC
-                """, (date_str,))
-                
-                bookings = cursor.fetchall()
-                
-                if not bookings:
-                    no_bookings_label = ctk.CTkLabel(
-                        container, 
-                        text=f"No bookings found for {date_str}",
-                        text_color=("gray50", "gray70")
-                    )
-                    no_bookings_label.pack(pady=20)
-                    
-                    # Show reset search button
-                    reset_button = ctk.CTkButton(
-                        container, 
-                        text="Show All Bookings", 
-                        command=lambda: self.load_bookings(container, "all"),
-                        height=35
-                    )
-                    reset_button.pack(pady=10)
-                    return
-                
-                # Display the bookings
-                self.display_bookings(container, bookings)
-                
-            except Exception as e:
-                print(f"Error filtering bookings: {e}")
-                error_label = ctk.CTkLabel(
+        query = """
+            SELECT 
+                b.id, b.pnr, u.name as user_name, u.email as user_email, b.booking_date, 
+                b.total_fare, b.status, b.payment_method, t.train_number, t.train_name, 
+                s.source, s.destination, s.departure_date, s.departure_time
+            FROM 
+                bookings b
+            JOIN 
+                users u ON b.user_id = u.id
+            JOIN 
+                schedules s ON b.schedule_id = s.id
+            JOIN 
+                trains t ON s.train_id = t.id
+            WHERE 
+                b.booking_date >= %s AND b.booking_date < %s + INTERVAL 1 DAY
+            ORDER BY 
+                b.booking_date DESC
+        """
+        
+        def show_bookings(bookings):
+            if not bookings:
+                no_bookings_label = ctk.CTkLabel(
                     container, 
-                    text=f"Error filtering bookings: {str(e)}",
+                    text=f"No bookings found for {date_str}",
                     text_color=("gray50", "gray70")
                 )
-                error_label.pack(pady=20)
-            finally:
-                cursor.close()
-                connection.close()
+                no_bookings_label.pack(pady=20)
+                
+                # Show reset search button
+                reset_button = ctk.CTkButton(
+                    container, 
+                    text="Show All Bookings", 
+                    command=lambda: self.load_bookings(container, "all"),
+                    height=35
+                )
+                reset_button.pack(pady=10)
+                return
+            
+            # Display the bookings
+            self.display_bookings(container, bookings)
+        
+        self.load_in_background(
+            container, "bookings", lambda: fetch_all(query, (date_str, date_str)), show_bookings,
+            "Error filtering bookings", "Loading bookings..."
+        )
     
     def display_bookings(self, container, bookings):
-        for i, booking in enumerate(bookings):
-            # Create a card for each booking
-            booking_card = ctk.CTkFrame(container)
-            booking_card.pack(fill="x", pady=5, padx=5)
-            
-            # Main info
-            info_frame = ctk.CTkFrame(booking_card, fg_color="transparent")
-            info_frame.pack(fill="x", padx=15, pady=(10, 5))
-            
-            # Left column: PNR, user info, date
-            left_frame = ctk.CTkFrame(info_frame, fg_color="transparent")
-            left_frame.pack(side="left", fill="y", anchor="w")
-            
-            # PNR with status badge
-            pnr_frame = ctk.CTkFrame(left_frame, fg_color="transparent")
-            pnr_frame.pack(anchor="w", fill="x")
-            
-            pnr_label = ctk.CTkLabel(
-                pnr_frame, 
-                text=f"PNR: {booking['pnr']}", 
-                font=ctk.CTkFont(size=14, weight="bold")
-            )
-            pnr_label.pack(side="left")
-            
-            status_color = "#43a047" if booking['status'] == "confirmed" else "#e53935"
-            status_text = "Confirmed" if booking['status'] == "confirmed" else "Cancelled"
+        columns = [
+            ("PNR / Booked On", 140),
+            ("Status", 90),
+            ("Booked By", 170),
+            ("Train", 160),
+            ("Journey", 200),
+            ("Fare / Payment", 110),
+            ("Actions", 190)
+        ]
+        
+        def build_row(row_frame):
+            cells = {}
+            for i, field in ((0, "pnr"), (2, "user"), (3, "train"), (4, "journey"), (5, "fare")):
+                cells[field] = ctk.CTkLabel(row_frame, text="", width=columns[i][1], anchor="w", justify="left")
+                cells[field].grid(row=0, column=i, padx=5, pady=4, sticky="w")
+            cells["pnr"].configure(font=ctk.CTkFont(weight="bold"))
             
-            status_badge = ctk.CTkLabel(
-                pnr_frame,
-                text=status_text,
+            cells["status"] = ctk.CTkLabel(
+                row_frame,
+                text="",
                 text_color="white",
-                fg_color=status_color,
                 corner_radius=5,
                 width=80,
                 height=20
             )
-            status_badge.pack(side="left", padx=10)
-            
-            # User info
-            user_label = ctk.CTkLabel(
-                left_frame, 
-                text=f"Booked by: {booking['user_name']} ({booking['user_email']})"
-            )
-            user_label.pack(anchor="w", pady=(5, 0))
-            
-            date_label = ctk.CTkLabel(
-                left_frame, 
-                text=f"Booking Date: {booking['booking_date']}"
-            )
-            date_label.pack(anchor="w", pady=(5, 0))
-            
-            # Payment method
-            payment_method_text = booking.get('payment_method', 'Not specified').replace('_', ' ').title()
-            payment_label = ctk.CTkLabel(
-                left_frame, 
-                text=f"Payment: {payment_method_text}"
-            )
-            payment_label.pack(anchor="w", pady=(5, 0))
-            
-            # Right column: Total fare
-            right_frame = ctk.CTkFrame(info_frame, fg_color="transparent")
-            right_frame.pack(side="right", fill="y", anchor="e")
-            
-            fare_label = ctk.CTkLabel(
-                right_frame, 
-                text=f"Total Fare:", 
-                font=ctk.CTkFont(size=12)
-            )
-            fare_label.pack(anchor="e")
-            
-            fare_value = ctk.CTkLabel(
-                right_frame, 
-                text=format_currency(booking['total_fare']), 
-                font=ctk.CTkFont(size=16, weight="bold")
-            )
-            fare_value.pack(anchor="e")
-            
-            # Train and journey details
-            train_frame = ctk.CTkFrame(booking_card, fg_color="transparent")
-            train_frame.pack(fill="x", padx=15, pady=(0, 10))
-            
-            train_label = ctk.CTkLabel(
-                train_frame,
-                text=f"Train: {booking['train_number']} - {booking['train_name']}",
-                font=ctk.CTkFont(size=13)
-            )
-            train_label.pack(anchor="w", pady=(5, 0))
-            
-            journey_label = ctk.CTkLabel(
-                train_frame,
-                text=f"Journey: {booking['source']} → {booking['destination']} | Departure: {booking['departure_date']} {booking['departure_time']}"
-            )
-            journey_label.pack(anchor="w", pady=(5, 0))
+            cells["status"].grid(row=0, column=1, padx=5, pady=4, sticky="w")
             
             # Actions
-            actions_frame = ctk.CTkFrame(booking_card, fg_color="transparent")
-            actions_frame.pack(fill="x", padx=15, pady=(0, 10))
+            actions_frame = ctk.CTkFrame(row_frame, fg_color="transparent")
+            actions_frame.grid(row=0, column=6, padx=5, pady=4, sticky="w")
             
-            # View details button
-            view_details_button = ctk.CTkButton(
+            cells["details"] = ctk.CTkButton(actions_frame, text="View Details", width=90, height=30)
+            cells["details"].pack(side="left", padx=(0, 5))
+            
+            # Only shown for confirmed bookings
+            cells["cancel"] = ctk.CTkButton(
                 actions_frame,
-                text="View Details",
-                command=lambda b=booking: self.show_booking_details(b),
-                width=120,
-                height=30
+                text="Cancel",
+                width=80,
+                height=30,
+                fg_color="#e53935",
+                hover_color="#c62828"
             )
-            view_details_button.pack(side="left", padx=(0, 10))
+            cells["cancel"].pack(side="left")
+            return cells
+        
+        def fill_row(cells, booking, index):
+            status_text, status_color = booking_status_style(booking['status'])
+            payment_method_text = (booking.get('payment_method') or 'Not specified').replace('_', ' ').title()
+            
+            cells["pnr"].configure(text=f"{booking['pnr']}\n{str(booking['booking_date'])[:16]}")
+            cells["status"].configure(text=status_text, fg_color=status_color)
+            cells["user"].configure(text=f"{booking['user_name']}\n{booking['user_email']}")
+            cells["train"].configure(text=f"{booking['train_number']}\n{booking['train_name']}")
+            cells["journey"].configure(
+                text=f"{booking['source']} → {booking['destination']}\n{booking['departure_date']} {booking['departure_time']}"
+            )
+            cells["fare"].configure(text=f"{format_currency(booking['total_fare'])}\n{payment_method_text}")
             
-            # Change status button (disabled if already cancelled)
-            if booking['status'] == 'confirmed':
-                cancel_button = ctk.CTkButton(
-                    actions_frame,
-                    text="Cancel Booking",
-                    command=lambda b=booking: self.cancel_booking(b, container),
-                    width=120,
-                    height=30,
-                    fg_color="#e53935",
-                    hover_color="#c62828"
-                )
-                cancel_button.pack(side="left", padx=(0, 10))
+            cells["details"].configure(command=lambda b=booking: self.show_booking_details(b))
+            if booking['status'] != 'cancelled':
+                cells["cancel"].configure(command=lambda b=booking: self.cancel_booking(b, container))
+                cells["cancel"].pack(side="left")
+            else:
+                cells["cancel"].pack_forget()
+        
+        grid = VirtualGrid(container, columns, bookings, build_row, fill_row, row_height=56)
+        grid.pack(fill="both", expand=True, padx=5, pady=5)
+        return grid
     
     def show_booking_details(self, booking):
         # Fetch detailed information including passengers
@@ -4561,8 +8411,7 @@ class RailwayReservationSystem:
                 )
                 pnr_label.pack(side="left")
                 
-                status_color = "#43a047" if booking['status'] == "confirmed" else "#e53935"
-                status_text = "Confirmed" if booking['status'] == "confirmed" else "Cancelled"
+                status_text, status_color = booking_status_style(booking['status'])
                 
                 status_badge = ctk.CTkLabel(
                     header_frame,
@@ -4718,134 +8567,99 @@ class RailwayReservationSystem:
         cancel_button.pack(side="left", padx=(0, 5), fill="x", expand=True)
         
         # Keep Button
-        keep_button = ctk.CTkButton(
-            buttons_frame,
-            text="Keep Booking",
-            command=confirm_dialog.destroy,
-            height=35
-        )
-        keep_button.pack(side="right", padx=(5, 0), fill="x", expand=True)
-    
-    def perform_cancel_booking(self, booking_id, container, dialog):
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor()
-            
-            try:
-                # Update booking status to cancelled
-                cursor.execute(
-                    "UPDATE bookings SET status = 'cancelled' WHERE id = %s",
-                    (booking_id,)
-                )
-                
-                connection.commit()
-                dialog.destroy()
-                
-                CTkMessagebox(
-                    title="Success",
-                    message="Booking has been cancelled successfully",
-                    icon="check"
-                )
-                
-                # Refresh the bookings list
-                self.load_bookings(container)
-                
-            except Exception as e:
-                connection.rollback()
-                dialog.destroy()
-                CTkMessagebox(
-                    title="Error",
-                    message=f"Failed to cancel booking: {str(e)}",
-                    icon="cancel"
-                )
+        keep_button = ctk.CTkButton(
+            buttons_frame,
+            text="Keep Booking",
+            command=confirm_dialog.destroy,
+            height=35
+        )
+        keep_button.pack(side="right", padx=(5, 0), fill="x", expand=True)
+    
+    def perform_cancel_booking(self, booking_id, container, dialog):
+        def cancel():
+            # Runs on a worker; returns the seats and revenue and confirms whoever was waiting for them
+            connection = get_db_pool().get_connection()
+            try:
+                return self.booking_engine.cancel_booking(connection, booking_id)
             finally:
-                cursor.close()
                 connection.close()
+        
+        def cancelled(promoted):
+            self.dashboard_stats.invalidate()
+            dialog.destroy()
+            
+            message = "Booking has been cancelled successfully"
+            if promoted:
+                message += f"\n{len(promoted)} waitlisted booking(s) confirmed"
+            CTkMessagebox(
+                title="Success",
+                message=message,
+                icon="check"
+            )
+            
+            # Refresh the bookings list
+            self.load_bookings(container)
+        
+        def cancel_failed(e):
+            dialog.destroy()
+            CTkMessagebox(
+                title="Error",
+                message=f"Failed to cancel booking: {str(e)}",
+                icon="cancel"
+            )
+        
+        self.query_executor.submit(cancel, cancelled, cancel_failed)
     
     def export_bookings_to_csv(self, mode="all"):
-        import csv
         from tkinter import filedialog
         
         # Ask user where to save the CSV file
         file_path = filedialog.asksaveasfilename(
             defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv")],
+            filetypes=[("CSV files", "*.csv"), ("Compressed CSV files", "*.csv.gz")],
             title="Save Bookings Report"
         )
         
         if not file_path:
             return  # User cancelled
         
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
-            
-            try:
-                query = """
-                    SELECT 
-                        b.pnr, u.name as user_name, u.email as user_email, b.booking_date, 
-                        b.total_fare, b.status, b.payment_method, t.train_number, t.train_name, 
-                        s.source, s.destination, s.departure_date, s.departure_time
-                    FROM 
-                        bookings b
-                    JOIN 
-                        users u ON b.user_id = u.id
-                    JOIN 
-                        schedules s ON b.schedule_id = s.id
-                    JOIN 
-                        trains t ON s.train_id = t.id
-                """
-                
-                if mode == "today":
-                    current_date = datetime.now().strftime('%Y-%m-%d')
-                    query += " WHERE DATE(b.booking_date) = %s"
-                    params = (current_date,)
-                elif mode == "cancelled":
-                    query += " WHERE b.status = 'cancelled'"
-                    params = ()
-                else:
-                    params = ()
-                
-                query += " ORDER BY b.booking_date DESC"
-                
-                if params:
-                    cursor.execute(query, params)
-                else:
-                    cursor.execute(query)
-                
-                bookings = cursor.fetchall()
-                
-                if bookings:
-                    # Write to CSV
-                    with open(file_path, mode='w', newline='') as csv_file:
-                        fieldnames = bookings[0].keys()
-                        writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-                        
-                        writer.writeheader()
-                        for booking in bookings:
-                            writer.writerow(booking)
-                    
-                    CTkMessagebox(
-                        title="Success",
-                        message=f"Bookings successfully exported to {file_path}",
-                        icon="check"
-                    )
-                else:
-                    CTkMessagebox(
-                        title="No Data",
-                        message="No bookings data to export",
-                        icon="warning"
-                    )
-                
-            except Exception as e:
-                CTkMessagebox(
-                    title="Export Error",
-                    message=f"Failed to export bookings: {str(e)}",
-                    icon="cancel"
-                )
-            finally:
-                cursor.close()
-                connection.close()
+        from_clause = """
+            FROM 
+                bookings b
+            JOIN 
+                users u ON b.user_id = u.id
+            JOIN 
+                schedules s ON b.schedule_id = s.id
+            JOIN 
+                trains t ON s.train_id = t.id
+        """
+        
+        if mode == "today":
+            current_date = datetime.now().strftime('%Y-%m-%d')
+            where = "b.booking_date >= %s AND b.booking_date < %s + INTERVAL 1 DAY"
+            params = (current_date, current_date)
+        elif mode == "cancelled":
+            where = "b.status = 'cancelled'"
+            params = ()
+        else:
+            where = None
+            params = ()
+        
+        query = """
+            SELECT 
+                b.pnr, u.name as user_name, u.email as user_email, b.booking_date, 
+                b.total_fare, b.status, b.payment_method, t.train_number, t.train_name, 
+                s.source, s.destination, s.departure_date, s.departure_time
+        """ + from_clause + (f" WHERE {where}" if where else "") + " ORDER BY b.booking_date DESC"
+        
+        self.run_csv_export(
+            "Exporting Bookings", file_path,
+            lambda: stream_query(query, params),
+            lambda: estimate_row_count(from_clause, where, params, "bookings"),
+            success_message=f"Bookings successfully exported to {file_path}",
+            empty_message="No bookings data to export",
+            error_message="Failed to export bookings"
+        )
     
     def show_admin_revenue_tab(self):
         # Clear the window
@@ -5010,7 +8824,7 @@ class RailwayReservationSystem:
         
         # Calculate date 30 days ago
         from_date = (datetime.now() - timedelta(days=30)).date()
-        from_date_entry = DateEntry(
+        from_date_entry = tkcalendar.DateEntry(
             from_frame, 
             width=12,
             background='darkblue',
@@ -5031,7 +8845,7 @@ class RailwayReservationSystem:
         to_frame.pack(side="left")
         
         to_date = datetime.now().date()
-        to_date_entry = DateEntry(
+        to_date_entry = tkcalendar.DateEntry(
             to_frame, 
             width=12,
             background='darkblue',
@@ -5103,76 +8917,56 @@ class RailwayReservationSystem:
         from_date_str = from_date.strftime('%Y-%m-%d')
         to_date_str = to_date.strftime('%Y-%m-%d')
         
-        connection = get_db_connection()
-        if connection:
+        def fetch_revenue():
+            connection = get_db_pool().get_connection()
             cursor = connection.cursor(dictionary=True)
-            
             try:
-                # Get total revenue and booking counts
+                # All revenue figures come from the revenue_daily rollup
                 cursor.execute("""
                     SELECT 
-                        SUM(CASE WHEN b.status = 'confirmed' THEN b.total_fare ELSE 0 END) as total_revenue,
-                        COUNT(CASE WHEN b.status = 'confirmed' THEN 1 ELSE NULL END) as confirmed_bookings,
-                        COUNT(CASE WHEN b.status = 'cancelled' THEN 1 ELSE NULL END) as cancelled_bookings,
-                        COUNT(*) as total_bookings
+                        SUM(r.revenue) as total_revenue,
+                        CAST(SUM(r.confirmed_bookings) AS SIGNED) as confirmed_bookings,
+                        CAST(SUM(r.cancelled_bookings) AS SIGNED) as cancelled_bookings,
+                        CAST(SUM(r.total_bookings) AS SIGNED) as total_bookings
                     FROM 
-                        bookings b
+                        revenue_daily r
                     WHERE 
-                        DATE(b.booking_date) BETWEEN %s AND %s
+                        r.booking_day BETWEEN %s AND %s
                 """, (from_date_str, to_date_str))
                 
                 summary_data = cursor.fetchone()
                 
-                # Get revenue by class
+                # Get revenue by class from the per-passenger fare ledger
                 cursor.execute("""
                     SELECT 
-                        p.seat_class,
-                        SUM(CASE WHEN b.status = 'confirmed' THEN b.total_fare ELSE 0 END) as revenue,
+                        f.seat_class,
+                        SUM(CASE WHEN f.status = 'confirmed' THEN f.fare ELSE 0 END) as revenue,
                         COUNT(*) as passengers
                     FROM 
-                        passengers p
-                    JOIN 
-                        bookings b ON p.booking_id = b.id
+                        fare_ledger f
                     WHERE 
-                        DATE(b.booking_date) BETWEEN %s AND %s
+                        f.booking_day BETWEEN %s AND %s
                     GROUP BY 
-                        p.seat_class
+                        f.seat_class
                 """, (from_date_str, to_date_str))
                 
                 class_revenue_data = cursor.fetchall()
                 
                 # Get daily revenue data for the chart
-                cursor.execute("""
-                    SELECT 
-                        DATE(b.booking_date) as date,
-                        SUM(CASE WHEN b.status = 'confirmed' THEN b.total_fare ELSE 0 END) as revenue,
-                        COUNT(*) as bookings
-                    FROM 
-                        bookings b
-                    WHERE 
-                        DATE(b.booking_date) BETWEEN %s AND %s
-                    GROUP BY 
-                        DATE(b.booking_date)
-                    ORDER BY 
-                        date
-                """, (from_date_str, to_date_str))
-                
-                daily_revenue_data = cursor.fetchall()
+                daily_revenue_data = aggregate_bookings(cursor, from_date, to_date, "day")
                 
                 # Get route-wise revenue data
                 cursor.execute("""
                     SELECT 
-                        s.source, s.destination,
-                        SUM(CASE WHEN b.status = 'confirmed' THEN b.total_fare ELSE 0 END) as revenue,
-                        COUNT(*) as bookings
+                        r.source, r.destination,
+                        SUM(r.revenue) as revenue,
+                        CAST(SUM(r.total_bookings) AS SIGNED) as bookings
                     FROM 
-                        bookings b
-                    JOIN 
-                        schedules s ON b.schedule_id = s.id
+                        revenue_daily r
                     WHERE 
-                        DATE(b.booking_date) BETWEEN %s AND %s
+                        r.booking_day BETWEEN %s AND %s
                     GROUP BY 
-                        s.source, s.destination
+                        r.source, r.destination
                     ORDER BY 
                         revenue DESC
                     LIMIT 10
@@ -5183,50 +8977,51 @@ class RailwayReservationSystem:
                 # Get revenue by payment method
                 cursor.execute("""
                     SELECT 
-                        IFNULL(b.payment_method, 'not specified') as payment_method,
-                        SUM(CASE WHEN b.status = 'confirmed' THEN b.total_fare ELSE 0 END) as revenue,
-                        COUNT(*) as bookings
+                        r.payment_method,
+                        SUM(r.revenue) as revenue,
+                        CAST(SUM(r.total_bookings) AS SIGNED) as bookings
                     FROM 
-                        bookings b
+                        revenue_daily r
                     WHERE 
-                        DATE(b.booking_date) BETWEEN %s AND %s
+                        r.booking_day BETWEEN %s AND %s
                     GROUP BY 
-                        b.payment_method
+                        r.payment_method
                 """, (from_date_str, to_date_str))
                 
                 payment_revenue_data = cursor.fetchall()
                 
-                # Create summary cards (non-scrollable)
-                self.create_revenue_summary_cards(summary_frame, summary_data)
-                
-                # Create charts and tables (scrollable)
-                
-                # Daily Revenue Chart
-                daily_chart_frame = ctk.CTkFrame(scrollable_content)
-                daily_chart_frame.pack(fill="x", pady=10)
-                self.create_daily_revenue_chart(daily_chart_frame, daily_revenue_data)
-                
-                # Class Revenue Chart
-                class_chart_frame = ctk.CTkFrame(scrollable_content)
-                class_chart_frame.pack(fill="x", pady=10)
-                self.create_class_revenue_chart(class_chart_frame, class_revenue_data)
-                
-                # Revenue breakdown table
-                table_frame = ctk.CTkFrame(scrollable_content)
-                table_frame.pack(fill="x", pady=10)
-                self.create_revenue_table(table_frame, route_revenue_data, payment_revenue_data)
-                
-            except Exception as e:
-                print(f"Error loading revenue data: {e}")
-                error_label = ctk.CTkLabel(
-                    summary_frame, 
-                    text=f"Error loading revenue data: {str(e)}",
-                    text_color=("gray50", "gray70")
-                )
-                error_label.pack(pady=20)
+                return summary_data, class_revenue_data, daily_revenue_data, route_revenue_data, payment_revenue_data
             finally:
                 cursor.close()
                 connection.close()
+        
+        def show_revenue(data):
+            summary_data, class_revenue_data, daily_revenue_data, route_revenue_data, payment_revenue_data = data
+            
+            # Create summary cards (non-scrollable)
+            self.create_revenue_summary_cards(summary_frame, summary_data)
+            
+            # Create charts and tables (scrollable)
+            
+            # Daily Revenue Chart
+            daily_chart_frame = ctk.CTkFrame(scrollable_content)
+            daily_chart_frame.pack(fill="x", pady=10)
+            self.create_daily_revenue_chart(daily_chart_frame, daily_revenue_data)
+            
+            # Class Revenue Chart
+            class_chart_frame = ctk.CTkFrame(scrollable_content)
+            class_chart_frame.pack(fill="x", pady=10)
+            self.create_class_revenue_chart(class_chart_frame, class_revenue_data)
+            
+            # Revenue breakdown table
+            table_frame = ctk.CTkFrame(scrollable_content)
+            table_frame.pack(fill="x", pady=10)
+            self.create_revenue_table(table_frame, route_revenue_data, payment_revenue_data)
+        
+        self.load_in_background(
+            summary_frame, "revenue", fetch_revenue, show_revenue,
+            "Error loading revenue data", "Loading revenue data..."
+        )
     
     def create_revenue_summary_cards(self, parent, data):
         # Create a frame to hold the cards
@@ -5307,7 +9102,7 @@ class RailwayReservationSystem:
         
         if data:
             for entry in data:
-                date_str = entry['date'].strftime('%d/%m/%Y') if isinstance(entry['date'], datetime) else entry['date']
+                date_str = entry['date'].strftime('%d/%m/%Y') if hasattr(entry['date'], 'strftime') else entry['date']
                 dates.append(date_str)
                 revenues.append(float(entry['revenue']) if entry['revenue'] else 0)
         else:
@@ -5371,7 +9166,7 @@ class RailwayReservationSystem:
         plt.tight_layout()
         
         # Create canvas
-        canvas = FigureCanvasTkAgg(fig, parent)
+        canvas = backend_tkagg.FigureCanvasTkAgg(fig, parent)
         canvas_widget = canvas.get_tk_widget()
         canvas_widget.pack(fill="both", expand=True, padx=10, pady=10)
     
@@ -5467,7 +9262,7 @@ class RailwayReservationSystem:
         plt.tight_layout()
         
         # Create canvas
-        canvas = FigureCanvasTkAgg(fig, parent)
+        canvas = backend_tkagg.FigureCanvasTkAgg(fig, parent)
         canvas_widget = canvas.get_tk_widget()
         canvas_widget.pack(fill="both", expand=True, padx=10, pady=10)
     
@@ -5600,85 +9395,49 @@ class RailwayReservationSystem:
             no_data_label.pack(pady=20)
     
     def export_revenue_report(self, from_date, to_date):
-        import csv
         from tkinter import filedialog
         
         # Ask user where to save the CSV file
         file_path = filedialog.asksaveasfilename(
             defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv")],
+            filetypes=[("CSV files", "*.csv"), ("Compressed CSV files", "*.csv.gz")],
             title="Save Revenue Report"
         )
         
         if not file_path:
             return  # User cancelled
         
-        # Format dates for database queries
-        from_date_str = from_date.strftime('%Y-%m-%d')
-        to_date_str = to_date.strftime('%Y-%m-%d')
-        
-        connection = get_db_connection()
-        if connection:
+        def revenue_rows():
+            # One row per day from the rollup, so this is small enough to
+            # read in one go; it just follows the stream_query() shape
+            connection = get_db_pool().get_connection()
             cursor = connection.cursor(dictionary=True)
-            
             try:
-                # Get daily revenue data for the report
-                cursor.execute("""
-                    SELECT 
-                        DATE(b.booking_date) as date,
-                        SUM(CASE WHEN b.status = 'confirmed' THEN b.total_fare ELSE 0 END) as revenue,
-                        COUNT(CASE WHEN b.status = 'confirmed' THEN 1 ELSE NULL END) as confirmed_bookings,
-                        COUNT(CASE WHEN b.status = 'cancelled' THEN 1 ELSE NULL END) as cancelled_bookings,
-                        COUNT(*) as total_bookings
-                    FROM 
-                        bookings b
-                    WHERE 
-                        DATE(b.booking_date) BETWEEN %s AND %s
-                    GROUP BY 
-                        DATE(b.booking_date)
-                    ORDER BY 
-                        date
-                """, (from_date_str, to_date_str))
-                
-                daily_data = cursor.fetchall()
-                
-                if daily_data:
-                    # Write to CSV
-                    with open(file_path, mode='w', newline='') as csv_file:
-                        fieldnames = ['Date', 'Revenue', 'Confirmed Bookings', 'Cancelled Bookings', 'Total Bookings']
-                        writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-                        
-                        writer.writeheader()
-                        for entry in daily_data:
-                            writer.writerow({
-                                'Date': entry['date'],
-                                'Revenue': entry['revenue'],
-                                'Confirmed Bookings': entry['confirmed_bookings'],
-                                'Cancelled Bookings': entry['cancelled_bookings'],
-                                'Total Bookings': entry['total_bookings']
-                            })
-                    
-                    CTkMessagebox(
-                        title="Success",
-                        message=f"Revenue report successfully exported to {file_path}",
-                        icon="check"
-                    )
-                else:
-                    CTkMessagebox(
-                        title="No Data",
-                        message="No revenue data to export for the selected period",
-                        icon="warning"
-                    )
-                
-            except Exception as e:
-                CTkMessagebox(
-                    title="Export Error",
-                    message=f"Failed to export revenue report: {str(e)}",
-                    icon="cancel"
-                )
+                daily_data = aggregate_bookings(cursor, from_date, to_date, "day")
             finally:
                 cursor.close()
                 connection.close()
+            
+            yield ['Date', 'Revenue', 'Confirmed Bookings', 'Cancelled Bookings', 'Total Bookings']
+            if any(entry['total_bookings'] for entry in daily_data):
+                yield [
+                    (
+                        entry['date'],
+                        entry['revenue'],
+                        entry['confirmed_bookings'],
+                        entry['cancelled_bookings'],
+                        entry['total_bookings']
+                    )
+                    for entry in daily_data
+                ]
+        
+        self.run_csv_export(
+            "Exporting Revenue Report", file_path, revenue_rows,
+            success_message=f"Revenue report successfully exported to {file_path}",
+            empty_message="No revenue data to export for the selected period",
+            error_message="Failed to export revenue report",
+            noun="days"
+        )
     
     def show_admin_passengers_tab(self):
         # Similar pattern to other admin tabs
@@ -5884,223 +9643,143 @@ class RailwayReservationSystem:
         # Export button (on the right)
         export_button = ctk.CTkButton(
             controls_frame,
-            text="Export to CSV",
-            command=self.export_passengers_to_csv,
-            width=120,
-            height=35,
-            fg_color=("green", "dark green"),
-            hover_color=("darkgreen", "green4")
-        )
-        export_button.pack(side="right", padx=10)
-        
-        # Create a scrollable frame for the passengers list
-        passengers_scroll = ctk.CTkScrollableFrame(passengers_frame)
-        passengers_scroll.pack(fill="both", expand=True, padx=10, pady=10)
-        
-        # Load passengers
-        self.load_passengers(passengers_scroll)
-    
-    def load_passengers(self, container):
-        # Clear the container
-        for widget in container.winfo_children():
-            widget.destroy()
-        
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
-            
-            try:
-                cursor.execute("""
-                    SELECT 
-                        p.id, p.name, p.age, p.gender, p.seat_class, p.seat_number,
-                        b.pnr, b.booking_date, b.status,
-                        s.source, s.destination, s.departure_date, s.departure_time,
-                        t.train_number, t.train_name
-                    FROM 
-                        passengers p
-                    JOIN 
-                        bookings b ON p.booking_id = b.id
-                    JOIN 
-                        schedules s ON b.schedule_id = s.id
-                    JOIN 
-                        trains t ON s.train_id = t.id
-                    ORDER BY 
-                        s.departure_date DESC, s.departure_time DESC
-                """)
-                
-                passengers = cursor.fetchall()
-                
-                if not passengers:
-                    no_passengers_label = ctk.CTkLabel(
-                        container, 
-                        text="No passengers found",
-                        text_color=("gray50", "gray70")
-                    )
-                    no_passengers_label.pack(pady=20)
-                    return
-                
-                # Display the passengers
-                self.display_passengers(container, passengers)
-                
-            except Exception as e:
-                print(f"Error loading passengers: {e}")
-                error_label = ctk.CTkLabel(
-                    container, 
-                    text=f"Error loading passengers: {str(e)}",
-                    text_color=("gray50", "gray70")
-                )
-                error_label.pack(pady=20)
-            finally:
-                cursor.close()
-                connection.close()
-    
-    def search_passengers(self, container, search_term):
-        # Clear the container
-        for widget in container.winfo_children():
-            widget.destroy()
-        
-        if not search_term:
-            self.load_passengers(container)
-            return
-        
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
-            
-            try:
-                # Search by passenger name or PNR
-                search_pattern = f"%{search_term}%"
-                
-                cursor.execute("""
-                    SELECT 
-                        p.id, p.name, p.age, p.gender, p.seat_class, p.seat_number,
-                        b.pnr, b.booking_date, b.status,
-                        s.source, s.destination, s.departure_date, s.departure_time,
-                        t.train_number, t.train_name
-                    FROM 
-                        passengers p
-                    JOIN 
-                        bookings b ON p.booking_id = b.id
-                    JOIN 
-                        schedules s ON b.schedule_id = s.id
-                    JOIN 
-                        trains t ON s.train_id = t.id
-                    WHERE 
-                        p.name LIKE %s OR b.pnr LIKE %s
-                    ORDER BY 
-                        s.departure_date DESC, s.departure_time DESC
-                """, (search_pattern, search_pattern))
-                
-                passengers = cursor.fetchall()
-                
-                if not passengers:
-                    no_passengers_label = ctk.CTkLabel(
-                        container, 
-                        text=f"No passengers found matching '{search_term}'",
-                        text_color=("gray50", "gray70")
-                    )
-                    no_passengers_label.pack(pady=20)
-                    
-                    # Show reset search button
-                    reset_button = ctk.CTkButton(
-                        container, 
-                        text="Show All Passengers", 
-                        command=lambda: self.load_passengers(container),
-                        height=35
-                    )
-                    reset_button.pack(pady=10)
-                    return
-                
-                # Display the passengers
-                self.display_passengers(container, passengers)
-                
-            except Exception as e:
-                print(f"Error searching passengers: {e}")
-                error_label = ctk.CTkLabel(
-                    container, 
-                    text=f"Error searching passengers: {str(e)}",
-                    text_color=("gray50", "gray70")
-                )
-                error_label.pack(pady=20)
-            finally:
-                cursor.close()
-                connection.close()
+            text="Export to CSV",
+            command=self.export_passengers_to_csv,
+            width=120,
+            height=35,
+            fg_color=("green", "dark green"),
+            hover_color=("darkgreen", "green4")
+        )
+        export_button.pack(side="right", padx=10)
+        
+        # Create a scrollable frame for the passengers list
+        passengers_scroll = ctk.CTkScrollableFrame(passengers_frame)
+        passengers_scroll.pack(fill="both", expand=True, padx=10, pady=10)
+        
+        # Load passengers
+        self.load_passengers(passengers_scroll)
     
-    def filter_passengers_by_class(self, container, seat_class):
-        # Clear the container
-        for widget in container.winfo_children():
-            widget.destroy()
+    def load_passengers(self, container):
+        # Latest bookings first, paged by (booking_id, id): the passengers
+        # booking_id index (which ends in the primary key) serves that order
+        passengers = KeysetPager(
+            """
+                p.id, p.booking_id, p.name, p.age, p.gender, p.seat_class, p.seat_number,
+                b.pnr, b.booking_date, b.status,
+                s.source, s.destination, s.departure_date, s.departure_time,
+                t.train_number, t.train_name
+            """,
+            """
+                FROM 
+                    passengers p
+                JOIN 
+                    bookings b ON p.booking_id = b.id
+                JOIN 
+                    schedules s ON b.schedule_id = s.id
+                JOIN 
+                    trains t ON s.train_id = t.id
+            """,
+            [("p.booking_id", "booking_id"), ("p.id", "id")],
+            count_table="passengers"
+        )
+        
+        def show_no_passengers():
+            no_passengers_label = ctk.CTkLabel(
+                container, 
+                text="No passengers found",
+                text_color=("gray50", "gray70")
+            )
+            no_passengers_label.pack(pady=20)
         
-        if seat_class == "All":
+        self.load_paged_results(
+            container, "passengers", passengers,
+            lambda rows: self.display_passengers(container, rows),
+            show_no_passengers, "Error loading passengers", "passengers"
+        )
+    
+    def search_passengers(self, container, search_term):
+        if not search_term:
             self.load_passengers(container)
             return
         
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
+        # Search by passenger name or PNR
+        def show_no_results():
+            no_passengers_label = ctk.CTkLabel(
+                container, 
+                text=f"No passengers found matching '{search_term}'",
+                text_color=("gray50", "gray70")
+            )
+            no_passengers_label.pack(pady=20)
             
-            try:
-                cursor.execute("""
-                    SELECT 
-                        p.id, p.name, p.age, p.gender, p.seat_class, p.seat_number,
-                        b.pnr, b.booking_date, b.status,
-                        s.source, s.destination, s.departure_date, s.departure_time,
-                        t.train_number, t.train_name
-                    FROM 
-                        passengers p
-                    JOIN 
-                        bookings b ON p.booking_id = b.id
-                    JOIN 
-                        schedules s ON b.schedule_id = s.id
-                    JOIN 
-                        trains t ON s.train_id = t.id
-                    WHERE 
-                        p.seat_class = %s
-                    ORDER BY 
-                        s.departure_date DESC, s.departure_time DESC
-                """, (seat_class.lower(),))
-                
-                passengers = cursor.fetchall()
-                
-                if not passengers:
-                    no_passengers_label = ctk.CTkLabel(
-                        container, 
-                        text=f"No passengers found in {seat_class} class",
-                        text_color=("gray50", "gray70")
-                    )
-                    no_passengers_label.pack(pady=20)
-                    
-                    # Show reset filter button
-                    reset_button = ctk.CTkButton(
-                        container, 
-                        text="Show All Passengers", 
-                        command=lambda: self.load_passengers(container),
-                        height=35
-                    )
-                    reset_button.pack(pady=10)
-                    return
-                
-                # Display the passengers
-                self.display_passengers(container, passengers)
-                
-            except Exception as e:
-                print(f"Error filtering passengers: {e}")
-                error_label = ctk.CTkLabel(
+            # Show reset search button
+            reset_button = ctk.CTkButton(
+                container, 
+                text="Show All Passengers", 
+                command=lambda: self.load_passengers(container),
+                height=35
+            )
+            reset_button.pack(pady=10)
+        
+        self.load_search_results(
+            container, "passengers", search_term,
+            lambda passengers: self.display_passengers(container, passengers),
+            show_no_results, "Error searching passengers"
+        )
+    
+    def filter_passengers_by_class(self, container, seat_class):
+        if seat_class == "All":
+            self.load_passengers(container)
+            return
+        
+        query = """
+            SELECT 
+                p.id, p.name, p.age, p.gender, p.seat_class, p.seat_number,
+                b.pnr, b.booking_date, b.status,
+                s.source, s.destination, s.departure_date, s.departure_time,
+                t.train_number, t.train_name
+            FROM 
+                passengers p
+            JOIN 
+                bookings b ON p.booking_id = b.id
+            JOIN 
+                schedules s ON b.schedule_id = s.id
+            JOIN 
+                trains t ON s.train_id = t.id
+            WHERE 
+                p.seat_class = %s
+            ORDER BY 
+                s.departure_date DESC, s.departure_time DESC
+        """
+        
+        def show_passengers(passengers):
+            if not passengers:
+                no_passengers_label = ctk.CTkLabel(
                     container, 
-                    text=f"Error filtering passengers: {str(e)}",
+                    text=f"No passengers found in {seat_class} class",
                     text_color=("gray50", "gray70")
                 )
-                error_label.pack(pady=20)
-            finally:
-                cursor.close()
-                connection.close()
+                no_passengers_label.pack(pady=20)
+                
+                # Show reset filter button
+                reset_button = ctk.CTkButton(
+                    container, 
+                    text="Show All Passengers", 
+                    command=lambda: self.load_passengers(container),
+                    height=35
+                )
+                reset_button.pack(pady=10)
+                return
+            
+            # Display the passengers
+            self.display_passengers(container, passengers)
+        
+        self.load_in_background(
+            container, "passengers", lambda: fetch_all(query, (seat_class.lower(),)),
+            show_passengers, "Error filtering passengers", "Loading passengers..."
+        )
     
     def display_passengers(self, container, passengers):
-        # Headers
-        header_frame = ctk.CTkFrame(container, fg_color=("gray80", "gray25"))
-        header_frame.pack(fill="x", padx=5, pady=5)
-        
-        header_columns = [
+        columns = [
             ("Passenger Name", 150),
             ("Age/Gender", 100),
             ("Class/Seat", 120),
@@ -6110,114 +9789,86 @@ class RailwayReservationSystem:
             ("Departure", 120)
         ]
         
-        for i, (text, width) in enumerate(header_columns):
-            header_label = ctk.CTkLabel(
-                header_frame, 
-                text=text, 
-                font=ctk.CTkFont(weight="bold"),
-                width=width
-            )
-            header_label.grid(row=0, column=i, padx=5, pady=5, sticky="w")
-        
-        # Passenger rows
-        for i, passenger in enumerate(passengers):
-            row_frame = ctk.CTkFrame(container)
-            row_frame.pack(fill="x", pady=2)
+        def build_row(row_frame):
+            cells = {}
+            for i, field in ((0, "name"), (1, "age"), (2, "seat"), (4, "train"), (5, "journey"), (6, "departure")):
+                cells[field] = ctk.CTkLabel(row_frame, text="", width=columns[i][1], anchor="w", justify="left")
+                cells[field].grid(row=0, column=i, padx=5, pady=4, sticky="w")
+            cells["journey"].configure(wraplength=180)
             
+            # PNR and status
+            pnr_frame = ctk.CTkFrame(row_frame, fg_color="transparent")
+            pnr_frame.grid(row=0, column=3, padx=5, pady=4, sticky="w")
+            
+            cells["pnr"] = ctk.CTkLabel(pnr_frame, text="", height=20)
+            cells["pnr"].pack(anchor="w")
+            cells["status"] = ctk.CTkLabel(pnr_frame, text="", font=ctk.CTkFont(size=12), height=20)
+            cells["status"].pack(anchor="w")
+            return cells
+        
+        def fill_row(cells, passenger, index):
             # Format gender and class for display
             gender_display = passenger['gender'].capitalize()
             class_display = passenger['seat_class'].capitalize()
             seat_display = passenger['seat_number'] if passenger['seat_number'] else "Not assigned"
-            
-            # Format status with color
-            status_color = "#43a047" if passenger['status'] == 'confirmed' else "#e53935"
-            status_text = "Confirmed" if passenger['status'] == 'confirmed' else "Cancelled"
-            
-            ctk.CTkLabel(row_frame, text=passenger['name'], width=header_columns[0][1], anchor="w").grid(row=0, column=0, padx=5, pady=8, sticky="w")
-            ctk.CTkLabel(row_frame, text=f"{passenger['age']} / {gender_display}", width=header_columns[1][1]).grid(row=0, column=1, padx=5, pady=8, sticky="w")
-            ctk.CTkLabel(row_frame, text=f"{class_display} / {seat_display}", width=header_columns[2][1]).grid(row=0, column=2, padx=5, pady=8, sticky="w")
-            
-            # PNR and status
-            pnr_frame = ctk.CTkFrame(row_frame, fg_color="transparent")
-            pnr_frame.grid(row=0, column=3, padx=5, pady=5)
-            
-            ctk.CTkLabel(pnr_frame, text=passenger['pnr']).pack(anchor="w")
-            ctk.CTkLabel(pnr_frame, text=status_text, text_color=status_color, font=ctk.CTkFont(size=12)).pack(anchor="w")
-            
-            ctk.CTkLabel(row_frame, text=f"{passenger['train_number']}\n{passenger['train_name']}", width=header_columns[4][1]).grid(row=0, column=4, padx=5, pady=8, sticky="w")
-            ctk.CTkLabel(row_frame, text=f"{passenger['source']} → {passenger['destination']}", width=header_columns[5][1], wraplength=180).grid(row=0, column=5, padx=5, pady=8, sticky="w")
-            ctk.CTkLabel(row_frame, text=f"{passenger['departure_date']}\n{passenger['departure_time']}", width=header_columns[6][1]).grid(row=0, column=6, padx=5, pady=8, sticky="w")
+            status_text, status_color = booking_status_style(passenger['status'])
+            
+            cells["name"].configure(text=passenger['name'])
+            cells["age"].configure(text=f"{passenger['age']} / {gender_display}")
+            cells["seat"].configure(text=f"{class_display} / {seat_display}")
+            cells["pnr"].configure(text=passenger['pnr'])
+            cells["status"].configure(text=status_text, text_color=status_color)
+            cells["train"].configure(text=f"{passenger['train_number']}\n{passenger['train_name']}")
+            cells["journey"].configure(text=f"{passenger['source']} → {passenger['destination']}")
+            cells["departure"].configure(text=f"{passenger['departure_date']}\n{passenger['departure_time']}")
+        
+        grid = VirtualGrid(container, columns, passengers, build_row, fill_row)
+        grid.pack(fill="both", expand=True, padx=5, pady=5)
+        return grid
     
     def export_passengers_to_csv(self):
-        import csv
         from tkinter import filedialog
         
         # Ask user where to save the CSV file
         file_path = filedialog.asksaveasfilename(
             defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv")],
+            filetypes=[("CSV files", "*.csv"), ("Compressed CSV files", "*.csv.gz")],
             title="Save Passengers Report"
         )
         
         if not file_path:
             return  # User cancelled
         
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
-            
-            try:
-                cursor.execute("""
-                    SELECT 
-                        p.name as passenger_name, p.age, p.gender, p.seat_class, p.seat_number,
-                        b.pnr, b.status, b.booking_date,
-                        s.source, s.destination, s.departure_date, s.departure_time,
-                        t.train_number, t.train_name
-                    FROM 
-                        passengers p
-                    JOIN 
-                        bookings b ON p.booking_id = b.id
-                    JOIN 
-                        schedules s ON b.schedule_id = s.id
-                    JOIN 
-                        trains t ON s.train_id = t.id
-                    ORDER BY 
-                        s.departure_date DESC, s.departure_time DESC
-                """)
-                
-                passengers = cursor.fetchall()
-                
-                if passengers:
-                    # Write to CSV
-                    with open(file_path, mode='w', newline='') as csv_file:
-                        fieldnames = passengers[0].keys()
-                        writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-                        
-                        writer.writeheader()
-                        for passenger in passengers:
-                            writer.writerow(passenger)
-                    
-                    CTkMessagebox(
-                        title="Success",
-                        message=f"Passengers data successfully exported to {file_path}",
-                        icon="check"
-                    )
-                else:
-                    CTkMessagebox(
-                        title="No Data",
-                        message="No passenger data to export",
-                        icon="warning"
-                    )
-                
-            except Exception as e:
-                CTkMessagebox(
-                    title="Export Error",
-                    message=f"Failed to export passengers data: {str(e)}",
-                    icon="cancel"
-                )
-            finally:
-                cursor.close()
-                connection.close()
+        from_clause = """
+            FROM 
+                passengers p
+            JOIN 
+                bookings b ON p.booking_id = b.id
+            JOIN 
+                schedules s ON b.schedule_id = s.id
+            JOIN 
+                trains t ON s.train_id = t.id
+        """
+        
+        query = """
+            SELECT 
+                p.name as passenger_name, p.age, p.gender, p.seat_class, p.seat_number,
+                b.pnr, b.status, b.booking_date,
+                s.source, s.destination, s.departure_date, s.departure_time,
+                t.train_number, t.train_name
+        """ + from_clause + """
+            ORDER BY 
+                s.departure_date DESC, s.departure_time DESC
+        """
+        
+        self.run_csv_export(
+            "Exporting Passengers", file_path,
+            lambda: stream_query(query),
+            lambda: estimate_row_count(from_clause, table="passengers"),
+            success_message=f"Passengers data successfully exported to {file_path}",
+            empty_message="No passenger data to export",
+            error_message="Failed to export passengers data"
+        )
     
     def show_admin_settings_tab(self):
         # Similar pattern to other admin tabs
@@ -6442,189 +10093,125 @@ class RailwayReservationSystem:
         self.load_users(users_scroll)
     
     def load_users(self, container):
-        # Clear the container
-        for widget in container.winfo_children():
-            widget.destroy()
+        # Alphabetical, paged by (name, id)
+        users = KeysetPager(
+            "id, name, email, is_admin, theme, DATE_FORMAT(created_at, '%Y-%m-%d') as joined_date",
+            "FROM users",
+            [("name", "name"), ("id", "id")],
+            descending=False,
+            count_table="users"
+        )
+        
+        def show_no_users():
+            no_users_label = ctk.CTkLabel(
+                container, 
+                text="No users found",
+                text_color=("gray50", "gray70")
+            )
+            no_users_label.pack(pady=20)
         
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
-            
-            try:
-                cursor.execute("""
-                    SELECT id, name, email, is_admin, theme, 
-                           DATE_FORMAT(created_at, '%Y-%m-%d') as joined_date
-                    FROM users
-                    ORDER BY name
-                """)
-                
-                users = cursor.fetchall()
-                
-                if not users:
-                    no_users_label = ctk.CTkLabel(
-                        container, 
-                        text="No users found",
-                        text_color=("gray50", "gray70")
-                    )
-                    no_users_label.pack(pady=20)
-                    return
-                
-                # Display the users
-                self.display_users(container, users)
-                
-            except Exception as e:
-                print(f"Error loading users: {e}")
-                error_label = ctk.CTkLabel(
-                    container, 
-                    text=f"Error loading users: {str(e)}",
-                    text_color=("gray50", "gray70")
-                )
-                error_label.pack(pady=20)
-            finally:
-                cursor.close()
-                connection.close()
+        self.load_paged_results(
+            container, "users", users,
+            lambda rows: self.display_users(container, rows),
+            show_no_users, "Error loading users", "users"
+        )
     
     def search_users(self, container, search_term):
-        # Clear the container
-        for widget in container.winfo_children():
-            widget.destroy()
-        
         if not search_term:
             self.load_users(container)
             return
         
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
+        # Search by name or email
+        def show_no_results():
+            no_users_label = ctk.CTkLabel(
+                container, 
+                text=f"No users found matching '{search_term}'",
+                text_color=("gray50", "gray70")
+            )
+            no_users_label.pack(pady=20)
             
-            try:
-                # Search by name or email
-                search_pattern = f"%{search_term}%"
-                
-                cursor.execute("""
-                    SELECT id, name, email, is_admin, theme, 
-                           DATE_FORMAT(created_at, '%Y-%m-%d') as joined_date
-                    FROM users
-                    WHERE name LIKE %s OR email LIKE %s
-                    ORDER BY name
-                """, (search_pattern, search_pattern))
-                
-                users = cursor.fetchall()
-                
-                if not users:
-                    no_users_label = ctk.CTkLabel(
-                        container, 
-                        text=f"No users found matching '{search_term}'",
-                        text_color=("gray50", "gray70")
-                    )
-                    no_users_label.pack(pady=20)
-                    
-                    # Show reset search button
-                    reset_button = ctk.CTkButton(
-                        container, 
-                        text="Show All Users", 
-                        command=lambda: self.load_users(container),
-                        height=35
-                    )
-                    reset_button.pack(pady=10)
-                    return
-                
-                # Display the users
-                self.display_users(container, users)
-                
-            except Exception as e:
-                print(f"Error searching users: {e}")
-                error_label = ctk.CTkLabel(
-                    container, 
-                    text=f"Error searching users: {str(e)}",
-                    text_color=("gray50", "gray70")
-                )
-                error_label.pack(pady=20)
-            finally:
-                cursor.close()
-                connection.close()
+            # Show reset search button
+            reset_button = ctk.CTkButton(
+                container, 
+                text="Show All Users", 
+                command=lambda: self.load_users(container),
+                height=35
+            )
+            reset_button.pack(pady=10)
+        
+        self.load_search_results(
+            container, "users", search_term,
+            lambda users: self.display_users(container, users),
+            show_no_results, "Error searching users"
+        )
     
     def display_users(self, container, users):
-        # Headers
-        header_frame = ctk.CTkFrame(container, fg_color=("gray80", "gray25"))
-        header_frame.pack(fill="x", padx=5, pady=5)
-        
-        header_columns = [
+        columns = [
             ("Name", 150),
             ("Email", 200),
-            ("Role", 100),
-            ("Theme", 100),
-            ("Joined Date", 120),
-            ("Actions", 150)
-        ]
-        
-        for i, (text, width) in enumerate(header_columns):
-            header_label = ctk.CTkLabel(
-                header_frame, 
-                text=text, 
-                font=ctk.CTkFont(weight="bold"),
-                width=width
-            )
-            header_label.grid(row=0, column=i, padx=5, pady=5, sticky="w")
+            ("Role", 100),
+            ("Theme", 100),
+            ("Joined Date", 120),
+            ("Actions", 150)
+        ]
         
-        # User rows
-        for i, user in enumerate(users):
-            row_frame = ctk.CTkFrame(container)
-            row_frame.pack(fill="x", pady=2)
-            
-            # Format role and theme for display
-            role_display = "Admin" if user['is_admin'] else "User"
-            theme_display = user['theme'].capitalize() if user['theme'] else "Light"
-            
-            ctk.CTkLabel(row_frame, text=user['name'], width=header_columns[0][1], anchor="w").grid(row=0, column=0, padx=5, pady=8, sticky="w")
-            ctk.CTkLabel(row_frame, text=user['email'], width=header_columns[1][1], anchor="w").grid(row=0, column=1, padx=5, pady=8, sticky="w")
+        def build_row(row_frame):
+            cells = {}
+            for i, field in ((0, "name"), (1, "email"), (3, "theme"), (4, "joined")):
+                cells[field] = ctk.CTkLabel(row_frame, text="", width=columns[i][1], anchor="w")
+                cells[field].grid(row=0, column=i, padx=5, pady=8, sticky="w")
             
             # Role with custom style
-            role_frame = ctk.CTkFrame(row_frame, fg_color="transparent")
-            role_frame.grid(row=0, column=2, padx=5, pady=5)
-            
-            role_color = "#1e88e5" if user['is_admin'] else "#43a047"
-            role_label = ctk.CTkLabel(
-                role_frame,
-                text=role_display,
+            cells["role"] = ctk.CTkLabel(
+                row_frame,
+                text="",
                 font=ctk.CTkFont(size=12),
-                fg_color=role_color,
                 corner_radius=5,
                 text_color="white",
                 width=80,
                 height=20
             )
-            role_label.pack()
-            
-            ctk.CTkLabel(row_frame, text=theme_display, width=header_columns[3][1]).grid(row=0, column=3, padx=5, pady=8)
-            ctk.CTkLabel(row_frame, text=user['joined_date'], width=header_columns[4][1]).grid(row=0, column=4, padx=5, pady=8)
+            cells["role"].grid(row=0, column=2, padx=5, pady=8, sticky="w")
             
             # Actions
             actions_frame = ctk.CTkFrame(row_frame, fg_color="transparent")
             actions_frame.grid(row=0, column=5, padx=5, pady=5, sticky="w")
             
-            # Edit button
-            edit_button = ctk.CTkButton(
+            cells["edit"] = ctk.CTkButton(actions_frame, text="Edit", width=60, height=30)
+            cells["edit"].grid(row=0, column=0, padx=2)
+            
+            # Only shown for users other than the current one
+            cells["delete"] = ctk.CTkButton(
                 actions_frame,
-                text="Edit",
+                text="Delete",
                 width=60,
                 height=30,
-                command=lambda u=user: self.show_edit_user_dialog(u)
+                fg_color="#e53935",
+                hover_color="#c62828"
             )
-            edit_button.grid(row=0, column=0, padx=2)
+            cells["delete"].grid(row=0, column=1, padx=2)
+            return cells
+        
+        def fill_row(cells, user, index):
+            cells["name"].configure(text=user['name'])
+            cells["email"].configure(text=user['email'])
+            cells["role"].configure(
+                text="Admin" if user['is_admin'] else "User",
+                fg_color="#1e88e5" if user['is_admin'] else "#43a047"
+            )
+            cells["theme"].configure(text=user['theme'].capitalize() if user['theme'] else "Light")
+            cells["joined"].configure(text=str(user['joined_date']))
             
-            # Only allow deleting if the user is not the current user
+            cells["edit"].configure(command=lambda u=user: self.show_edit_user_dialog(u))
             if user['id'] != self.current_user['id']:
-                delete_button = ctk.CTkButton(
-                    actions_frame,
-                    text="Delete",
-                    width=60,
-                    height=30,
-                    fg_color="#e53935",
-                    hover_color="#c62828",
-                    command=lambda u=user: self.show_delete_user_dialog(u)
-                )
-                delete_button.grid(row=0, column=1, padx=2)
+                cells["delete"].configure(command=lambda u=user: self.show_delete_user_dialog(u))
+                cells["delete"].grid()
+            else:
+                cells["delete"].grid_remove()
+        
+        grid = VirtualGrid(container, columns, users, build_row, fill_row)
+        grid.pack(fill="both", expand=True, padx=5, pady=5)
+        return grid
     
     def show_add_user_dialog(self):
         # Create a dialog window
@@ -6798,23 +10385,18 @@ class RailwayReservationSystem:
             )
             return
         
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor()
+        def save_user():
+            # Runs on a worker: bcrypt and the insert stay off the Tk thread
+            # Hash before taking a connection so none is held during bcrypt
+            hashed_password = get_password_hasher().hash(password)
             
+            connection = get_db_pool().get_connection()
+            cursor = connection.cursor()
             try:
                 # Check if email already exists
                 cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
                 if cursor.fetchone():
-                    CTkMessagebox(
-                        title="Error",
-                        message="Email already registered",
-                        icon="cancel"
-                    )
-                    return
-                
-                # Hash the password
-                hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+                    return False
                 
                 # Insert new user
                 cursor.execute(
@@ -6823,37 +10405,52 @@ class RailwayReservationSystem:
                 )
                 
                 connection.commit()
-                dialog.destroy()
-                
-                CTkMessagebox(
-                    title="Success",
-                    message="User added successfully",
-                    icon="check"
-                )
-                
-                # Refresh the users list
-                for widget in self.app.winfo_children():
-                    if isinstance(widget, ctk.CTkFrame):
-                        for child in widget.winfo_children():
-                            if isinstance(child, ctk.CTkFrame):
-                                for grandchild in child.winfo_children():
-                                    if isinstance(grandchild, ctk.CTkTabview):
-                                        for tab in grandchild.winfo_children():
-                                            for content in tab.winfo_children():
-                                                for scroll in content.winfo_children():
-                                                    if isinstance(scroll, ctk.CTkScrollableFrame):
-                                                        self.load_users(scroll)
-                
-            except Exception as e:
+                return True
+            except Exception:
                 connection.rollback()
+                raise
+            finally:
+                cursor.close()
+                connection.close()
+        
+        def user_saved(saved):
+            if not saved:
                 CTkMessagebox(
                     title="Error",
-                    message=f"Failed to add user: {str(e)}",
+                    message="Email already registered",
                     icon="cancel"
                 )
-            finally:
-                cursor.close()
-                connection.close()
+                return
+            
+            dialog.destroy()
+            
+            CTkMessagebox(
+                title="Success",
+                message="User added successfully",
+                icon="check"
+            )
+            
+            # Refresh the users list
+            for widget in self.app.winfo_children():
+                if isinstance(widget, ctk.CTkFrame):
+                    for child in widget.winfo_children():
+                        if isinstance(child, ctk.CTkFrame):
+                            for grandchild in child.winfo_children():
+                                if isinstance(grandchild, ctk.CTkTabview):
+                                    for tab in grandchild.winfo_children():
+                                        for content in tab.winfo_children():
+                                            for scroll in content.winfo_children():
+                                                if isinstance(scroll, ctk.CTkScrollableFrame):
+                                                    self.load_users(scroll)
+        
+        def save_failed(e):
+            CTkMessagebox(
+                title="Error",
+                message=f"Failed to add user: {str(e)}",
+                icon="cancel"
+            )
+        
+        self.query_executor.submit(save_user, user_saved, save_failed, key="save_user")
     
     def show_edit_user_dialog(self, user):
         # Create a dialog window
@@ -7006,33 +10603,29 @@ class RailwayReservationSystem:
             )
             return
         
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor()
+        if password and len(password) < 6:
+            CTkMessagebox(
+                title="Error",
+                message="Password must be at least 6 characters long",
+                icon="cancel"
+            )
+            return
+        
+        def save_user():
+            # Runs on a worker: bcrypt and the update stay off the Tk thread
+            # Hash the new password, if provided, before taking a connection
+            hashed_password = get_password_hasher().hash(password) if password else None
             
+            connection = get_db_pool().get_connection()
+            cursor = connection.cursor()
             try:
                 # Check if email already exists for another user
                 cursor.execute("SELECT id FROM users WHERE email = %s AND id != %s", (email, user_id))
                 if cursor.fetchone():
-                    CTkMessagebox(
-                        title="Error",
-                        message="Email already registered to another user",
-                        icon="cancel"
-                    )
-                    return
+                    return False
                 
                 # Update user
-                if password:
-                    # Hash the new password if provided
-                    if len(password) < 6:
-                        CTkMessagebox(
-                            title="Error",
-                            message="Password must be at least 6 characters long",
-                            icon="cancel"
-                        )
-                        return
-                    
-                    hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+                if hashed_password:
                     cursor.execute(
                         "UPDATE users SET name = %s, email = %s, password = %s, is_admin = %s, theme = %s WHERE id = %s",
                         (name, email, hashed_password, is_admin, theme, user_id)
@@ -7045,37 +10638,52 @@ class RailwayReservationSystem:
                     )
                 
                 connection.commit()
-                dialog.destroy()
-                
-                CTkMessagebox(
-                    title="Success",
-                    message="User updated successfully",
-                    icon="check"
-                )
-                
-                # Refresh the users list
-                for widget in self.app.winfo_children():
-                    if isinstance(widget, ctk.CTkFrame):
-                        for child in widget.winfo_children():
-                            if isinstance(child, ctk.CTkFrame):
-                                for grandchild in child.winfo_children():
-                                    if isinstance(grandchild, ctk.CTkTabview):
-                                        for tab in grandchild.winfo_children():
-                                            for content in tab.winfo_children():
-                                                for scroll in content.winfo_children():
-                                                    if isinstance(scroll, ctk.CTkScrollableFrame):
-                                                        self.load_users(scroll)
-                
-            except Exception as e:
+                return True
+            except Exception:
                 connection.rollback()
+                raise
+            finally:
+                cursor.close()
+                connection.close()
+        
+        def user_saved(saved):
+            if not saved:
                 CTkMessagebox(
                     title="Error",
-                    message=f"Failed to update user: {str(e)}",
+                    message="Email already registered to another user",
                     icon="cancel"
                 )
-            finally:
-                cursor.close()
-                connection.close()
+                return
+            
+            dialog.destroy()
+            
+            CTkMessagebox(
+                title="Success",
+                message="User updated successfully",
+                icon="check"
+            )
+            
+            # Refresh the users list
+            for widget in self.app.winfo_children():
+                if isinstance(widget, ctk.CTkFrame):
+                    for child in widget.winfo_children():
+                        if isinstance(child, ctk.CTkFrame):
+                            for grandchild in child.winfo_children():
+                                if isinstance(grandchild, ctk.CTkTabview):
+                                    for tab in grandchild.winfo_children():
+                                        for content in tab.winfo_children():
+                                            for scroll in content.winfo_children():
+                                                if isinstance(scroll, ctk.CTkScrollableFrame):
+                                                    self.load_users(scroll)
+        
+        def save_failed(e):
+            CTkMessagebox(
+                title="Error",
+                message=f"Failed to update user: {str(e)}",
+                icon="cancel"
+            )
+        
+        self.query_executor.submit(save_user, user_saved, save_failed, key="save_user")
     
     def show_delete_user_dialog(self, user):
         # Create a confirmation dialog
@@ -7144,6 +10752,7 @@ class RailwayReservationSystem:
                 # Delete user (cascading will handle related records)
                 cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
                 connection.commit()
+                self.dashboard_stats.invalidate()
                 dialog.destroy()
                 
                 CTkMessagebox(
@@ -7350,52 +10959,71 @@ class RailwayReservationSystem:
             )
             return
         
-        connection = get_db_connection()
-        if connection:
+        user_id = self.current_user['id']
+        
+        def update_password():
+            # Runs on a worker: both bcrypt calls stay off the Tk thread
+            hasher = get_password_hasher()
+            connection = get_db_pool().get_connection()
             cursor = connection.cursor(dictionary=True)
-            
             try:
-                # Verify current password
-                cursor.execute("SELECT password FROM users WHERE id = %s", (self.current_user['id'],))
+                cursor.execute("SELECT password FROM users WHERE id = %s", (user_id,))
                 user_data = cursor.fetchone()
-                
-                if not user_data or not bcrypt.checkpw(current_password.encode('utf-8'), user_data['password'].encode('utf-8')):
-                    CTkMessagebox(
-                        title="Error",
-                        message="Current password is incorrect",
-                        icon="cancel"
-                    )
-                    return
-                
-                # Update password
-                hashed_password = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt())
+            finally:
+                cursor.close()
+                connection.close()
+            
+            # Verify current password with no connection held
+            if not user_data or not hasher.verify(current_password, user_data['password']):
+                return False
+            hashed_password = hasher.hash(new_password)
+            
+            connection = get_db_pool().get_connection()
+            cursor = connection.cursor()
+            try:
+                # Update password, unless it changed since it was verified
                 cursor.execute(
-                    "UPDATE users SET password = %s WHERE id = %s",
-                    (hashed_password, self.current_user['id'])
+                    "UPDATE users SET password = %s WHERE id = %s AND password = %s",
+                    (hashed_password, user_id, user_data['password'])
                 )
                 
                 connection.commit()
-                
-                CTkMessagebox(
-                    title="Success",
-                    message="Password changed successfully",
-                    icon="check"
-                )
-                
-                # Clear password fields
-                for entry in entries:
-                    entry.delete(0, 'end')
-                
-            except Exception as e:
+                return cursor.rowcount == 1
+            except Exception:
                 connection.rollback()
+                raise
+            finally:
+                cursor.close()
+                connection.close()
+        
+        def password_updated(updated):
+            if not updated:
                 CTkMessagebox(
                     title="Error",
-                    message=f"Failed to change password: {str(e)}",
+                    message="Current password is incorrect",
                     icon="cancel"
                 )
-            finally:
-                cursor.close()
-                connection.close()
+                return
+            
+            CTkMessagebox(
+                title="Success",
+                message="Password changed successfully",
+                icon="check"
+            )
+            
+            # Clear password fields
+            for entry in entries:
+                if entry.winfo_exists():
+                    entry.delete(0, 'end')
+        
+        def update_failed(e):
+            CTkMessagebox(
+                title="Error",
+                message=f"Failed to change password: {str(e)}",
+                icon="cancel"
+            )
+        
+        self.query_executor.submit(update_password, password_updated, update_failed, key="change_password")
     
     def setup_system_info_tab(self, parent):
         # Create frame for system information
@@ -7488,6 +11116,14 @@ class RailwayReservationSystem:
                     ("Total Revenue:", format_currency(total_revenue))
                 ]
                 
+                pool_stats = get_db_pool().get_stats()
+                stats_items.append((
+                    "Connection Pool:",
+                    f"{pool_stats['open']}/{pool_stats['size']} open, "
+                    f"{pool_stats['checkouts']} checkouts, {pool_stats['waits']} waits, "
+                    f"{pool_stats['reconnects']} reconnects"
+                ))
+                
                 for i, (label, value) in enumerate(stats_items):
                     label_widget = ctk.CTkLabel(
                         db_stats, 
@@ -7540,6 +11176,15 @@ class RailwayReservationSystem:
         )
         backup_button.pack(fill="x", pady=5)
         
+        # Restore Database button
+        restore_button = ctk.CTkButton(
+            actions,
+            text="Restore Database",
+            command=self.restore_database,
+            height=35
+        )
+        restore_button.pack(fill="x", pady=5)
+        
         # Check for updates
         updates_button = ctk.CTkButton(
             actions,
@@ -7547,75 +11192,161 @@ class RailwayReservationSystem:
             command=self.check_for_updates,
             height=35
         )
-        updates_button.pack(fill="x", pady=5)
+        updates_button.pack(fill="x", pady=5)
+        
+        # About button
+        about_button = ctk.CTkButton(
+            actions,
+            text="About",
+            command=self.show_about_dialog,
+            height=35
+        )
+        about_button.pack(fill="x", pady=5)
+    
+    def backup_database(self):
+        from tkinter import filedialog
+        
+        # Ask user where to save the backup
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".zip",
+            filetypes=[("Backup archives", "*.zip")],
+            title="Save Database Backup",
+            initialfile=f"railway_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+        )
+        
+        if not file_path:
+            return  # User cancelled
+        
+        def show_result(manifest, progress):
+            CTkMessagebox(
+                title="Success",
+                message=f"Database backup created successfully at {file_path}\n\n"
+                        f"{progress.rows:,} rows from {len(manifest['tables'])} tables, "
+                        f"{progress.mb_per_second():.1f} MB/s",
+                icon="check"
+            )
+        
+        self.run_backup_job(
+            "Backing Up Database",
+            f"Backing up to {os.path.basename(file_path)}...",
+            lambda progress, cancel_event: backup_database_to(
+                file_path, progress=progress, cancel_event=cancel_event
+            ),
+            show_result,
+            "Failed to backup database"
+        )
+    
+    def restore_database(self):
+        from tkinter import filedialog
+        
+        file_path = filedialog.askopenfilename(
+            filetypes=[("Backup archives", "*.zip")],
+            title="Restore Database Backup"
+        )
+        
+        if not file_path:
+            return  # User cancelled
+        
+        confirm = CTkMessagebox(
+            title="Restore Database",
+            message="Rows in the backup will overwrite the matching rows in the database. Continue?",
+            icon="warning",
+            option_1="Cancel",
+            option_2="Restore"
+        )
+        if confirm.get() != "Restore":
+            return
+        
+        def show_result(manifest, progress):
+            CTkMessagebox(
+                title="Success",
+                message=f"Restored {progress.rows:,} rows from {len(manifest['tables'])} tables "
+                        f"({progress.mb_per_second():.1f} MB/s)",
+                icon="check"
+            )
+        
+        self.run_backup_job(
+            "Restoring Database",
+            f"Restoring from {os.path.basename(file_path)}...",
+            lambda progress, cancel_event: restore_database_from(
+                file_path, progress=progress, cancel_event=cancel_event
+            ),
+            show_result,
+            "Failed to restore database"
+        )
+    
+    def run_backup_job(self, title, status_text, job, on_success, error_message):
+        # Runs job(progress, cancel_event) on the query executor behind a
+        # progress dialog that shows rows, MB and MB/s and can cancel it
+        dialog = ctk.CTkToplevel(self.app)
+        dialog.title(title)
+        dialog.geometry("420x200")
+        dialog.resizable(False, False)
+        dialog.grab_set()  # Make the dialog modal
+        
+        # Center the dialog
+        dialog.update_idletasks()
+        width = dialog.winfo_width()
+        height = dialog.winfo_height()
+        x = (dialog.winfo_screenwidth() // 2) - (width // 2)
+        y = (dialog.winfo_screenheight() // 2) - (height // 2)
+        dialog.geometry('{}x{}+{}+{}'.format(width, height, x, y))
+        
+        status_label = ctk.CTkLabel(
+            dialog,
+            text=status_text,
+            font=ctk.CTkFont(size=14),
+            wraplength=380
+        )
+        status_label.pack(pady=(20, 10), padx=20)
         
-        # About button
-        about_button = ctk.CTkButton(
-            actions,
-            text="About",
-            command=self.show_about_dialog,
+        progress_bar = ctk.CTkProgressBar(dialog, width=360, mode="indeterminate")
+        progress_bar.pack(pady=5)
+        progress_bar.start()
+        
+        count_label = ctk.CTkLabel(dialog, text="Starting...", text_color=("gray50", "gray70"))
+        count_label.pack(pady=5)
+        
+        progress = BackupProgress()
+        cancel_event = threading.Event()
+        
+        def cancel_job():
+            cancel_event.set()
+            cancel_button.configure(text="Cancelling...", state="disabled")
+        
+        cancel_button = ctk.CTkButton(
+            dialog,
+            text="Cancel",
+            command=cancel_job,
+            fg_color="#e53935",
+            hover_color="#c62828",
             height=35
         )
-        about_button.pack(fill="x", pady=5)
-    
-    def backup_database(self):
-        import subprocess
-        from tkinter import filedialog
-        import os
-        from datetime import datetime
+        cancel_button.pack(pady=10)
+        dialog.protocol("WM_DELETE_WINDOW", cancel_job)
         
-        # Ask user where to save the backup
-        file_path = filedialog.asksaveasfilename(
-            defaultextension=".sql",
-            filetypes=[("SQL files", "*.sql")],
-            title="Save Database Backup",
-            initialfile=f"railway_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.sql"
-        )
+        def update_progress():
+            if not dialog.winfo_exists():
+                return
+            count_label.configure(
+                text=f"{progress.rows:,} rows · {progress.bytes / 1048576:.1f} MB · "
+                     f"{progress.mb_per_second():.1f} MB/s"
+            )
+            dialog.after(200, update_progress)
         
-        if not file_path:
-            return  # User cancelled
+        def show_result(manifest):
+            dialog.destroy()
+            on_success(manifest, progress)
         
-        try:
-            # Get database credentials from environment variables
-            host = os.getenv("MYSQL_HOST")
-            user = os.getenv("MYSQL_USER")
-            password = os.getenv("MYSQL_PASSWORD")
-            database = os.getenv("MYSQL_DATABASE")
-            
-            # Create backup command
-            backup_command = [
-                "mysqldump",
-                f"--host={host}",
-                f"--user={user}",
-                f"--password={password}",
-                database,
-                f"--result-file={file_path}"
-            ]
-            
-            # Execute backup
-            process = subprocess.Popen(
-                backup_command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-            
-            _, stderr = process.communicate()
-            
-            if process.returncode != 0:
-                raise Exception(f"mysqldump failed: {stderr.decode('utf-8')}")
-            
-            CTkMessagebox(
-                title="Success",
-                message=f"Database backup created successfully at {file_path}",
-                icon="check"
-            )
-            
-        except Exception as e:
-            CTkMessagebox(
-                title="Backup Error",
-                message=f"Failed to backup database: {str(e)}",
-                icon="cancel"
-            )
+        def show_error(e):
+            dialog.destroy()
+            if isinstance(e, ExportCancelled):
+                CTkMessagebox(title="Cancelled", message=f"{title} was cancelled", icon="info")
+            else:
+                CTkMessagebox(title="Error", message=f"{error_message}: {str(e)}", icon="cancel")
+        
+        self.query_executor.submit(lambda: job(progress, cancel_event), show_result, show_error)
+        update_progress()
     
     def check_for_updates(self):
         # Simulate checking for updates
@@ -7945,6 +11676,8 @@ class RailwayReservationSystem:
         )
         welcome_subtitle.pack(anchor="w", pady=(5, 0))
         
+        self.show_user_notifications(dashboard_frame)
+        
         # Quick Actions
         actions_label = ctk.CTkLabel(
             dashboard_frame, 
@@ -8075,6 +11808,83 @@ class RailwayReservationSystem:
         
         self.show_user_upcoming_journeys(upcoming_frame)
     
+    def show_user_notifications(self, parent):
+        # Unread notifications, such as waitlisted bookings that were confirmed
+        connection = get_db_connection()
+        if not connection:
+            return
+        cursor = connection.cursor(dictionary=True)
+        try:
+            cursor.execute("""
+                SELECT id, message, created_at
+                FROM notifications
+                WHERE user_id = %s AND is_read = FALSE
+                ORDER BY created_at DESC, id DESC
+                LIMIT 5
+            """, (self.current_user['id'],))
+            notifications = cursor.fetchall()
+        except Exception as e:
+            print(f"Error loading notifications: {e}")
+            return
+        finally:
+            cursor.close()
+            connection.close()
+        
+        if not notifications:
+            return
+        
+        notifications_frame = ctk.CTkFrame(parent)
+        notifications_frame.pack(fill="x", padx=10, pady=10)
+        
+        header = ctk.CTkFrame(notifications_frame, fg_color="transparent")
+        header.pack(fill="x", padx=15, pady=(10, 5))
+        
+        ctk.CTkLabel(
+            header,
+            text="Notifications",
+            font=ctk.CTkFont(size=16, weight="bold")
+        ).pack(side="left")
+        
+        ctk.CTkButton(
+            header,
+            text="Mark as Read",
+            width=110,
+            height=28,
+            command=lambda: self.mark_notifications_read(
+                [notification['id'] for notification in notifications], notifications_frame
+            )
+        ).pack(side="right")
+        
+        for notification in notifications:
+            ctk.CTkLabel(
+                notifications_frame,
+                text=f"{notification['created_at'].strftime('%b %d, %H:%M')}  {notification['message']}",
+                font=ctk.CTkFont(size=12),
+                anchor="w",
+                justify="left",
+                wraplength=700
+            ).pack(fill="x", padx=15, pady=(0, 5))
+    
+    def mark_notifications_read(self, notification_ids, frame):
+        connection = get_db_connection()
+        if not connection:
+            return
+        cursor = connection.cursor()
+        try:
+            placeholders = ", ".join(["%s"] * len(notification_ids))
+            cursor.execute(
+                f"UPDATE notifications SET is_read = TRUE WHERE user_id = %s AND id IN ({placeholders})",
+                (self.current_user['id'],) + tuple(notification_ids)
+            )
+            connection.commit()
+            frame.destroy()
+        except Exception as e:
+            connection.rollback()
+            print(f"Error updating notifications: {e}")
+        finally:
+            cursor.close()
+            connection.close()
+    
     def show_user_tab(self, tab_name):
         # This method handles navigation between user tabs
         if tab_name == "book":
@@ -8100,7 +11910,7 @@ class RailwayReservationSystem:
                 cursor.execute("""
                     SELECT 
                         b.id, b.pnr, b.booking_date, b.total_fare, b.status,
-                        t.train_name, s.source, s.destination, s.departure_date, s.departure_time
+                        t.train_name, COALESCE(b.boarding, s.source) AS source, COALESCE(b.alighting, s.destination) AS destination, s.departure_date, s.departure_time
                     FROM 
                         bookings b
                     JOIN 
@@ -8141,8 +11951,7 @@ class RailwayReservationSystem:
                     )
                     pnr_label.pack(side="left")
                     
-                    status_color = "#43a047" if booking['status'] == 'confirmed' else "#e53935"
-                    status_text = "Confirmed" if booking['status'] == 'confirmed' else "Cancelled"
+                    status_text, status_color = booking_status_style(booking['status'])
                     
                     status_label = ctk.CTkLabel(
                         header_frame,
@@ -8227,7 +12036,7 @@ class RailwayReservationSystem:
                 
                 cursor.execute("""
                     SELECT 
-                        b.id, b.pnr, t.train_name, s.source, s.destination, 
+                        b.id, b.pnr, t.train_name, COALESCE(b.boarding, s.source) AS source, COALESCE(b.alighting, s.destination) AS destination, 
                         s.departure_date, s.departure_time, s.status, s.delay_minutes
                     FROM 
                         bookings b
@@ -8365,7 +12174,7 @@ class RailwayReservationSystem:
                     SELECT 
                         b.id, b.pnr, b.booking_date, b.total_fare, b.status, b.payment_method,
                         t.train_number, t.train_name,
-                        s.source, s.destination, s.departure_date, s.departure_time,
+                        COALESCE(b.boarding, s.source) AS source, COALESCE(b.alighting, s.destination) AS destination, s.departure_date, s.departure_time,
                         s.arrival_date, s.arrival_time, s.status as train_status, s.delay_minutes
                     FROM 
                         bookings b
@@ -8424,8 +12233,7 @@ class RailwayReservationSystem:
                 )
                 pnr_label.pack(side="left")
                 
-                status_color = "#43a047" if booking['status'] == "confirmed" else "#e53935"
-                status_text = "Confirmed" if booking['status'] == "confirmed" else "Cancelled"
+                status_text, status_color = booking_status_style(booking['status'])
                 
                 status_badge = ctk.CTkLabel(
                     header_frame,
@@ -8642,8 +12450,8 @@ class RailwayReservationSystem:
                 )
                 close_button.pack(side="left", padx=(0, 10), fill="x", expand=True)
                 
-                # Cancel booking button (only if status is confirmed)
-                if booking['status'] == 'confirmed':
+                # Cancel booking button (only if not already cancelled)
+                if booking['status'] != 'cancelled':
                     cancel_button = ctk.CTkButton(
                         buttons_frame,
                         text="Cancel Booking",
@@ -8722,45 +12530,44 @@ class RailwayReservationSystem:
         keep_button.pack(side="right", padx=(5, 0), fill="x", expand=True)
     
     def perform_cancel_user_booking(self, booking_id, confirm_dialog, parent_dialog=None):
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor()
-            
+        user_id = self.current_user['id']
+        
+        def cancel():
+            # Runs on a worker; only this user's booking, and its seats go to the waitlist
+            connection = get_db_pool().get_connection()
             try:
-                # Update booking status to cancelled
-                cursor.execute(
-                    "UPDATE bookings SET status = 'cancelled' WHERE id = %s AND user_id = %s",
-                    (booking_id, self.current_user['id'])
-                )
-                
-                connection.commit()
-                confirm_dialog.destroy()
-                
-                if parent_dialog:
-                    parent_dialog.destroy()
-                
-                CTkMessagebox(
-                    title="Success",
-                    message="Your booking has been cancelled successfully",
-                    icon="check"
-                )
-                
-                # Refresh the current view
-                if any("bookings" in str(child) for child in self.app.winfo_children()):
-                    self.show_user_bookings_screen()
-                else:
-                    self.show_user_dashboard()
-            except Exception as e:
-                connection.rollback()
-                confirm_dialog.destroy()
-                CTkMessagebox(
-                    title="Error",
-                    message=f"Failed to cancel booking: {str(e)}",
-                    icon="cancel"
-                )
+                return self.booking_engine.cancel_booking(connection, booking_id, user_id=user_id)
             finally:
-                cursor.close()
                 connection.close()
+        
+        def cancelled(promoted):
+            self.dashboard_stats.invalidate()
+            confirm_dialog.destroy()
+            
+            if parent_dialog:
+                parent_dialog.destroy()
+            
+            CTkMessagebox(
+                title="Success",
+                message="Your booking has been cancelled successfully",
+                icon="check"
+            )
+            
+            # Refresh the current view
+            if any("bookings" in str(child) for child in self.app.winfo_children()):
+                self.show_user_bookings_screen()
+            else:
+                self.show_user_dashboard()
+        
+        def cancel_failed(e):
+            confirm_dialog.destroy()
+            CTkMessagebox(
+                title="Error",
+                message=f"Failed to cancel booking: {str(e)}",
+                icon="cancel"
+            )
+        
+        self.query_executor.submit(cancel, cancelled, cancel_failed)
     
     def show_book_ticket_screen(self):
         # Implement the booking interface
@@ -9005,6 +12812,9 @@ class RailwayReservationSystem:
         )
         destination_entry.grid(row=1, column=1, sticky="ew")
 
+        self.attach_station_autocomplete(source_entry)
+        self.attach_station_autocomplete(destination_entry)
+
         # Date selection
         date_label = ctk.CTkLabel(form_frame, text="Journey Date")
         date_label.pack(anchor="w", pady=(20, 5))
@@ -9015,7 +12825,7 @@ class RailwayReservationSystem:
         # Get tomorrow's date as default
         tomorrow = datetime.now() + timedelta(days=1)
 
-        date_entry = DateEntry(
+        date_entry = tkcalendar.DateEntry(
             date_frame, 
             width=12,
             background='darkblue',
@@ -9078,7 +12888,8 @@ class RailwayReservationSystem:
                 destination_var.get(),
                 date_entry.get_date(),
                 class_var.get(),
-                tabview
+                tabview,
+                search_button
             ),
             height=45,
             corner_radius=10
@@ -9124,7 +12935,7 @@ class RailwayReservationSystem:
         source_var.set(source)
         dest_var.set(destination)
     
-    def search_trains_for_booking(self, source, destination, journey_date, travel_class, tabview):
+    def search_trains_for_booking(self, source, destination, journey_date, travel_class, tabview, search_button=None):
         # Validate inputs
         if not source or not destination:
             CTkMessagebox(
@@ -9153,62 +12964,242 @@ class RailwayReservationSystem:
             "travel_class": travel_class
         }
         
-        # Query database for matching trains
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor(dictionary=True)
+        # Query database for trains calling at both stations in order; the
+        # fares and times are those of the segment between them
+        query = """
+            SELECT 
+                s.id, a.stop_index AS from_stop, b.stop_index AS to_stop,
+                DATE(a.departure_at) AS departure_date, TIME(a.departure_at) AS departure_time,
+                DATE(b.arrival_at) AS arrival_date, TIME(b.arrival_at) AS arrival_time,
+                ROUND(s.fare_sleeper * (b.fare_fraction - a.fare_fraction), 2) AS fare_sleeper,
+                ROUND(s.fare_ac * (b.fare_fraction - a.fare_fraction), 2) AS fare_ac,
+                ROUND(s.fare_general * (b.fare_fraction - a.fare_fraction), 2) AS fare_general,
+                s.status, s.delay_minutes, s.train_id
+            FROM 
+                schedule_stops a
+            JOIN 
+                schedule_stops b ON b.schedule_id = a.schedule_id AND b.stop_index > a.stop_index
+            JOIN 
+                schedules s ON s.id = a.schedule_id
+            WHERE 
+                a.station_id = %s AND 
+                b.station_id = %s AND 
+                a.departure_at >= %s AND 
+                a.departure_at < %s + INTERVAL 1 DAY
+            ORDER BY 
+                a.departure_at
+        """
+        
+        # The button doubles as the loading indicator while the query runs
+        if search_button is not None:
+            search_button.configure(text="Searching...", state="disabled")
+        
+        def restore_search_button():
+            if search_button is not None and search_button.winfo_exists():
+                search_button.configure(text="Search Trains", state="normal")
+        
+        def show_results(result):
+            restore_search_button()
+            trains, connections = result
+            
+            if not trains and connections:
+                self.show_connecting_journeys(source, destination, journey_date_str, connections, travel_class, tabview)
+                return
+            
+            if not trains:
+                CTkMessagebox(
+                    title="No Trains Found",
+                    message=f"No trains found from {source} to {destination} on {journey_date_str}",
+                    icon="warning"
+                )
+                return
+            
+            # Store search results
+            self.search_results = trains
             
+            # Setup and show results tab
+            self.setup_search_results_tab(self.booking_tabs["results"], tabview, trains, travel_class)
+            tabview.set("Search Results")
+            
+            # Enable results tab
+            tabview.tab("Search Results").state(["!disabled"])
+        
+        def show_error(e):
+            restore_search_button()
+            if isinstance(e, UnknownStationError):
+                hint = ", ".join(station['name'] for station in e.suggestions[:3])
+                CTkMessagebox(
+                    title="Unknown Station",
+                    message=f"No station called '{e.name}'." + (f" Did you mean: {hint}?" if hint else ""),
+                    icon="warning"
+                )
+                return
+            if isinstance(e, SameStationError):
+                CTkMessagebox(title="Input Error", message=str(e), icon="cancel")
+                return
+            print(f"Error searching trains: {e}")
+            CTkMessagebox(
+                title="Search Error",
+                message=f"Error searching for trains: {str(e)}",
+                icon="cancel"
+            )
+        
+        reference = self.reference_data
+        
+        def find_trains():
+            # Names, codes and aliases resolve to station ids in memory
+            stations = []
+            for name in (source, destination):
+                station = reference.station(name)
+                if station is None:
+                    raise UnknownStationError(name, reference.closest(name))
+                stations.append(station)
+            station_ids = [station['id'] for station in stations]
+            # A name and a code or alias of one station pass the text check
+            if station_ids[0] == station_ids[1]:
+                raise SameStationError(stations[0]['name'])
+            
+            connection = get_db_pool().get_connection()
+            cursor = connection.cursor(dictionary=True)
             try:
-                query = """
-                    SELECT 
-                        s.id, s.source, s.destination, s.departure_date, s.departure_time,
-                        s.arrival_date, s.arrival_time,
-                        s.fare_sleeper, s.fare_ac, s.fare_general, s.status, s.delay_minutes,
-                        t.id as train_id, t.train_number, t.train_name,
-                        t.total_seats_sleeper, t.total_seats_ac, t.total_seats_general
-                    FROM 
-                        schedules s
-                    JOIN 
-                        trains t ON s.train_id = t.id
-                    WHERE 
-                        LOWER(s.source) = LOWER(%s) AND 
-                        LOWER(s.destination) = LOWER(%s) AND 
-                        s.departure_date = %s
-                    ORDER BY 
-                        s.departure_time
-                """
-                
-                cursor.execute(query, (source, destination, journey_date_str))
+                cursor.execute(query, (*station_ids, journey_date_str, journey_date_str))
                 trains = cursor.fetchall()
-                
-                if not trains:
-                    CTkMessagebox(
-                        title="No Trains Found",
-                        message=f"No trains found from {source} to {destination} on {journey_date_str}",
-                        icon="warning"
-                    )
-                    return
-                
-                # Store search results
-                self.search_results = trains
-                
-                # Setup and show results tab
-                self.setup_search_results_tab(self.booking_tabs["results"], tabview, trains, travel_class)
-                tabview.set("Search Results")
-                
-                # Enable results tab
-                tabview.tab("Search Results").state(["!disabled"])
-                
-            except Exception as e:
-                print(f"Error searching trains: {e}")
-                CTkMessagebox(
-                    title="Search Error",
-                    message=f"Error searching for trains: {str(e)}",
-                    icon="cancel"
+                # Free seats over just the segments travelled, so seats sold
+                # on other parts of the route are offered again
+                availability = SeatInventory.get_segment_availability(
+                    cursor, {train['id']: (train['from_stop'], train['to_stop']) for train in trains}
                 )
             finally:
                 cursor.close()
                 connection.close()
+            
+            # Train details come from the cache instead of a join
+            if any(reference.train(train['train_id']) is None for train in trains):
+                reference.invalidate()
+            for train in trains:
+                details = reference.train(train['train_id'])
+                train['source'] = stations[0]['name']
+                train['destination'] = stations[1]['name']
+                train['train_number'] = details['train_number']
+                train['train_name'] = details['train_name']
+                for seat_class in ("sleeper", "ac", "general"):
+                    train[f'total_seats_{seat_class}'] = details[f'total_seats_{seat_class}']
+                    # Schedules without inventory rows have every seat free
+                    train[f'available_{seat_class}'] = availability.get(train['id'], {}).get(
+                        seat_class, details[f'total_seats_{seat_class}']
+                    )
+            
+            # Without a direct train, look for journeys that change trains
+            connections = []
+            if not trains:
+                day_start = datetime.combine(journey_date, datetime.min.time())
+                depart_after = max(day_start, datetime.now())
+                itineraries = reference.journey_planner().plan(
+                    station_ids[0], station_ids[1], depart_after, travel_class,
+                    max_changes=JOURNEY_MAX_CHANGES,
+                    window=journey_minutes(day_start + timedelta(days=1)) - journey_minutes(depart_after)
+                )
+                for itinerary in itineraries:
+                    itinerary['legs'] = [{
+                        'schedule_id': leg.schedule_id,
+                        'train': reference.train(leg.train_id),
+                        'source': reference.station_by_id(leg.origin)['name'],
+                        'destination': reference.station_by_id(leg.destination)['name'],
+                        'depart': journey_datetime(leg.depart),
+                        'arrive': journey_datetime(leg.arrive),
+                    } for leg in itinerary['legs']]
+                    connections.append(itinerary)
+            return trains, connections
+        
+        # A newer search supersedes one that is still running
+        self.query_executor.submit(
+            find_trains,
+            show_results,
+            show_error,
+            key="train_search"
+        )
+    
+    def show_connecting_journeys(self, source, destination, journey_date_str, connections, travel_class, tabview):
+        # Itineraries from the journey planner when no train runs direct;
+        # each leg can be searched (and booked) on its own
+        dialog = ctk.CTkToplevel(self.app)
+        dialog.title("Connecting Journeys")
+        dialog.geometry("640x520")
+        dialog.resizable(False, False)
+        dialog.grab_set()
+        
+        # Center the dialog
+        dialog.update_idletasks()
+        width = dialog.winfo_width()
+        height = dialog.winfo_height()
+        x = (dialog.winfo_screenwidth() // 2) - (width // 2)
+        y = (dialog.winfo_screenheight() // 2) - (height // 2)
+        dialog.geometry('{}x{}+{}+{}'.format(width, height, x, y))
+        
+        header_label = ctk.CTkLabel(
+            dialog,
+            text=f"No direct trains from {source} to {destination} on {journey_date_str}",
+            font=ctk.CTkFont(size=16, weight="bold"),
+            wraplength=580
+        )
+        header_label.pack(padx=20, pady=(20, 5))
+        
+        subtitle_label = ctk.CTkLabel(
+            dialog,
+            text="These journeys change trains on the way. Search each leg to book it.",
+            text_color=("gray50", "gray70")
+        )
+        subtitle_label.pack(padx=20, pady=(0, 10))
+        
+        scroll_frame = ctk.CTkScrollableFrame(dialog)
+        scroll_frame.pack(fill="both", expand=True, padx=20, pady=(0, 10))
+        
+        def search_leg(leg):
+            dialog.destroy()
+            self.search_trains_for_booking(leg['source'], leg['destination'], leg['depart'].date(), travel_class, tabview)
+        
+        for connection in connections:
+            card = ctk.CTkFrame(scroll_frame)
+            card.pack(fill="x", pady=5, padx=5)
+            
+            duration = connection['arrive'] - connection['depart']
+            hours, minutes = divmod(int(duration.total_seconds() // 60), 60)
+            changes = connection['changes']
+            summary = (
+                f"{connection['depart'].strftime('%d %b %H:%M')} → {connection['arrive'].strftime('%d %b %H:%M')}"
+                f"  ·  {hours}h {minutes:02d}m  ·  {changes} change{'s' if changes != 1 else ''}"
+                f"  ·  {format_currency(connection['fare'])}"
+            )
+            summary_label = ctk.CTkLabel(card, text=summary, font=ctk.CTkFont(size=14, weight="bold"))
+            summary_label.pack(anchor="w", padx=15, pady=(10, 5))
+            
+            for leg in connection['legs']:
+                leg_frame = ctk.CTkFrame(card, fg_color="transparent")
+                leg_frame.pack(fill="x", padx=15, pady=2)
+                
+                train = leg['train']
+                train_text = f"{train['train_number']} {train['train_name']}" if train else "Train"
+                leg_label = ctk.CTkLabel(
+                    leg_frame,
+                    text=f"{train_text}: {leg['source']} {leg['depart'].strftime('%H:%M')} → "
+                         f"{leg['destination']} {leg['arrive'].strftime('%H:%M')}",
+                    anchor="w"
+                )
+                leg_label.pack(side="left", fill="x", expand=True)
+                
+                search_button = ctk.CTkButton(
+                    leg_frame,
+                    text="Search",
+                    width=80,
+                    height=28,
+                    command=lambda leg=leg: search_leg(leg)
+                )
+                search_button.pack(side="right")
+            
+            ctk.CTkFrame(card, fg_color="transparent", height=8).pack()
+        
+        close_button = ctk.CTkButton(dialog, text="Close", command=dialog.destroy, height=35)
+        close_button.pack(pady=(0, 15))
     
     def setup_search_results_tab(self, parent, tabview, trains, travel_class):
         # Clear previous content
@@ -9491,11 +13482,10 @@ class RailwayReservationSystem:
             seats_frame = ctk.CTkFrame(bottom_frame, fg_color="transparent")
             seats_frame.pack(side="left")
             
-            # Check available seats (simplified for demo - would normally query for actual available seats)
-            # In a real app, you'd calculate available seats by checking existing bookings
-            available_sleeper = train['total_seats_sleeper']
-            available_ac = train['total_seats_ac']
-            available_general = train['total_seats_general']
+            # Available seats come from the seat inventory joined into the search query
+            available_sleeper = max(int(train.get('available_sleeper', train['total_seats_sleeper'])), 0)
+            available_ac = max(int(train.get('available_ac', train['total_seats_ac'])), 0)
+            available_general = max(int(train.get('available_general', train['total_seats_general'])), 0)
             
             seats_label = ctk.CTkLabel(
                 seats_frame,
@@ -10303,76 +14293,88 @@ class RailwayReservationSystem:
         else:  # general
             fare = float(self.selected_train['fare_general'])
         
-        # Calculate total fare
-        total_fare = fare * len(self.passengers_data)
+        # Everything the booking needs, read from Tk before handing it to a worker
+        request = (
+            self.current_user['id'],
+            self.selected_train['id'],
+            self.selected_class,
+            list(self.passengers_data),
+            fare,
+            self.payment_method.get(),
+            # Seats are held only between the searched stations
+            (self.selected_train['from_stop'], self.selected_train['to_stop'])
+        )
+        
+        def book():
+            # Runs on a worker: row lock waits and deadlock retries stay off the Tk thread
+            connection = get_db_pool().get_connection()
+            try:
+                return self.booking_engine.book(connection, *request)
+            finally:
+                connection.close()
         
-        # Save booking to database
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor()
+        def booked(result):
+            booking_id, pnr = result
+            self.dashboard_stats.invalidate()
+            
+            # Show success message
+            self.show_booking_confirmation(pnr)
+        
+        def booking_failed(e):
+            if isinstance(e, SeatsUnavailableError):
+                # The worker has already returned its connection
+                choice = CTkMessagebox(
+                    title="Seats Unavailable",
+                    message=f"Not enough seats left in this class. {e}\n"
+                            f"Join the waitlist? The booking is confirmed automatically when seats are cancelled.",
+                    icon="warning",
+                    option_1="No",
+                    option_2="Join Waitlist"
+                )
+                if choice.get() == "Join Waitlist":
+                    self.join_waitlist(request)
+                return
             
+            print(f"Error completing booking: {e}")
+            CTkMessagebox(
+                title="Booking Error",
+                message=f"Failed to complete booking: {str(e)}",
+                icon="cancel"
+            )
+        
+        self.query_executor.submit(book, booked, booking_failed)
+    
+    def join_waitlist(self, request):
+        # Queue the booking from complete_booking; it may be confirmed at once if seats came back
+        def join():
+            connection = get_db_pool().get_connection()
             try:
-                # Begin transaction
-                connection.start_transaction()
-                
-                # Generate PNR
-                pnr = generate_pnr()
-                
-                # Insert booking
-                cursor.execute(
-                    """
-                    INSERT INTO bookings 
-                    (user_id, schedule_id, pnr, total_fare, status, payment_method)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    """,
-                    (
-                        self.current_user['id'],
-                        self.selected_train['id'],
-                        pnr,
-                        total_fare,
-                        'confirmed',
-                        self.payment_method.get()
-                    )
-                )
-                
-                # Get booking ID
-                booking_id = cursor.lastrowid
-                
-                # Insert passengers
-                for passenger in self.passengers_data:
-                    cursor.execute(
-                        """
-                        INSERT INTO passengers
-                        (booking_id, name, age, gender, seat_class)
-                        VALUES (%s, %s, %s, %s, %s)
-                        """,
-                        (
-                            booking_id,
-                            passenger['name'],
-                            passenger['age'],
-                            passenger['gender'],
-                            self.selected_class
-                        )
-                    )
-                
-                # Commit transaction
-                connection.commit()
-                
-                # Show success message
-                self.show_booking_confirmation(pnr)
-                
-            except Exception as e:
-                connection.rollback()
-                print(f"Error completing booking: {e}")
-                
-                CTkMessagebox(
-                    title="Booking Error",
-                    message=f"Failed to complete booking: {str(e)}",
-                    icon="cancel"
-                )
+                return self.booking_engine.join_waitlist(connection, *request)
             finally:
-                cursor.close()
                 connection.close()
+        
+        def joined(result):
+            booking_id, pnr, position = result
+            self.dashboard_stats.invalidate()
+            if position is None:
+                self.show_booking_confirmation(pnr)
+                return
+            CTkMessagebox(
+                title="Booking Waitlisted",
+                message=f"PNR {pnr} is on the waitlist at position {position}.\n"
+                        f"You will be notified on your dashboard when it is confirmed.",
+                icon="info"
+            )
+            self.show_user_dashboard()
+        
+        def join_failed(e):
+            if isinstance(e, (WaitlistFullError, SeatsUnavailableError)):
+                CTkMessagebox(title="Waitlist Unavailable", message=str(e), icon="warning")
+                return
+            print(f"Error joining waitlist: {e}")
+            CTkMessagebox(title="Booking Error", message=f"Failed to join the waitlist: {str(e)}", icon="cancel")
+        
+        self.query_executor.submit(join, joined, join_failed)
     
     def show_booking_confirmation(self, pnr):
         # Create confirmation dialog
@@ -10665,7 +14667,7 @@ class RailwayReservationSystem:
                         SELECT 
                             b.id, b.pnr, b.booking_date, b.total_fare, b.status,
                             t.train_number, t.train_name,
-                            s.source, s.destination, s.departure_date, s.departure_time,
+                            COALESCE(b.boarding, s.source) AS source, COALESCE(b.alighting, s.destination) AS destination, s.departure_date, s.departure_time,
                             s.arrival_date, s.arrival_time, s.status as train_status, s.delay_minutes
                         FROM 
                             bookings b
@@ -10686,7 +14688,7 @@ class RailwayReservationSystem:
                         SELECT 
                             b.id, b.pnr, b.booking_date, b.total_fare, b.status,
                             t.train_number, t.train_name,
-                            s.source, s.destination, s.departure_date, s.departure_time,
+                            COALESCE(b.boarding, s.source) AS source, COALESCE(b.alighting, s.destination) AS destination, s.departure_date, s.departure_time,
                             s.arrival_date, s.arrival_time, s.status as train_status, s.delay_minutes
                         FROM 
                             bookings b
@@ -10707,7 +14709,7 @@ class RailwayReservationSystem:
                         SELECT 
                             b.id, b.pnr, b.booking_date, b.total_fare, b.status,
                             t.train_number, t.train_name,
-                            s.source, s.destination, s.departure_date, s.departure_time,
+                            COALESCE(b.boarding, s.source) AS source, COALESCE(b.alighting, s.destination) AS destination, s.departure_date, s.departure_time,
                             s.arrival_date, s.arrival_time, s.status as train_status, s.delay_minutes
                         FROM 
                             bookings b
@@ -10762,8 +14764,7 @@ class RailwayReservationSystem:
                     train_info.pack(side="left")
                     
                     # Status badge
-                    status_color = "#43a047" if booking['status'] == "confirmed" else "#e53935"
-                    status_text = "Confirmed" if booking['status'] == "confirmed" else "Cancelled"
+                    status_text, status_color = booking_status_style(booking['status'])
                     
                     status_badge = ctk.CTkLabel(
                         top_frame,
@@ -10865,8 +14866,8 @@ class RailwayReservationSystem:
                     )
                     view_button.pack(side="right", padx=(10, 0))
                     
-                    # Cancel button (only for upcoming journeys and confirmed status)
-                    if booking_type == "upcoming" and booking['status'] == "confirmed":
+                    # Cancel button (only for upcoming journeys that aren't cancelled)
+                    if booking_type == "upcoming" and booking['status'] != "cancelled":
                         cancel_button = ctk.CTkButton(
                             bottom_frame,
                             text="Cancel",
@@ -11085,7 +15086,7 @@ class RailwayReservationSystem:
         date_frame = ctk.CTkFrame(form_frame)
         date_frame.grid(row=1, column=1, sticky="ew")
         
-        date_entry = DateEntry(
+        date_entry = tkcalendar.DateEntry(
             date_frame, 
             width=12,
             background='darkblue',
@@ -12225,7 +16226,7 @@ class RailwayReservationSystem:
                 cursor.execute("""
                     SELECT 
                         b.id, b.pnr, b.booking_date, b.total_fare, b.status,
-                        t.train_name, s.source, s.destination, s.departure_date
+                        t.train_name, COALESCE(b.boarding, s.source) AS source, COALESCE(b.alighting, s.destination) AS destination, s.departure_date
                     FROM 
                         bookings b
                     JOIN 
@@ -12277,8 +16278,7 @@ class RailwayReservationSystem:
                         row_frame.pack(fill="x", pady=2)
                         
                         # Format status for display
-                        status_text = "Confirmed" if booking['status'] == "confirmed" else "Cancelled"
-                        status_color = "#43a047" if booking['status'] == "confirmed" else "#e53935"
+                        status_text, status_color = booking_status_style(booking['status'])
                         
                         # Route format
                         route_text = f"{booking['source']} → {booking['destination']}"
@@ -12313,5 +16313,52 @@ class RailwayReservationSystem:
 
 # Main entry point
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Railway Reservation System")
+    parser.add_argument(
+        "--rebuild-revenue-rollup",
+        action="store_true",
+        help="recompute the revenue_daily rollup from bookings and exit"
+    )
+    parser.add_argument(
+        "--check-fare-ledger",
+        action="store_true",
+        help="report bookings whose fare ledger doesn't match total_fare and exit"
+    )
+    parser.add_argument(
+        "--export",
+        choices=sorted(COLUMNAR_DATASETS),
+        help="export a dataset for analytics to --output (.parquet, .arrow or .jsonl[.gz]) and exit"
+    )
+    parser.add_argument("--output", help="file to write with --export")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="with --export or --backup, only include rows added since the last incremental run"
+    )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="print import times and start-up phase timings once the login screen is up"
+    )
+    parser.add_argument("--backup", metavar="PATH", help="back up the database to a .zip archive and exit")
+    parser.add_argument("--restore", metavar="PATH", help="restore the database from a --backup archive and exit")
+    args = parser.parse_args()
+    
+    if args.backup:
+        raise SystemExit(0 if run_backup(args.backup, args.incremental) else 1)
+    if args.restore:
+        raise SystemExit(0 if run_restore(args.restore) else 1)
+    if args.export:
+        if not args.output:
+            parser.error("--export needs --output")
+        raise SystemExit(0 if run_columnar_export(args.export, args.output, args.incremental) else 1)
+    if args.rebuild_revenue_rollup:
+        raise SystemExit(0 if rebuild_revenue_rollup() else 1)
+    if args.check_fare_ledger:
+        raise SystemExit(0 if check_fare_ledger() else 1)
+    
+    STARTUP_PROFILE.enabled = args.profile_startup
     app = RailwayReservationSystem()
-    app.app.mainloop()
\ No newline at end of file
+    app.app.mainloop()
+    app.query_executor.shutdown()
+    get_password_hasher().shutdown()
\ No newline at end of file
@@ -0,0 +1,379 @@
+"""Concurrent booking stress test.
+
+Fires many concurrent bookings at one schedule through BookingEngine and
+checks that the seat inventory is never oversold. With --stops above 2 the
+schedule has intermediate stops and every booking is for a random segment,
+so seats are resold on the parts of the route they are free on.
+
+    python stress_booking.py                      # SQLite stand-in
+    python stress_booking.py --backend mysql      # database from .env
+    python stress_booking.py --stops 6            # segment tickets
+
+The MySQL run creates a throwaway user, train and schedule and deletes them
+again afterwards.
+"""
+import argparse
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from main import (BookingEngine, FareLedger, ScheduleStops, SeatInventory, SeatsUnavailableError,
+                  Stations, get_db_pool, start_pnr_generator)
+
+
+# SQLite stand-in
+class SQLiteLockError(Exception):
+    errno = 1205
+
+
+class SQLiteCursor:
+    """Minimal mysql.connector-style cursor on top of sqlite3"""
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    @staticmethod
+    def _translate(sql):
+        sql = re.sub(r"\s+FOR UPDATE", "", sql)
+        sql = sql.replace("ON DUPLICATE KEY UPDATE", "ON CONFLICT DO UPDATE SET")
+        sql = re.sub(r"VALUES\((\w+)\)", r"excluded.\1", sql)
+        return sql.replace("%s", "?")
+
+    def execute(self, sql, params=()):
+        try:
+            self._cursor.execute(self._translate(sql), params)
+        except sqlite3.OperationalError as e:
+            if "locked" in str(e):
+                raise SQLiteLockError(str(e))
+            raise
+
+    def executemany(self, sql, seq_of_params):
+        try:
+            self._cursor.executemany(self._translate(sql), seq_of_params)
+        except sqlite3.OperationalError as e:
+            if "locked" in str(e):
+                raise SQLiteLockError(str(e))
+            raise
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """Minimal mysql.connector-style connection on top of sqlite3.
+
+    start_transaction() takes SQLite's database-wide write lock, which stands
+    in for MySQL's row lock on the seat_inventory row.
+    """
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None,
+                                     check_same_thread=False)
+
+    def cursor(self, **kwargs):
+        return SQLiteCursor(self._conn.cursor())
+
+    def start_transaction(self, **kwargs):
+        try:
+            self._conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as e:
+            raise SQLiteLockError(str(e))
+
+    def commit(self):
+        self._conn.execute("COMMIT")
+
+    def rollback(self):
+        if self._conn.in_transaction:
+            self._conn.execute("ROLLBACK")
+
+    def close(self):
+        self._conn.close()
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT);
+CREATE TABLE trains (
+    id INTEGER PRIMARY KEY, train_number TEXT, train_name TEXT,
+    total_seats_sleeper INT, total_seats_ac INT, total_seats_general INT
+);
+CREATE TABLE schedules (
+    id INTEGER PRIMARY KEY, train_id INT, source TEXT, destination TEXT,
+    departure_date TEXT, departure_time TEXT, arrival_date TEXT, arrival_time TEXT,
+    fare_sleeper REAL, fare_ac REAL, fare_general REAL
+);
+CREATE TABLE bookings (
+    id INTEGER PRIMARY KEY, user_id INT, schedule_id INT, pnr TEXT UNIQUE,
+    booking_date TEXT DEFAULT CURRENT_TIMESTAMP, total_fare REAL,
+    status TEXT DEFAULT 'confirmed', payment_method TEXT, payment_id TEXT,
+    from_stop INT, to_stop INT, boarding TEXT, alighting TEXT
+);
+CREATE TABLE passengers (
+    id INTEGER PRIMARY KEY, booking_id INT, name TEXT, age INT, gender TEXT,
+    seat_class TEXT, seat_number TEXT
+);
+CREATE TABLE seat_inventory (
+    schedule_id INT, seat_class TEXT, total_seats INT, sold_seats INT DEFAULT 0, seat_map BLOB,
+    segments INT DEFAULT 1,
+    PRIMARY KEY (schedule_id, seat_class)
+);
+CREATE TABLE stations (id INTEGER PRIMARY KEY, code TEXT, name TEXT, aliases TEXT DEFAULT '');
+CREATE TABLE schedule_stops (
+    schedule_id INT, stop_index INT, station_id INT, arrival_at TEXT, departure_at TEXT,
+    fare_fraction REAL, PRIMARY KEY (schedule_id, stop_index)
+);
+CREATE TABLE revenue_daily (
+    booking_day TEXT, source TEXT, destination TEXT, seat_class TEXT, payment_method TEXT,
+    revenue REAL DEFAULT 0, confirmed_bookings INT DEFAULT 0, cancelled_bookings INT DEFAULT 0,
+    total_bookings INT DEFAULT 0, passengers INT DEFAULT 0,
+    PRIMARY KEY (booking_day, source, destination, seat_class, payment_method)
+);
+CREATE TABLE fare_ledger (
+    passenger_id INTEGER PRIMARY KEY, booking_id INT, schedule_id INT, seat_class TEXT,
+    fare REAL, booking_day TEXT, status TEXT DEFAULT 'confirmed'
+);
+"""
+
+
+def setup_sqlite(seats, stops):
+    # No pnr_nodes table to lease from; this is the only instance
+    os.environ.setdefault("PNR_NODE", "0")
+    path = os.path.join(tempfile.mkdtemp(), "stress.db")
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SQLITE_SCHEMA)
+    conn.execute("INSERT INTO users (id, name, email) VALUES (1, 'Stress', 'stress@example.com')")
+    conn.execute("INSERT INTO trains VALUES (1, 'STRESS', 'Stress Express', ?, ?, ?)", (seats, seats, seats))
+    conn.execute(
+        "INSERT INTO schedules VALUES (1, 1, 'A', 'B', '2030-01-01', '08:00:00', "
+        "'2030-01-01', '12:00:00', 100, 200, 50)"
+    )
+    for seat_class in ("sleeper", "ac", "general"):
+        conn.execute("INSERT INTO seat_inventory VALUES (1, ?, ?, 0, NULL, ?)", (seat_class, seats, stops - 1))
+    for index in range(stops):
+        conn.execute("INSERT INTO stations (id, code, name) VALUES (?, ?, ?)", (index + 1, f"S{index}", f"Stop {index}"))
+        conn.execute("INSERT INTO schedule_stops VALUES (1, ?, ?, NULL, NULL, ?)",
+                     (index, index + 1, index / (stops - 1)))
+    conn.commit()
+    conn.close()
+
+    context = {"user_id": 1, "schedule_id": 1, "route": ("A", "B")}
+    return context, lambda: SQLiteConnection(path), lambda: None
+
+
+def setup_mysql(seats, threads, stops):
+    start_pnr_generator()
+    pool = get_db_pool()
+    pool.size = max(pool.size, threads)
+
+    conn = pool.get_connection()
+    cursor = conn.cursor()
+    tag = f"STRESS{int(time.time())}"
+    route = (f"{tag} A", f"{tag} B")
+    cursor.execute(
+        "INSERT INTO users (name, email, password) VALUES (%s, %s, %s)",
+        ("Stress Test", f"{tag.lower()}@example.com", "x")
+    )
+    user_id = cursor.lastrowid
+    cursor.execute(
+        "INSERT INTO trains (train_number, train_name, total_seats_sleeper, total_seats_ac, total_seats_general) "
+        "VALUES (%s, %s, %s, %s, %s)",
+        (tag, "Stress Express", seats, seats, seats)
+    )
+    train_id = cursor.lastrowid
+    cursor.execute(
+        "INSERT INTO schedules (train_id, source, destination, departure_date, departure_time, "
+        "arrival_date, arrival_time, fare_sleeper, fare_ac, fare_general) "
+        "VALUES (%s, %s, %s, '2030-01-01', '08:00', '2030-01-01', '12:00', 100, 200, 50)",
+        (train_id,) + route
+    )
+    schedule_id = cursor.lastrowid
+    SeatInventory.create_for_schedule(cursor, schedule_id)
+    station_ids = [Stations.resolve(cursor, f"{tag} {index}")[0] for index in range(stops)]
+    departure = datetime(2030, 1, 1, 8)
+    ScheduleStops.replace(cursor, schedule_id, ScheduleStops.build(
+        station_ids[0], departure, station_ids[-1], departure + timedelta(hours=stops),
+        [(station_id, departure + timedelta(hours=index)) for index, station_id in enumerate(station_ids[1:-1], 1)]
+    ))
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+    def cleanup():
+        conn = pool.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM trains WHERE id = %s", (train_id,))
+        cursor.execute("DELETE FROM stations WHERE name LIKE %s", (f"{tag} %",))
+        cursor.execute("DELETE FROM revenue_daily WHERE source = %s AND destination = %s", route)
+        cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+    context = {"user_id": user_id, "schedule_id": schedule_id, "route": route}
+    return context, pool.get_connection, cleanup
+
+
+def check_invariants(conn, schedule_id, route, seat_class):
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT total_seats, sold_seats, segments FROM seat_inventory WHERE schedule_id = %s AND seat_class = %s",
+        (schedule_id, seat_class)
+    )
+    total_seats, sold_seats, segments = cursor.fetchone()
+    cursor.execute(
+        "SELECT b.from_stop, b.to_stop, p.seat_number FROM passengers p JOIN bookings b ON p.booking_id = b.id "
+        "WHERE b.schedule_id = %s AND b.status = 'confirmed' AND p.seat_class = %s",
+        (schedule_id, seat_class)
+    )
+    passengers = cursor.fetchall()
+    booked = len(passengers)
+    # Per segment: passengers on board, and whether any seat is held twice
+    on_board = [0] * segments
+    seats_on_board = [set() for _ in range(segments)]
+    double_booked = 0
+    for from_stop, to_stop, seat_number in passengers:
+        first, last = (from_stop or 0), (segments if to_stop is None else to_stop)
+        for segment in range(first, last):
+            on_board[segment] += 1
+            if seat_number in seats_on_board[segment]:
+                double_booked += 1
+            seats_on_board[segment].add(seat_number)
+    peak = max(on_board)
+    cursor.execute(
+        "SELECT COALESCE(SUM(passengers), 0) FROM revenue_daily "
+        "WHERE source = %s AND destination = %s AND seat_class = %s",
+        route + (seat_class,)
+    )
+    rollup_passengers = int(cursor.fetchone()[0])
+    cursor.execute("SELECT id FROM bookings WHERE schedule_id = %s", (schedule_id,))
+    schedule_bookings = {row[0] for row in cursor.fetchall()}
+    ledger_mismatches = [
+        entry for entry in FareLedger.reconcile(cursor) if entry["booking_id"] in schedule_bookings
+    ]
+    cursor.close()
+    return total_seats, sold_seats, peak, booked, double_booked, rollup_passengers, len(ledger_mismatches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["sqlite", "mysql"], default="sqlite")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--bookings", type=int, default=2000, help="booking attempts in total")
+    parser.add_argument("--seats", type=int, default=1500, help="seats in the contested class")
+    parser.add_argument("--max-party", type=int, default=4)
+    parser.add_argument("--group", type=int, default=1,
+                        help="parties per attempt; above 1 books them together with book_group()")
+    parser.add_argument("--seat-class", default="sleeper", choices=["sleeper", "ac", "general"])
+    parser.add_argument("--stops", type=int, default=2,
+                        help="stops on the schedule; above 2 every booking is for a random segment")
+    args = parser.parse_args()
+    args.stops = max(args.stops, 2)
+
+    if args.backend == "sqlite":
+        context, connect, cleanup = setup_sqlite(args.seats, args.stops)
+    else:
+        context, connect, cleanup = setup_mysql(args.seats, args.threads, args.stops)
+
+    engine = BookingEngine(max_retries=20, backoff=0.01)
+    counters = {"confirmed": 0, "seats": 0, "rejected": 0, "failed": 0}
+    counters_lock = threading.Lock()
+    remaining = [args.bookings]
+
+    def worker():
+        conn = connect()
+        rng = random.Random()
+        try:
+            while True:
+                with counters_lock:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+                parties = [
+                    [
+                        {"name": f"P{i}", "age": rng.randint(5, 80), "gender": "other"}
+                        for i in range(rng.randint(1, args.max_party))
+                    ]
+                    for _ in range(args.group)
+                ]
+                stops = None
+                if args.stops > 2:
+                    first = rng.randrange(args.stops - 1)
+                    stops = (first, rng.randint(first + 1, args.stops - 1))
+                try:
+                    if args.group > 1:
+                        engine.book_group(conn, context["user_id"], context["schedule_id"],
+                                          args.seat_class, parties, 100.0, "upi", stops)
+                    else:
+                        engine.book(conn, context["user_id"], context["schedule_id"], args.seat_class,
+                                    parties[0], 100.0, "upi", stops)
+                    outcome, seats = "confirmed", sum(len(party) for party in parties)
+                except SeatsUnavailableError:
+                    outcome, seats = "rejected", 0
+                except Exception as e:
+                    print(f"Booking failed: {e}")
+                    outcome, seats = "failed", 0
+                with counters_lock:
+                    counters[outcome] += 1
+                    counters["seats"] += seats
+        finally:
+            conn.close()
+
+    workers = [threading.Thread(target=worker) for _ in range(args.threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    conn = connect()
+    try:
+        (total_seats, sold_seats, peak, booked, double_booked,
+         rollup_passengers, ledger_mismatches) = check_invariants(
+            conn, context["schedule_id"], context["route"], args.seat_class)
+    finally:
+        conn.close()
+        cleanup()
+
+    print(f"Backend:            {args.backend} ({args.threads} threads)")
+    print(f"Attempts:           {args.bookings}")
+    print(f"Confirmed attempts: {counters['confirmed']} ({counters['seats']} seats)")
+    print(f"Rejected (full):    {counters['rejected']}")
+    print(f"Failed:             {counters['failed']}")
+    print(f"Retries:            {engine.retries}")
+    print(f"Elapsed:            {elapsed:.2f}s ({args.bookings / elapsed:.0f} bookings/sec)")
+    print(f"Inventory:          {sold_seats}/{total_seats} sold, {booked} passengers on confirmed bookings")
+    if args.stops > 2:
+        print(f"Segments:           {args.stops - 1}, busiest has {peak} on board")
+    print(f"Seat numbers:       {double_booked} held twice")
+    print(f"Revenue rollup:     {rollup_passengers} passengers")
+    print(f"Fare ledger:        {ledger_mismatches} inconsistent booking(s)")
+
+    ok = (sold_seats <= total_seats
+          and sold_seats == peak
+          and booked == rollup_passengers == counters["seats"]
+          and double_booked == 0
+          and ledger_mismatches == 0)
+    print("Invariants:         " + ("OK" if ok else "VIOLATED"))
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()